@@ -1,138 +1,328 @@
-from typing import TypedDict, List, Dict, Any, Annotated
+from typing import TypedDict, List, Dict, Any, Annotated, Optional, Sequence
+import asyncio
+import functools
 import operator
-from langgraph.graph import StateGraph, END
+import time
+from langgraph.graph import StateGraph, START, END
 from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage
+from app.core.config import settings
+from app.agents.sql_templates import FALLBACK_SQL, SqlTemplate, match_sql_template, sql_equivalent
+from app.services.cancellation import CancelToken, DeadlineExceeded, run_in_thread
 from app.services.llm_factory import llm_factory
+from app.services.query_cache import canonical_sql, normalize_question, query_cache
+from app.services.result_store import result_store
+from app.services.single_flight import SingleFlight
 from app.services.snowflake_service import snowflake_service
+from app.services.tracing import span
+
+def merge_dicts(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {**(left or {}), **(right or {})}
 
 # Define Agent State
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], operator.add]
     user_query: str
+    session_id: str
+    deadline: Optional[float]  # time.monotonic() by which the whole request must finish
     resolved_entities: Dict[str, Any]
     sql_query: str
-    sql_results: List[Dict[str, Any]]
+    sql_results: Sequence[Dict[str, Any]]  # bounded preview (first RESULT_PREVIEW_ROWS rows)
+    result_handle: Optional[Dict[str, Any]]  # server-side cursor for the remaining rows, if any
+    prefetched_sql: Optional[str]  # SQL whose results were already fetched by speculative execution
     chart_config: Dict[str, Any]
     analysis: str
     final_response: Dict[str, Any]
+    cache_status: Annotated[Dict[str, str], merge_dicts]  # e.g. {"sql": "hit", "results": "miss"}
+
+# In-flight coalescing: question -> SQL generation, canonical SQL -> execution
+sql_flight = SingleFlight("sql_writer")
+query_flight = SingleFlight("sql_executor")
 
 # --- NODES ---
 
-def initializer_node(state: AgentState):
+async def initializer_node(state: AgentState):
     """
     Node 1: Initializer
-    Uses RAG (mocked here) to resolve entities and extract user intent.
+    Resolves the dimension values the question mentions (brands, countries, periods, ...)
+    against the in-memory entity index; no LLM call is needed.
     """
     print("--- Initializer Node ---")
     query = state['user_query']
-    llm = llm_factory.create_llm()
     
-    # In a real app, we would query Pinecone here for entity resolution
-    # prompt = f"Resolve entities in: {query}"
-    # response = llm.invoke(prompt)
-    
-    # Mock behavior
-    resolved_entities = {"intent": "sales_analysis", "entities": []}
+    entities = []
+    if settings.ENTITY_INDEX_ENABLED:
+        try:
+            matches = await asyncio.to_thread(snowflake_service.resolve_entities, query)
+            entities = [match.as_dict() for match in matches]
+        except Exception as e:
+            # Resolution only sharpens templates and prompts; the pipeline works without it
+            print(f"Entity resolution failed: {e}")
+    resolved_entities = {"intent": "sales_analysis", "entities": entities}
     
     return {"resolved_entities": resolved_entities, "messages": [SystemMessage(content="Entities Resolved")]}
 
-def sql_writer_node(state: AgentState):
+def entity_hints(entities: Optional[List[Dict[str, Any]]]) -> str:
     """
-    Node 2: SQL Writer
-    Transforms natural language into Snowflake SQL.
+    Prompt lines giving the exact stored spelling of the values the question mentions.
     """
-    print("--- SQL Writer Node ---")
-    query = state['user_query']
-    schema = snowflake_service.get_schema_info()
+    if not entities:
+        return ""
+    lines = [f"- {e['table']}.{e['column']} = {e['value']!r} (\"{e['text']}\")" for e in entities]
+    return "Values mentioned in the question:\n    " + "\n    ".join(lines)
+
+async def generate_sql(query: str, entities: Optional[List[Dict[str, Any]]] = None, fallback: bool = True) -> str:
+    """
+    Builds the prompt for a question and turns the LLM answer into SQL.
+    SQL the cost guard rejects goes back to the LLM with the guard's diagnosis.
+    Without `fallback`, an answer with no usable SQL returns "" instead of a keyword template.
+    """
+    schema = await snowflake_service.aget_schema_info(query)
     llm = llm_factory.create_llm()
+    hints = entity_hints(entities)
+    feedback = ""
     
-    # Prompt would be complex with few-shot examples
-    prompt = f"""
+    for attempt in range(settings.QUERY_COST_RETRIES + 1):
+        # Prompt would be complex with few-shot examples
+        prompt = f"""
     You are a Snowflake SQL expert. Generate a SQL query for: "{query}"
     Using Schema:
     {schema}
-    
+    {hints}
+    {feedback}
     Return ONLY the SQL.
     """
-    response = llm.invoke(prompt)
-    sql = response.content.strip()
-    
-    # Logic to generate SQL based on keywords (FALLBACK/OVERRIDE if LLM fails or for specific cases)
-    # For now, we trust the LLM mostly, but can keep fallback if empty or error.
-    if not sql or "SELECT" not in sql.upper():
-         query_lower = query.lower()
-    
-    is_count = "count" in query_lower or "how many" in query_lower
-    is_list = "list" in query_lower or ("show" in query_lower and "all" in query_lower)
-    is_sales = "sales" in query_lower or "revenue" in query_lower
-
-    if is_count and "brand" in query_lower:
-        sql = "SELECT COUNT(DISTINCT PRODUCT_BRAND) as BRAND_COUNT FROM DIM_SOURCE_PRODUCT"
-    elif is_list and "brand" in query_lower:
-         sql = "SELECT DISTINCT PRODUCT_BRAND FROM DIM_SOURCE_PRODUCT"
-    elif is_sales:
-        if "allegra" in query_lower:
-             sql = """
-            SELECT 
-                p.PRODUCT_BRAND, 
-                SUM(s.VALUE_LC) as TOTAL_SALES
-            FROM FCT_SALES_NATIONAL_MTH s
-            JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID
-            WHERE p.PRODUCT_BRAND = 'Allegra'
-            GROUP BY p.PRODUCT_BRAND
-            """
-        elif "doliprane" in query_lower:
-             sql = """
-            SELECT 
-                p.PRODUCT_BRAND, 
-                SUM(s.VALUE_LC) as TOTAL_SALES
-            FROM FCT_SALES_NATIONAL_MTH s
-            JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID
-            WHERE p.PRODUCT_BRAND = 'Doliprane'
-            GROUP BY p.PRODUCT_BRAND
-            """
-        elif "dulcoflex" in query_lower:
-             sql = """
-            SELECT 
-                p.PRODUCT_BRAND, 
-                SUM(s.VALUE_LC) as TOTAL_SALES
-            FROM FCT_SALES_NATIONAL_MTH s
-            JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID
-            WHERE p.PRODUCT_BRAND = 'Dulcoflex'
-            GROUP BY p.PRODUCT_BRAND
-            """
+        response = await llm.ainvoke(prompt)
+        sql = response.content.strip()
+        
+        # Keyword templates are the FALLBACK if the LLM returns no usable SQL
+        if not sql or "SELECT" not in sql.upper():
+            if not fallback:
+                return ""
+            template = match_sql_template(query, entities)
+            sql = template.sql if template else FALLBACK_SQL
+        
+        if not settings.QUERY_COST_GUARD_ENABLED:
+            return sql
+        try:
+            review = await asyncio.to_thread(snowflake_service.review_query, sql)
+        except Exception as e:
+            # Invalid SQL is reported by the executor
+            print(f"Cost review failed: {e}")
+            return sql
+        if review.accepted:
+            if review.rewritten:
+                print(f"Cost guard added a LIMIT: {review.sql}")
+            return review.sql
+        print(f"Cost guard rejected SQL (attempt {attempt + 1}): {review.diagnosis}")
+        feedback = f"""
+    This previous attempt was too expensive to run:
+    {sql}
+    Reason: {review.diagnosis}
+    Write a cheaper query that still answers the question.
+    """
+    
+    # Still too expensive: the executor refuses it and the diagnosis reaches the user
+    return sql
+
+def resolved_entity_list(state: AgentState) -> Optional[List[Dict[str, Any]]]:
+    """
+    The initializer's entity matches, or None when entity resolution is disabled.
+    """
+    if not settings.ENTITY_INDEX_ENABLED:
+        return None
+    return (state.get('resolved_entities') or {}).get("entities", [])
+
+async def sql_writer_node(state: AgentState):
+    """
+    Node 2: SQL Writer
+    Transforms natural language into Snowflake SQL.
+    """
+    print("--- SQL Writer Node ---")
+    query = state['user_query']
+    
+    # A repeated question reuses its SQL and skips the LLM entirely
+    if settings.QUERY_CACHE_ENABLED:
+        cached_sql = query_cache.get_sql(query)
+        if cached_sql:
+            return {
+                "sql_query": cached_sql,
+                "cache_status": {"sql": "hit"},
+                "messages": [SystemMessage(content=f"SQL Generated (cached): {cached_sql}")]
+            }
+    
+    # While the LLM writes SQL, a confident keyword template can already be running
+    entities = resolved_entity_list(state)
+    template = match_sql_template(query, entities)
+    if settings.SPECULATIVE_SQL_ENABLED and template and template.confidence >= settings.SPECULATIVE_MIN_CONFIDENCE:
+        return await speculative_sql(state, template)
+    
+    # Identical questions already being answered share that single LLM call
+    sql, shared = await sql_flight.do(normalize_question(query), lambda: generate_sql(query, entities))
+    
+    if settings.QUERY_CACHE_ENABLED:
+        query_cache.put_sql(query, sql)
+    status = "coalesced" if shared else "miss"
+    return {"sql_query": sql, "cache_status": {"sql": status}, "messages": [SystemMessage(content=f"SQL Generated: {sql}")]}
+
+# Outcomes of speculative template execution, for tuning SPECULATIVE_MIN_CONFIDENCE/BUDGET
+speculation_stats = {
+    "attempts": 0, "agree": 0, "disagree": 0, "no_llm_sql": 0, "budget_expired": 0, "llm_failed": 0, "template_failed": 0,
+}
+
+def _discard_speculation(task: asyncio.Task, session_id: Optional[str]):
+    """
+    Cancels the losing template run and releases any cursor it still manages to open.
+    """
+    def release(t: asyncio.Task):
+        if not t.cancelled() and t.exception() is None:
+            _, handle = t.result()
+            if handle and handle["id"]:
+                result_store.close(handle["id"], owner=session_id)
+    task.add_done_callback(release)
+    task.cancel()
+
+async def speculative_sql(state: AgentState, template: SqlTemplate):
+    """
+    Races the LLM against the template SQL already executing on SnowflakeService.
+    - LLM answers within the budget with equivalent SQL: serve the template's results.
+    - LLM answers with different SQL: drop the template run, the executor runs the LLM's SQL.
+    - LLM answers without SQL, fails, or the budget expires first: serve the template.
+    If the node itself is cancelled (deadline, disconnect) both runs are stopped and
+    a cursor the template already opened is closed.
+    """
+    query = state['user_query']
+    speculation_stats["attempts"] += 1
+    template_task = asyncio.ensure_future(execute_sql(template.sql, state.get('session_id'), state.get('deadline')))
+    # Own flight key: this call returns "" rather than the template when the LLM writes no SQL
+    llm_task = asyncio.ensure_future(sql_flight.do(
+        ("speculative", normalize_question(query)),
+        lambda: generate_sql(query, resolved_entity_list(state), fallback=False),
+    ))
+    served = False
+    try:
+        outcome = None
+        try:
+            llm_sql, _ = await asyncio.wait_for(asyncio.shield(llm_task), timeout=settings.SPECULATIVE_LATENCY_BUDGET_S)
+            if not llm_sql:
+                outcome = "no_llm_sql"
+            elif sql_equivalent(llm_sql, template.sql):
+                outcome = "agree"
+            else:
+                outcome = "disagree"
+        except asyncio.TimeoutError:
+            outcome = "budget_expired"
+        except Exception as e:
+            print(f"LLM SQL generation failed, serving template: {e}")
+            outcome = "llm_failed"
+        speculation_stats[outcome] += 1
+        
+        update = {}
+        if outcome == "disagree":
+            sql = llm_sql
         else:
-            # Default to all brands
-            sql = """
-            SELECT 
-                p.PRODUCT_BRAND, 
-                SUM(s.VALUE_LC) as TOTAL_SALES
-            FROM FCT_SALES_NATIONAL_MTH s
-            JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID
-            GROUP BY p.PRODUCT_BRAND
-            ORDER BY TOTAL_SALES DESC
-            """
-    else:
-        # Fallback
-        sql = "SELECT COUNT(*) as TOTAL_ROWS FROM DIM_SOURCE_PRODUCT"
+            sql = template.sql
+            try:
+                results, result_handle = await template_task
+                served = True
+                update = {"sql_results": results, "result_handle": result_handle, "prefetched_sql": sql}
+            except Exception as e:
+                # Let the executor retry (and report) the query normally
+                speculation_stats["template_failed"] += 1
+                print(f"Speculative template execution failed: {e}")
+    finally:
+        if not llm_task.done():
+            llm_task.cancel()
+        if not served:
+            _discard_speculation(template_task, state.get('session_id'))
     
-    return {"sql_query": sql, "messages": [SystemMessage(content=f"SQL Generated: {sql}")]}
+    if settings.QUERY_CACHE_ENABLED:
+        query_cache.put_sql(query, sql)
+    return {
+        **update,
+        "sql_query": sql,
+        "cache_status": {"sql": "miss", "speculation": outcome},
+        "messages": [SystemMessage(content=f"SQL Generated ({template.name} speculation: {outcome}): {sql}")]
+    }
+
+async def execute_sql(sql: str, session_id: Optional[str], deadline: Optional[float] = None):
+    """
+    Runs the SQL and returns (preview rows, result handle or None).
+    Only a bounded preview lives in the state; the rest stays behind a server-side cursor
+    (handle id None when the result store had no room for it).
+    SQLite is interrupted when the deadline passes or the calling task is cancelled.
+    """
+    token = CancelToken(deadline)
+    cursor = await snowflake_service.aopen_cursor(sql, token)
+    try:
+        results = await run_in_thread(token, cursor.fetch_page, settings.RESULT_PREVIEW_ROWS, token)
+    except BaseException:
+        cursor.close()
+        raise
+    result_handle = None
+    if not cursor.exhausted:
+        handle = result_store.register(cursor, owner=session_id)
+        if handle is None:
+            # No room to keep the cursor open: the rest of the rows can't be paged (id None)
+            cursor.close()
+        result_handle = {"id": handle, "columns": cursor.columns, "has_more": True}
+    return results, result_handle
 
-def sql_executor_node(state: AgentState):
+async def sql_executor_node(state: AgentState):
     """
     Extra Node: Executor
     Actually runs the SQL against Snowflake (Mock SQLite).
     """
     print("--- SQL Executor Node ---")
     sql = state['sql_query']
+    
+    # Results already produced by a speculative template run
+    if state.get('prefetched_sql') == sql:
+        results, result_handle = state['sql_results'], state.get('result_handle')
+        if settings.QUERY_CACHE_ENABLED and result_handle is None:
+            query_cache.put_result(sql, results)
+        more = "+" if result_handle else ""
+        return {
+            "sql_results": results,
+            "result_handle": result_handle,
+            "cache_status": {"results": "speculative"},
+            "messages": [SystemMessage(content=f"SQL Executed (speculative). Rows: {len(results)}{more}")]
+        }
+    
+    if settings.QUERY_CACHE_ENABLED:
+        cached = query_cache.get_result(sql)
+        if cached is not None:
+            return {
+                "sql_results": cached,
+                "result_handle": None,
+                "cache_status": {"results": "hit"},
+                "messages": [SystemMessage(content=f"SQL Executed (cached). Rows: {len(cached)}")]
+            }
+    
     try:
-        results = snowflake_service.execute_query(sql)
+        # Concurrent runs of the same SQL share one execution
+        (results, result_handle), shared = await query_flight.do(
+            canonical_sql(sql), lambda: execute_sql(sql, state.get('session_id'), state.get('deadline'))
+        )
+        if shared and result_handle:
+            # A server-side cursor can't be shared across sessions; page our own
+            (results, result_handle), shared = await execute_sql(sql, state.get('session_id'), state.get('deadline')), False
+        # Only complete results are cacheable; paged ones live behind a cursor
+        if settings.QUERY_CACHE_ENABLED and result_handle is None and not shared:
+            query_cache.put_result(sql, results)
     except Exception as e:
-        results = [{"error": str(e)}]
-        
-    return {"sql_results": results, "messages": [SystemMessage(content=f"SQL Executed. Rows: {len(results)}")]}
+        results, result_handle, shared = [{"error": str(e)}], None, False
+        # Don't keep serving SQL that fails
+        query_cache.forget_sql(state['user_query'])
+    
+    more = "+" if result_handle else ""
+    return {
+        "sql_results": results,
+        "result_handle": result_handle,
+        "cache_status": {"results": "coalesced" if shared else "miss"},
+        "messages": [SystemMessage(content=f"SQL Executed. Rows: {len(results)}{more}")]
+    }
 
-def chart_recommender_node(state: AgentState):
+async def chart_recommender_node(state: AgentState):
     """
     Node 3: Chart Recommender
     Analyzes results to suggest visualization.
@@ -141,7 +331,7 @@ def chart_recommender_node(state: AgentState):
     results = state['sql_results']
     
     # Check if results look like chartable data (e.g. Sales)
-    if results and isinstance(results, list) and len(results) > 0 and 'TOTAL_SALES' in results[0]:
+    if results and 'TOTAL_SALES' in results[0]:
         chart_config = {
             "type": "bar",
             "xKey": "PRODUCT_BRAND",
@@ -153,7 +343,7 @@ def chart_recommender_node(state: AgentState):
     
     return {"chart_config": chart_config, "messages": [SystemMessage(content="Chart Configured")]}
 
-def data_analyst_node(state: AgentState):
+async def data_analyst_node(state: AgentState):
     """
     Node 4: Data Analyst
     Generates insights.
@@ -171,18 +361,22 @@ def data_analyst_node(state: AgentState):
     elif is_list:
         brands = [list(r.values())[0] for r in results]
         brands_str = ", ".join(str(b) for b in brands)
+        if state.get('result_handle'):
+            brands_str += ", ..."
         analysis = f"The brands in the database are: **{brands_str}**."
     elif results and 'TOTAL_SALES' in results[0]:
         # Simple analysis for sales
         top_brand = results[0]['PRODUCT_BRAND']
         top_val = results[0]['TOTAL_SALES']
         analysis = f"Sales are led by **{top_brand}** with **{top_val}**."
+    elif state.get('result_handle'):
+        analysis = f"I found more than {len(results)} records matching your query; showing the first {len(results)}."
     else:
         analysis = f"I found {len(results)} records matching your query."
     
     return {"analysis": analysis, "messages": [SystemMessage(content="Analysis Complete")]}
 
-def merger_node(state: AgentState):
+async def merger_node(state: AgentState):
     """
     Node 5: Merger
     Consolidates everything.
@@ -192,6 +386,8 @@ def merger_node(state: AgentState):
         "query": state['user_query'],
         "sql": state['sql_query'],
         "data": state['sql_results'],
+        "result_handle": (state.get('result_handle') or {}).get("id"),
+        "has_more": bool(state.get('result_handle')),
         "chart": state['chart_config'],
         "narrative": state['analysis']
     }
@@ -199,23 +395,146 @@ def merger_node(state: AgentState):
 
 # --- GRAPH CONSTRUCTION ---
 
-workflow = StateGraph(AgentState)
+# Node name -> (node function, nodes whose output it reads).
+# Nodes whose dependencies are all satisfied run in parallel; a node with several
+# dependencies waits for all of them. New analysis nodes only need an entry here.
+PIPELINE = {
+    "initializer": (initializer_node, []),
+    "sql_writer": (sql_writer_node, ["initializer"]),
+    "sql_executor": (sql_executor_node, ["sql_writer"]), # Added this to actually get data
+    "chart_recommender": (chart_recommender_node, ["sql_executor"]),
+    "data_analyst": (data_analyst_node, ["sql_executor"]),
+    "merger": (merger_node, ["chart_recommender", "data_analyst"]),
+}
+
+def node_budget(state: Dict[str, Any], name: str) -> Optional[float]:
+    """
+    Seconds a node may run: its own limit from NODE_TIMEOUTS_S, capped by what is
+    left of the request deadline. None means unbounded.
+    """
+    budgets = []
+    if state.get('deadline') is not None:
+        budgets.append(state['deadline'] - time.monotonic())
+    if name in settings.NODE_TIMEOUTS_S:
+        budgets.append(settings.NODE_TIMEOUTS_S[name])
+    return min(budgets) if budgets else None
+
+def with_deadline(name: str, fn):
+    """
+    Runs a node under its time budget. Overrunning cancels the node (and with it any
+    in-flight LLM call or SQLite query) and fails the request with DeadlineExceeded.
+    """
+    @functools.wraps(fn)
+    async def node(state):
+        budget = node_budget(state, name)
+        if budget is not None and budget <= 0:
+            raise DeadlineExceeded(f"Request deadline passed before '{name}' could run")
+        try:
+            return await asyncio.wait_for(fn(state), timeout=budget)
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"'{name}' exceeded its time budget of {budget:.1f}s")
+    return node
+
+def with_span(name: str, fn):
+    """
+    Times a node as a "node" span, tagged with the cache outcomes it reports.
+    """
+    @functools.wraps(fn)
+    async def node(state):
+        with span("node", name) as timing:
+            update = await fn(state)
+            if update and update.get("cache_status"):
+                timing.attrs["cache"] = update["cache_status"]
+            return update
+    return node
 
-workflow.add_node("initializer", initializer_node)
-workflow.add_node("sql_writer", sql_writer_node)
-workflow.add_node("sql_executor", sql_executor_node) # Added this to actually get data
-workflow.add_node("chart_recommender", chart_recommender_node)
-workflow.add_node("data_analyst", data_analyst_node)
-workflow.add_node("merger", merger_node)
+def build_workflow(pipeline: Dict[str, Any]) -> StateGraph:
+    """
+    Wires a StateGraph from declared node dependencies.
+    Nodes without dependencies start the graph; nodes nothing depends on end it.
+    Every node runs under its deadline budget (see with_deadline) inside a timing span.
+    """
+    for name, (_, deps) in pipeline.items():
+        unknown = [d for d in deps if d not in pipeline]
+        if unknown:
+            raise ValueError(f"Node '{name}' depends on unknown nodes: {unknown}")
+
+    # Reject cycles (Kahn's algorithm)
+    remaining = {name: set(deps) for name, (_, deps) in pipeline.items()}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"Cyclic node dependencies: {sorted(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
 
-workflow.set_entry_point("initializer")
+    workflow = StateGraph(AgentState)
+    for name, (fn, _) in pipeline.items():
+        workflow.add_node(name, with_span(name, with_deadline(name, fn)))
+
+    upstream = set()
+    for name, (_, deps) in pipeline.items():
+        upstream.update(deps)
+        if not deps:
+            workflow.add_edge(START, name)
+        elif len(deps) == 1:
+            workflow.add_edge(deps[0], name)
+        else:
+            # Join: run once every dependency has finished
+            workflow.add_edge(list(deps), name)
 
-workflow.add_edge("initializer", "sql_writer")
-workflow.add_edge("sql_writer", "sql_executor")
-workflow.add_edge("sql_executor", "chart_recommender")
-workflow.add_edge("chart_recommender", "data_analyst")
-workflow.add_edge("data_analyst", "merger")
-workflow.add_edge("merger", END)
+    for name in pipeline:
+        if name not in upstream:
+            workflow.add_edge(name, END)
+    return workflow
+
+workflow = build_workflow(PIPELINE)
 
 # Compile
 app_graph = workflow.compile()
+
+# --- STREAMING EXECUTION ---
+
+def node_payload(node: str, update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extracts the client-facing part of a node update for progress events.
+    """
+    update = update or {}
+    if node == "initializer":
+        return {"entities": update.get("resolved_entities")}
+    if node == "sql_writer":
+        return {"sql": update.get("sql_query"), "cache": (update.get("cache_status") or {}).get("sql")}
+    if node == "sql_executor":
+        results = update.get("sql_results") or []
+        payload = {
+            "row_count": len(results),
+            "has_more": bool(update.get("result_handle")),
+            "cache": (update.get("cache_status") or {}).get("results"),
+        }
+        if results and isinstance(results[0], dict) and "error" in results[0]:
+            payload["error"] = results[0]["error"]
+        return payload
+    if node == "chart_recommender":
+        return {"chart": update.get("chart_config")}
+    if node == "data_analyst":
+        return {"analysis": update.get("analysis")}
+    return {"status": "complete"}
+
+async def astream_with_state(inputs: Dict[str, Any]):
+    """
+    Runs app_graph exactly once, yielding (node, update, state) as soon as each node finishes.
+    `state` is LangGraph's own merged AgentState as of the last completed step, refreshed in
+    place, so once the stream ends it is the final state.
+    """
+    state = dict(inputs)
+    async for mode, chunk in app_graph.astream(inputs, stream_mode=["updates", "values"]):
+        if mode == "values":
+            state.clear()
+            state.update(chunk)
+            continue
+        for node, update in chunk.items():
+            yield node, update, state
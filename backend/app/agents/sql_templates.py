@@ -0,0 +1,95 @@
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+class SqlTemplate(NamedTuple):
+    name: str
+    sql: str
+    confidence: float  # how sure we are the template answers the question as asked
+
+# Brands matched by name when no resolved entities are available (entity index disabled)
+TEMPLATE_BRANDS = ["Allegra", "Doliprane", "Dulcoflex"]
+
+BRAND_COUNT_SQL = "SELECT COUNT(DISTINCT PRODUCT_BRAND) as BRAND_COUNT FROM DIM_SOURCE_PRODUCT"
+
+BRAND_LIST_SQL = "SELECT DISTINCT PRODUCT_BRAND FROM DIM_SOURCE_PRODUCT"
+
+BRAND_SALES_SQL = """
+            SELECT
+                p.PRODUCT_BRAND,
+                SUM(s.VALUE_LC) as TOTAL_SALES
+            FROM FCT_SALES_NATIONAL_MTH s
+            JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID
+            WHERE p.PRODUCT_BRAND = '{brand}'
+            GROUP BY p.PRODUCT_BRAND
+            """
+
+BRANDS_SALES_SQL = """
+            SELECT
+                p.PRODUCT_BRAND,
+                SUM(s.VALUE_LC) as TOTAL_SALES
+            FROM FCT_SALES_NATIONAL_MTH s
+            JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID
+            WHERE p.PRODUCT_BRAND IN ({brands})
+            GROUP BY p.PRODUCT_BRAND
+            ORDER BY TOTAL_SALES DESC
+            """
+
+ALL_BRAND_SALES_SQL = """
+            SELECT
+                p.PRODUCT_BRAND,
+                SUM(s.VALUE_LC) as TOTAL_SALES
+            FROM FCT_SALES_NATIONAL_MTH s
+            JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID
+            GROUP BY p.PRODUCT_BRAND
+            ORDER BY TOTAL_SALES DESC
+            """
+
+FALLBACK_SQL = "SELECT COUNT(*) as TOTAL_ROWS FROM DIM_SOURCE_PRODUCT"
+
+def sql_literal(value: Any) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+def match_sql_template(query: str, entities: Optional[List[Dict[str, Any]]] = None) -> Optional[SqlTemplate]:
+    """
+    Deterministic keyword templates (brand count, brand list, per-brand and all-brand sales).
+    `entities` are the initializer's resolved entities; without them brands are found by
+    name from TEMPLATE_BRANDS. Returns None when no template applies.
+    """
+    query_lower = query.lower()
+    is_count = "count" in query_lower or "how many" in query_lower
+    is_list = "list" in query_lower or ("show" in query_lower and "all" in query_lower)
+    is_sales = "sales" in query_lower or "revenue" in query_lower
+
+    if is_count and "brand" in query_lower:
+        return SqlTemplate("brand_count", BRAND_COUNT_SQL, 0.95)
+    if is_list and "brand" in query_lower:
+        return SqlTemplate("brand_list", BRAND_LIST_SQL, 0.9)
+    if is_sales and entities is None:
+        for brand in TEMPLATE_BRANDS:
+            if brand.lower() in query_lower:
+                return SqlTemplate("brand_sales", BRAND_SALES_SQL.format(brand=brand), 0.9)
+        # Default to all brands; anything more specific in the question lowers confidence
+        return SqlTemplate("all_brand_sales", ALL_BRAND_SALES_SQL, 0.6)
+    if is_sales:
+        brands = [e for e in entities if e["type"] == "brand"]
+        # Templates filter on brands only; other resolved values (countries, periods, ...) need the LLM
+        confidence = 0.6 if len(brands) < len(entities) else 0.9
+        if not brands:
+            return SqlTemplate("all_brand_sales", ALL_BRAND_SALES_SQL, 0.6)
+        # Typo-tolerant matches are slightly less certain than exact ones
+        confidence *= min(e["score"] for e in brands)
+        values = list(dict.fromkeys(e["value"] for e in brands))
+        if len(values) == 1:
+            return SqlTemplate("brand_sales", BRAND_SALES_SQL.format(brand=str(values[0]).replace("'", "''")), confidence)
+        return SqlTemplate("brands_sales", BRANDS_SALES_SQL.format(brands=", ".join(sql_literal(v) for v in values)), confidence)
+    return None
+
+def sql_equivalent(a: str, b: str) -> bool:
+    """
+    True when two statements differ only in whitespace, keyword/identifier case or a
+    trailing semicolon. String literals are compared exactly.
+    """
+    def normalize(sql: str) -> str:
+        parts = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";"))
+        return "".join(p if p.startswith("'") else re.sub(r"\s+", " ", p).upper() for p in parts).strip()
+    return normalize(a) == normalize(b)
@@ -1,6 +1,23 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse
+from typing import Any, Dict, Optional
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
 from langchain_core.messages import HumanMessage
+from app.core.config import settings
+from app.services.cancellation import DeadlineExceeded
+from app.services.index_advisor import index_advisor
+from app.services.metrics import cache_events_total, requests_total, serialized_bytes_total
+from app.services.profiler import DEFAULT_PROFILE_DIR, PROFILE_SUFFIXES, Profiler
+from app.services.query_result import to_jsonable
+from app.services.result_store import result_store
+from app.services.snowflake_service import snowflake_service
+from app.services.tracing import failure_status, span, start_trace, trace_store
 
 router = APIRouter()
 
@@ -8,51 +25,355 @@ router = APIRouter()
 async def root():
     return {"message": "Hello from DataPella API"}
 
+@router.get("/advisor/indexes")
+async def recommend_indexes():
+    """
+    Index recommendations for the SQL workload recorded since startup (nothing is changed).
+    """
+    return await asyncio.to_thread(index_advisor.report, snowflake_service.workload.records())
+
+@router.post("/advisor/indexes/apply")
+async def apply_indexes(repeat: int = 3):
+    """
+    Creates the recommended indexes and reports the recorded workload's latency before and after.
+    """
+    return await asyncio.to_thread(index_advisor.report, snowflake_service.workload.records(), True, repeat)
+
+@router.get("/partitions")
+async def partition_stats():
+    """
+    Partitioned fact tables (rows per partition) and pruning statistics.
+    """
+    return await asyncio.to_thread(snowflake_service.partitions.stats)
+
+@router.post("/partitions/build")
+async def build_partitions(full: bool = False):
+    """
+    Partitions the configured fact tables: all partitions when `full` (or for tables not
+    partitioned yet), otherwise only those that gained rows.
+    """
+    partitions = snowflake_service.partitions
+    if full:
+        return await asyncio.to_thread(partitions.build)
+    missing = [t for t in partitions.tables if t not in partitions.manifest()]
+    built = await asyncio.to_thread(partitions.build, missing) if missing else {}
+    return {**built, **await asyncio.to_thread(partitions.refresh)}
+
+@router.get("/entities")
+async def resolve_entities(q: str):
+    """
+    Dimension values the entity index finds in `q`, plus index statistics.
+    """
+    index = snowflake_service.entity_index
+    matches = await asyncio.to_thread(snowflake_service.resolve_entities, q)
+    return {"entities": [match.as_dict() for match in matches], "index": index.stats()}
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    Spans recorded for a recent request (the trace_id its client was given).
+    """
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired trace")
+    return trace.summary()
+
+@router.get("/profiles/{trace_id}")
+async def get_profile(trace_id: str, format: str = "speedscope"):
+    """
+    Profile captured for a request, as speedscope JSON or collapsed stacks (`format=collapsed`).
+    """
+    if not re.fullmatch(r"[0-9a-f]{32}", trace_id) or format not in PROFILE_SUFFIXES:
+        raise HTTPException(status_code=400, detail="Invalid trace id or format")
+    path = os.path.join(settings.PROFILE_DIR or DEFAULT_PROFILE_DIR, trace_id + PROFILE_SUFFIXES[format])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="No profile for this trace")
+    return FileResponse(path)
+
+class ClientConnection:
+    """
+    One WebSocket plus its bounded outbound queue, drained by a dedicated writer task
+    so a slow client only ever delays itself.
+    """
+
+    def __init__(self, websocket: WebSocket, session_id: str, max_queue: int):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.writer_task = asyncio.create_task(self._writer())
+
+    async def _writer(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                if message is None:  # drain sentinel
+                    break
+                await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Send to {self.session_id} failed: {e}")
+        finally:
+            self.closed = True
+
+    async def close(self, drain_timeout: float = 0.0):
+        """
+        Stops the writer, optionally letting it flush what is already queued first.
+        """
+        self.closed = True
+        if drain_timeout > 0 and not self.writer_task.done():
+            try:
+                self.queue.put_nowait(None)
+                await asyncio.wait_for(asyncio.shield(self.writer_task), timeout=drain_timeout)
+            except (asyncio.QueueFull, asyncio.TimeoutError):
+                pass
+        self.writer_task.cancel()
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, max_queue: int = 64, send_timeout: float = 5.0):
+        self.active_connections: Dict[str, ClientConnection] = {}
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.dropped = 0
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket) -> str:
         await websocket.accept()
-        self.active_connections.append(websocket)
+        session_id = uuid.uuid4().hex
+        self.active_connections[session_id] = ClientConnection(websocket, session_id, self.max_queue)
+        return session_id
+
+    async def disconnect(self, session_id: str, drain: bool = False):
+        client = self.active_connections.pop(session_id, None)
+        if client is not None:
+            await client.close(drain_timeout=self.send_timeout if drain else 0.0)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+    async def _drop(self, client: ClientConnection, reason: str):
+        print(f"Dropping slow client {client.session_id}: {reason}")
+        self.dropped += 1
+        await self.disconnect(client.session_id)
+        try:
+            await client.websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def send(self, session_id: str, message: str) -> bool:
+        """
+        Queues a message for one session. Waits up to send_timeout for queue space
+        (backpressure); a client that stays full that long is dropped.
+        """
+        client = self.active_connections.get(session_id)
+        if client is None or client.closed:
+            return False
+        try:
+            await asyncio.wait_for(client.queue.put(message), timeout=self.send_timeout)
+            return True
+        except asyncio.TimeoutError:
+            await self._drop(client, "outbound queue full")
+            return False
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
+        """
+        Fan-out to every session without waiting on any of them; full queues are dropped.
+        """
+        full = []
+        for client in list(self.active_connections.values()):
+            try:
+                client.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                full.append(client)
+        await asyncio.gather(*(self._drop(client, "outbound queue full") for client in full))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_connections": len(self.active_connections),
+            "queued_messages": sum(c.queue.qsize() for c in self.active_connections.values()),
+            "dropped_connections": self.dropped,
+        }
 
-manager = ConnectionManager()
+manager = ConnectionManager(max_queue=settings.WS_SEND_QUEUE_SIZE, send_timeout=settings.WS_SEND_TIMEOUT_S)
+
+def parse_command(data: str) -> Optional[Dict[str, Any]]:
+    """
+    Client control messages are JSON objects with an "action" key; anything else is a question.
+    """
+    if not data.lstrip().startswith("{"):
+        return None
+    try:
+        command = json.loads(data)
+    except ValueError:
+        return None
+    return command if isinstance(command, dict) and "action" in command else None
+
+async def handle_command(session_id: str, command: Dict[str, Any]):
+    """
+    Result paging commands:
+      {"action": "fetch_page", "handle": "<id>", "page_size": 500}
+      {"action": "close_result", "handle": "<id>"}
+    Replies go to the requesting session only. ("cancel" and "profile" are handled by
+    the receive loop.)
+    """
+    action = command.get("action")
+    handle = command.get("handle")
+    if action == "fetch_page":
+        try:
+            page_size = int(command.get("page_size") or settings.RESULT_PAGE_SIZE)
+        except (TypeError, ValueError):
+            page_size = 0
+        if page_size <= 0:
+            reply = {"handle": handle, "error": f"page_size must be a positive integer, got {command.get('page_size')!r}"}
+            await manager.send(session_id, f"Result Page: {json.dumps(reply, default=to_jsonable)}")
+            return
+        page_size = min(page_size, settings.RESULT_PAGE_SIZE)
+        # Handles are only valid for the session that opened them
+        page = await asyncio.to_thread(result_store.fetch_page, handle, page_size, session_id)
+        if page is None:
+            reply = {"handle": handle, "error": "Unknown or expired result handle"}
+        else:
+            reply = {"handle": handle, "columns": page.columns, "rows": page, "has_more": result_store.get(handle, session_id) is not None}
+        await manager.send(session_id, f"Result Page: {json.dumps(reply, default=to_jsonable)}")
+    elif action == "close_result":
+        if result_store.close(handle, owner=session_id):
+            await manager.send(session_id, f"Result Closed: {json.dumps({'handle': handle})}")
+        else:
+            await manager.send(session_id, f"Result Closed: {json.dumps({'handle': handle, 'error': 'Unknown or expired result handle'})}")
+    else:
+        await manager.send(session_id, f"Error: Unknown action {action!r}")
+
+def serialize(message: str, payload: Any) -> str:
+    """
+    JSON-encodes a client message body as a "serialize" span, counting the bytes produced.
+    """
+    with span("serialize", message) as timing:
+        body = json.dumps(payload, default=to_jsonable)
+        timing.attrs["bytes"] = len(body)
+    serialized_bytes_total.inc(len(body), message=message)
+    return body
+
+async def save_profile(session_id: str, trace, profiler: Profiler):
+    """
+    Stops a request's profiler, writes the capture and tells the client where it is.
+    """
+    profiler.stop()
+    trace.profiler = None
+    directory = settings.PROFILE_DIR or DEFAULT_PROFILE_DIR
+    paths = await asyncio.to_thread(profiler.save, directory, trace.trace_id, settings.PROFILE_FORMATS)
+    trace.profile_files = paths
+    print(f"Profile for {trace.trace_id}: {profiler.sample_count} samples in {profiler.duration_s:.2f}s -> {directory}")
+    info = {"trace_id": trace.trace_id, "samples": profiler.sample_count, "files": [os.path.basename(p) for p in paths]}
+    await manager.send(session_id, f"Profile: {json.dumps(info)}")
+
+async def answer_question(session_id: str, data: str, profile: bool = False):
+    from app.agents.graph import astream_with_state, node_payload
+    # Every span below (nodes, LLM calls, queries, serialization) is recorded on this trace
+    trace = start_trace()
+    await manager.send(session_id, f"User said: {data}")
+    await manager.send(session_id, f"Trace: {json.dumps({'trace_id': trace.trace_id})}")
+    
+    # Marked or sampled questions are profiled; the others pay no profiling cost at all
+    profiler = None
+    if profile or (settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE):
+        profiler = Profiler(interval=settings.PROFILE_INTERVAL_S)
+        trace.profiler = profiler
+        profiler.start()
+    
+    # Initial state; every node and query runs against the request deadline
+    inputs = {
+        "user_query": data,
+        "session_id": session_id,
+        "deadline": time.monotonic() + settings.REQUEST_TIMEOUT_S,
+        "messages": [HumanMessage(content=data)],
+    }
+    
+    try:
+        with span("request", "question"):
+            # Run graph once, streaming per-node payloads and accumulating the final state
+            final_state = inputs
+            async for node, update, state in astream_with_state(inputs):
+                final_state = state
+                payload = serialize(node, node_payload(node, update))
+                await manager.send(session_id, f"Agent Update [{node}]: {payload}")
+            
+            final_response = final_state.get("final_response")
+            if isinstance(final_response, dict):
+                final_response = {**final_response, "trace_id": trace.trace_id}
+            await manager.send(session_id, f"Final Response: {serialize('final_response', final_response)}")
+    except BaseException as e:
+        requests_total.inc(status=failure_status(e))
+        raise
+    finally:
+        if profiler is not None:
+            await asyncio.shield(save_profile(session_id, trace, profiler))
+    requests_total.inc(status="ok")
+    for cache, status in (final_state.get("cache_status") or {}).items():
+        cache_events_total.inc(cache=cache, status=status)
+
+async def question_worker(session_id: str, questions: asyncio.Queue, current: Dict[str, Optional[asyncio.Task]]):
+    """
+    Answers a session's questions one at a time, off the receive loop, so the socket keeps
+    being read (cancel requests, disconnects) while the graph runs.
+    The running question is exposed as current["task"] for cancellation.
+    """
+    while True:
+        data, profile = await questions.get()
+        task = asyncio.create_task(answer_question(session_id, data, profile))
+        current["task"] = task
+        try:
+            # wait() rather than await: cancelling the worker must not be confused with cancelling the question
+            await asyncio.wait({task})
+        finally:
+            current["task"] = None
+            if not task.done():
+                task.cancel()
+        if task.cancelled():
+            await manager.send(session_id, "Error: Request cancelled")
+            continue
+        # A failed question is reported and the session goes on answering the next one
+        error = task.exception()
+        if isinstance(error, DeadlineExceeded):
+            await manager.send(session_id, f"Error: {error}")
+        elif error is not None:
+            print(f"Error: {error}")
+            await manager.send(session_id, f"Error: {str(error)}")
+
+async def enqueue_question(session_id: str, questions: asyncio.Queue, question: str, profile: bool):
+    # A client can't pile up graph runs: beyond the limit, questions are refused, not queued
+    try:
+        questions.put_nowait((question, profile))
+    except asyncio.QueueFull:
+        await manager.send(session_id, f"Error: Too many pending questions (at most {questions.maxsize}); wait for an answer or cancel")
 
 @router.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    session_id = await manager.connect(websocket)
+    questions: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.WS_MAX_PENDING_QUESTIONS))
+    current: Dict[str, Optional[asyncio.Task]] = {"task": None}
+    worker = asyncio.create_task(question_worker(session_id, questions, current))
     try:
-        from app.agents.graph import app_graph
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast(f"User said: {data}")
-            
-            # Initial state
-            inputs = {"user_query": data, "messages": [HumanMessage(content=data)]}
-            
-            # Run graph
-            async for event in app_graph.astream(inputs):
-                for key, value in event.items():
-                    await manager.broadcast(f"Agent Update [{key}]: Processing complete.")
-            
-            # Final result extraction (simplified for streaming demo)
-            # In real usage, we'd pick the final state
-            final_state = await app_graph.ainvoke(inputs)
-            final_response = final_state.get("final_response")
-            
-            import json
-            await manager.broadcast(f"Final Response: {json.dumps(final_response)}")
+            command = parse_command(data)
+            if command is None:
+                await enqueue_question(session_id, questions, data, False)
+            elif command.get("action") == "profile":
+                # {"action": "profile", "question": "..."} answers the question under the profiler
+                await enqueue_question(session_id, questions, str(command.get("question") or ""), True)
+            elif command.get("action") == "cancel":
+                # {"action": "cancel"} abandons the question being answered
+                if current["task"] is not None:
+                    current["task"].cancel()
+            else:
+                await handle_command(session_id, command)
             
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        await manager.disconnect(session_id)
     except Exception as e:
         print(f"Error: {e}")
-        await manager.broadcast(f"Error: {str(e)}")
-        manager.disconnect(websocket)
+        await manager.disconnect(session_id)
+    finally:
+        # Stop work nobody is waiting for: cancelling the worker cancels the running graph,
+        # which interrupts its LLM call and any SQLite statement via the request's CancelToken
+        worker.cancel()
+        await asyncio.gather(worker, return_exceptions=True)
+        # Release server-side cursors (and their pooled connections) held for this session
+        result_store.close_owner(session_id)
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -15,6 +16,97 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: str = "mock-aws-secret"
     AWS_REGION: str = "us-east-1"
     
+    # Schema catalog: seconds between PRAGMA schema_version checks
+    SCHEMA_CHECK_INTERVAL_S: float = 5.0
+    # Prune the SQL writer's schema context to the tables relevant to the question
+    SCHEMA_PRUNING_ENABLED: bool = True
+    SCHEMA_CONTEXT_TOKEN_BUDGET: int = 1500
+    
+    # Read-only SQLite connection pool used by SnowflakeService
+    SQLITE_POOL_SIZE: int = 8
+    SQLITE_POOL_TIMEOUT_S: float = 10.0
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE_KB: int = 32 * 1024
+    
+    # Result paging: rows kept in AgentState, rows per WebSocket page, open server-side cursors
+    # (in total, capped below SQLITE_POOL_SIZE since each holds a connection, and per session)
+    RESULT_PREVIEW_ROWS: int = 200
+    RESULT_PAGE_SIZE: int = 500
+    RESULT_MAX_OPEN_CURSORS: int = 4
+    RESULT_MAX_OPEN_CURSORS_PER_SESSION: int = 2
+    RESULT_CURSOR_IDLE_TIMEOUT_S: float = 120.0
+    
+    # Two-level query cache: normalized question -> SQL, canonical SQL -> results
+    QUERY_CACHE_ENABLED: bool = True
+    SQL_CACHE_MAX_ENTRIES: int = 1024
+    SQL_CACHE_TTL_S: float = 3600.0
+    RESULT_CACHE_MAX_ENTRIES: int = 256
+    RESULT_CACHE_TTL_S: float = 300.0
+    
+    # Per-connection WebSocket delivery: outbound queue size, backpressure timeout and questions waiting behind the one being answered
+    WS_SEND_QUEUE_SIZE: int = 64
+    WS_SEND_TIMEOUT_S: float = 5.0
+    WS_MAX_PENDING_QUESTIONS: int = 4
+    
+    # Speculative execution of keyword SQL templates while the LLM is generating
+    SPECULATIVE_SQL_ENABLED: bool = True
+    SPECULATIVE_MIN_CONFIDENCE: float = 0.8
+    SPECULATIVE_LATENCY_BUDGET_S: float = 2.0
+    
+    # Deadlines: whole request, and per-node limits (node name -> seconds)
+    REQUEST_TIMEOUT_S: float = 60.0
+    NODE_TIMEOUTS_S: Dict[str, float] = {"sql_writer": 30.0, "sql_executor": 20.0}
+    
+    # Query cost guard (EXPLAIN QUERY PLAN based; cost = estimated row visits)
+    QUERY_COST_GUARD_ENABLED: bool = True
+    QUERY_COST_MAX_ROWS: float = 20_000_000
+    QUERY_COST_AUTO_LIMIT: int = 10_000
+    QUERY_COST_RETRIES: int = 1
+    
+    # Materialized sales rollups (refreshed incrementally) and query routing to them
+    ROLLUP_ROUTING_ENABLED: bool = True
+    ROLLUP_REFRESH_ON_STARTUP: bool = True
+    
+    # Workload recording (executed SQL + timings) for the index advisor
+    WORKLOAD_RECORDING_ENABLED: bool = True
+    WORKLOAD_MAX_RECORDS: int = 2000
+    WORKLOAD_LOG_PATH: Optional[str] = None
+    
+    # Warehouse database file (e.g. one built by database/generate_mock_data.py); defaults to the bundled mock
+    WAREHOUSE_DB_PATH: Optional[str] = None
+    
+    # Query engine: "sqlite", "columnar" (aggregates it supports run in-process) or "auto" (columnar for large tables only)
+    QUERY_ENGINE: str = "auto"
+    COLUMNAR_MIN_ROWS: int = 100_000
+    
+    # Year partitions of the large fact tables (attached per query, pruned by calendar predicates); PARTITION_DIR defaults to <database dir>/partitions
+    PARTITIONING_ENABLED: bool = True
+    PARTITIONED_TABLES: List[str] = ["FCT_SALES_NATIONAL_WK", "FCT_SALES_NATIONAL_MTH", "FCT_SALES_NATIONAL_QTR"]
+    PARTITION_DIR: Optional[str] = None
+    PARTITION_BUILD_WORKERS: int = 4
+    PARTITION_MAX_ATTACHED: int = 8
+    PARTITION_REFRESH_ON_STARTUP: bool = True
+    
+    # Entity resolution in the initializer (in-memory index over dimension values; fuzzy matches need ENTITY_MIN_SCORE edit similarity)
+    ENTITY_INDEX_ENABLED: bool = True
+    ENTITY_MIN_SCORE: float = 0.8
+    ENTITY_CHECK_INTERVAL_S: float = 5.0
+    
+    # Timing spans per request (graph nodes, LLM calls, queries, serialization) exported on /metrics; recent traces kept by id
+    TELEMETRY_ENABLED: bool = True
+    TRACE_MAX_RECENT: int = 200
+    TRACE_MAX_SPANS: int = 500
+    
+    # Request profiling: {"action": "profile", "question": ...} over the WebSocket, or a sampled fraction of questions;
+    # captures go to PROFILE_DIR (defaults to <backend>/profiles) as speedscope JSON and/or collapsed stacks
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_S: float = 0.005
+    PROFILE_FORMATS: List[str] = ["speedscope", "collapsed"]
+    PROFILE_DIR: Optional[str] = None
+    
+    # Cold start: compile the agent graph, load the schema catalog / entity index and build LLM clients in startup_event
+    WARM_UP_ON_STARTUP: bool = True
+    
     # Anthropic API Key
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "mock-ant-key")
     
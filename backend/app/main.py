@@ -1,9 +1,22 @@
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+import importlib
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api.endpoints import router as api_router
 from app.core.config import settings
+from app.services.llm_factory import llm_factory
+from app.services.metrics import metrics, span_seconds
+from app.services.snowflake_service import snowflake_service
+from app.services.tracing import span
 import logging
 
+# Everything the app imports at module load (provider SDKs are imported on first use instead)
+IMPORT_TIME_S = time.perf_counter() - _import_started
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -24,6 +37,35 @@ app.include_router(api_router, prefix="/api")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def warm_up():
+    """
+    Does the first question's one-off work before the server accepts connections:
+    compiles the agent graph, loads the schema catalog and entity index, builds the LLM
+    clients. Each phase is timed as a "startup" span.
+    """
+    with span("startup", "graph") as graph:
+        importlib.import_module("app.agents.graph")  # compiles app_graph
+    with span("startup", "warehouse") as warehouse:
+        await asyncio.to_thread(snowflake_service.warm_up)
+    with span("startup", "llm") as llm:
+        llm_factory.warm_up()
+    timings = {timing.name: round(timing.duration_s, 3) for timing in (graph, warehouse, llm)}
+    logger.info(f"Warm-up done: {timings} s; LLM clients: {llm_factory.stats()}")
+
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Starting up Multi-Agent Analytics Platform...")
+    logger.info(f"Starting up Multi-Agent Analytics Platform (imports took {IMPORT_TIME_S:.3f} s)...")
+    span_seconds.observe(IMPORT_TIME_S, kind="startup", name="import", status="ok")
+    if settings.ROLLUP_REFRESH_ON_STARTUP:
+        folded = await asyncio.to_thread(snowflake_service.rollups.refresh)
+        logger.info(f"Sales rollups refreshed: {folded}")
+    if settings.PARTITIONING_ENABLED and settings.PARTITION_REFRESH_ON_STARTUP:
+        loaded = await asyncio.to_thread(snowflake_service.partitions.refresh)
+        logger.info(f"Fact partitions refreshed: {loaded}")
+    if settings.WARM_UP_ON_STARTUP:
+        await warm_up()
@@ -0,0 +1,81 @@
+import asyncio
+import sqlite3
+import time
+from typing import Any, Callable, Optional
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request (or one of its steps) runs past its deadline."""
+
+class CancelToken:
+    """
+    Cooperative cancellation for blocking work running in worker threads.
+
+    A token expires when it is cancelled explicitly or when its deadline
+    (a time.monotonic() timestamp) passes. SQLite checks it via a progress handler.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.deadline = deadline
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def expired(self) -> bool:
+        return self.cancelled or (self.deadline is not None and time.monotonic() >= self.deadline)
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0.0)
+
+class QueryGuard:
+    """
+    Holder for the token currently governing a connection, so one progress handler can
+    serve successive operations (e.g. each page fetched from a server-side cursor).
+    """
+
+    def __init__(self, token: Optional[CancelToken] = None):
+        self.token = token
+
+    def __call__(self) -> int:
+        # Non-zero aborts the running statement with "interrupted"
+        return 1 if self.token is not None and self.token.expired() else 0
+
+# SQLite VM instructions between progress handler calls
+PROGRESS_HANDLER_STEPS = 10_000
+
+def install_guard(conn: sqlite3.Connection, guard: QueryGuard):
+    conn.set_progress_handler(guard, PROGRESS_HANDLER_STEPS)
+
+def interrupted_error(e: Exception, token: Optional[CancelToken]) -> Exception:
+    """
+    Maps SQLite's "interrupted" error onto DeadlineExceeded/CancelledError when it was ours.
+    """
+    if token is not None and isinstance(e, sqlite3.OperationalError) and "interrupt" in str(e):
+        if token.cancelled:
+            return asyncio.CancelledError()
+        return DeadlineExceeded("Query exceeded its time budget")
+    return e
+
+def raise_if_expired(token: Optional[CancelToken]):
+    """
+    Checkpoint for blocking work outside SQLite: raises what interrupted_error maps
+    SQLite's interruptions to.
+    """
+    if token is not None and token.expired():
+        if token.cancelled:
+            raise asyncio.CancelledError()
+        raise DeadlineExceeded("Query exceeded its time budget")
+
+async def run_in_thread(token: Optional[CancelToken], fn: Callable[..., Any], *args) -> Any:
+    """
+    asyncio.to_thread that also cancels the token when the awaiting task is cancelled,
+    so the blocking work stops instead of running on in the background.
+    """
+    try:
+        return await asyncio.to_thread(fn, *args)
+    except asyncio.CancelledError:
+        if token is not None:
+            token.cancel()
+        raise
@@ -0,0 +1,761 @@
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.cancellation import CancelToken, QueryGuard, raise_if_expired
+from app.services.query_engines import MaterializedCursor, QueryEngine
+from app.services.query_result import QueryResult
+
+class Unsupported(Exception):
+    """The statement is outside what the columnar engine runs; SQLite handles it instead."""
+
+# Column storage
+
+@dataclass
+class Column:
+    values: np.ndarray  # int32 codes into `dictionary` (-1 = NULL) for text, float64 (NaN = NULL) otherwise
+    dictionary: Optional[List[str]] = None
+    integer: bool = False  # every non-NULL value is an integer (SUM/MIN/MAX then return ints, like SQLite)
+    text_affinity: bool = True
+
+    @property
+    def is_text(self) -> bool:
+        return self.dictionary is not None
+
+def _affinity_is_text(declared: str) -> bool:
+    return any(word in declared for word in ("CHAR", "CLOB", "TEXT"))
+
+class ColumnStore:
+    """
+    Typed, array-backed copies of table columns in rowid order. Columns are read from
+    SQLite the first time a query needs them and all of them are dropped when the data
+    fingerprint moves. Text is dictionary encoded; numbers are float64 with NaN for NULL.
+    """
+
+    def __init__(self, fingerprint: Callable[[], Hashable]):
+        self._fingerprint = fingerprint
+        self._columns: Dict[Tuple[str, str], Column] = {}
+        self._schemas: Dict[str, Dict[str, Tuple[str, str]]] = {}
+        self._loaded_at: Optional[Hashable] = None
+        self._lock = threading.Lock()
+
+    def _sync_locked(self):
+        fingerprint = self._fingerprint()
+        if fingerprint != self._loaded_at:
+            self._columns, self._schemas, self._loaded_at = {}, {}, fingerprint
+
+    def schema(self, conn: sqlite3.Connection, table: str) -> Dict[str, Tuple[str, str]]:
+        """
+        {UPPERCASE column name: (declared name, declared type)} for a table.
+        """
+        with self._lock:
+            self._sync_locked()
+            schema = self._schemas.get(table)
+        if schema is None:
+            rows = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+            if not rows:
+                raise Unsupported(f"unknown table {table}")
+            schema = {name.upper(): (name, (declared or "").upper()) for _, name, declared, *_ in rows}
+            with self._lock:
+                self._schemas[table] = schema
+        return schema
+
+    def column(self, conn: sqlite3.Connection, table: str, name: str) -> Column:
+        key = (table, name)
+        with self._lock:
+            self._sync_locked()
+            column = self._columns.get(key)
+        if column is None:
+            column = self._load(conn, table, *self.schema(conn, table)[name])
+            with self._lock:
+                self._columns[key] = column
+        return column
+
+    @staticmethod
+    def _load(conn: sqlite3.Connection, table: str, name: str, declared: str) -> Column:
+        values = [v for (v,) in conn.execute(f'SELECT "{name}" FROM "{table}" ORDER BY rowid')]
+        text_affinity = _affinity_is_text(declared)
+        if text_affinity or any(isinstance(v, (str, bytes)) for v in values):
+            if not all(v is None or isinstance(v, str) for v in values):
+                raise Unsupported(f"{table}.{name} mixes text with other types")
+            lookup: Dict[str, int] = {}
+            codes = np.fromiter(
+                (-1 if v is None else lookup.setdefault(v, len(lookup)) for v in values), dtype=np.int32, count=len(values)
+            )
+            return Column(codes, list(lookup), text_affinity=text_affinity)
+        integer = all(isinstance(v, int) for v in values if v is not None)
+        array = np.array(values, dtype=np.float64)
+        if integer and array.size and np.nanmax(np.abs(array), initial=0) >= 2 ** 53:
+            raise Unsupported(f"{table}.{name} holds integers too large for exact float sums")
+        return Column(array, integer=integer, text_affinity=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "columns": len(self._columns),
+                "bytes": sum(c.values.nbytes for c in self._columns.values()),
+            }
+
+# Query shape
+
+@dataclass(frozen=True)
+class ColumnRef:
+    qualifier: Optional[str]  # table name or alias, uppercased
+    name: str  # uppercased
+
+@dataclass
+class TableRef:
+    name: str  # as declared in the schema
+    key: str  # alias (or table name) used to qualify its columns, uppercased
+
+@dataclass
+class SelectItem:
+    text: str  # source text; SQLite names unaliased expressions after it
+    alias: Optional[str] = None
+    column: Optional[ColumnRef] = None  # plain column reference
+    func: Optional[str] = None  # aggregate function
+    arg: Optional[ColumnRef] = None  # aggregate argument (None for COUNT(*))
+    distinct: bool = False
+
+    @property
+    def signature(self):
+        return (self.func, self.arg, self.distinct) if self.func else self.column
+
+@dataclass
+class Predicate:
+    column: ColumnRef
+    op: str  # =, !=, <, <=, >, >=, IN, BETWEEN, LIKE, NULL
+    values: Tuple[Any, ...] = ()
+    negated: bool = False
+
+@dataclass
+class AggregateQuery:
+    tables: List[TableRef]
+    joins: List[Tuple[ColumnRef, ColumnRef]]  # ON equalities
+    where: List[Predicate]
+    select: List[SelectItem]
+    group_by: List[ColumnRef]
+    order_by: List[Tuple[int, bool]] = field(default_factory=list)  # (select item index, descending)
+    limit: Optional[int] = None
+    offset: int = 0
+
+AGGREGATES = ("SUM", "TOTAL", "COUNT", "AVG", "MIN", "MAX")
+_KEYWORDS = {
+    "SELECT", "FROM", "WHERE", "GROUP", "BY", "ORDER", "HAVING", "LIMIT", "OFFSET", "JOIN", "INNER", "LEFT", "RIGHT",
+    "FULL", "OUTER", "CROSS", "NATURAL", "ON", "USING", "AND", "OR", "NOT", "IN", "IS", "NULL", "LIKE", "GLOB",
+    "BETWEEN", "AS", "ASC", "DESC", "UNION", "INTERSECT", "EXCEPT", "WITH", "DISTINCT", "CASE", "WHEN", "THEN",
+    "ELSE", "END", "NULLS", "WINDOW", "OVER", "ESCAPE", "COLLATE",
+}
+_TOKEN = re.compile(
+    r"\s*(?:(?P<string>'(?:[^']|'')*')"
+    r"|(?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<ident>[A-Za-z_][\w$]*|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\])"
+    r"|(?P<op><=|>=|<>|!=|==|\|\||[-+*/%(),.;=<>]))"
+)
+_FLIPPED = {"=": "=", "!=": "!=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+def _tokenize(sql: str) -> List[Tuple[str, Any, int, int]]:
+    tokens, pos = [], 0
+    while pos < len(sql):
+        if not sql[pos:].strip():
+            break
+        match = _TOKEN.match(sql, pos)
+        if match is None:
+            raise Unsupported(f"unexpected input at {pos}")
+        kind = match.lastgroup
+        text, start = match.group(kind), match.start(kind)
+        if kind == "string":
+            value = text[1:-1].replace("''", "'")
+        elif kind == "number":
+            value = float(text) if any(c in text for c in ".eE") else int(text)
+        elif kind == "ident" and text[0] in "\"`[":
+            kind, value = "quoted", text[1:-1].replace('""', '"')
+        else:
+            value = text.upper() if kind == "ident" else text
+        tokens.append((kind, value, start, match.end()))
+        pos = match.end()
+    return tokens
+
+class _Parser:
+    """
+    Recursive-descent parser for the aggregate shape the columnar engine runs:
+
+        SELECT <columns and SUM/TOTAL/COUNT/AVG/MIN/MAX(column | *)>
+        FROM t [[INNER] JOIN t2 ON a.x = b.y [AND <predicate>]]...
+        [WHERE <predicate> [AND <predicate>]...] [GROUP BY columns]
+        [ORDER BY output columns] [LIMIT n [OFFSET m]]
+
+    with comparison, IN, BETWEEN, LIKE and IS NULL predicates against literals.
+    Anything else raises Unsupported.
+    """
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.tokens = _tokenize(sql)
+        self.pos = 0
+
+    def peek(self, offset: int = 0):
+        index = self.pos + offset
+        return self.tokens[index] if index < len(self.tokens) else ("end", None, len(self.sql), len(self.sql))
+
+    def accept(self, *values) -> bool:
+        kind, value, *_ = self.peek()
+        if kind in ("ident", "op") and value in values:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, *values):
+        if not self.accept(*values):
+            raise Unsupported(f"expected {' or '.join(values)} at {self.peek()[2]}")
+
+    def identifier(self) -> str:
+        kind, value, *_ = self.peek()
+        if kind == "quoted" or (kind == "ident" and value not in _KEYWORDS):
+            self.pos += 1
+            return value.upper()
+        raise Unsupported(f"expected an identifier at {self.peek()[2]}")
+
+    def optional_alias(self) -> Optional[str]:
+        # Returned as written: SQLite names result columns after the alias verbatim
+        explicit = self.accept("AS")
+        kind, value, start, end = self.peek()
+        if kind == "quoted" or (kind == "ident" and value not in _KEYWORDS):
+            self.pos += 1
+            return value if kind == "quoted" else self.sql[start:end]
+        if explicit:
+            raise Unsupported(f"expected an alias at {start}")
+        return None
+
+    def column_ref(self) -> ColumnRef:
+        name = self.identifier()
+        if self.accept("."):
+            return ColumnRef(name, self.identifier())
+        return ColumnRef(None, name)
+
+    def literal(self):
+        negative = self.accept("-")
+        kind, value, *_ = self.peek()
+        if kind == "number":
+            self.pos += 1
+            return -value if negative else value
+        if kind == "string" and not negative:
+            self.pos += 1
+            return value
+        raise Unsupported(f"expected a literal at {self.peek()[2]}")
+
+    def parse(self) -> AggregateQuery:
+        self.expect("SELECT")
+        if self.accept("DISTINCT", "ALL"):
+            raise Unsupported("SELECT DISTINCT")
+        select = [self.select_item()]
+        while self.accept(","):
+            select.append(self.select_item())
+        if not any(item.func for item in select):
+            raise Unsupported("not an aggregate query")
+
+        self.expect("FROM")
+        tables = [self.table_ref()]
+        joins, where = [], []
+        while True:
+            self.accept("INNER")
+            if not self.accept("JOIN"):
+                break
+            tables.append(self.table_ref())
+            self.expect("ON")
+            on = self.conjunction()
+            equalities = [p for p in on if isinstance(p, tuple)]
+            if len(equalities) != 1:
+                raise Unsupported("JOIN needs exactly one column equality")
+            joins.append(equalities[0])
+            where += [p for p in on if not isinstance(p, tuple)]
+        if self.accept("WHERE"):
+            predicates = self.conjunction()
+            if any(isinstance(p, tuple) for p in predicates):
+                raise Unsupported("join condition in WHERE")
+            where += predicates
+
+        group_by = []
+        if self.accept("GROUP"):
+            self.expect("BY")
+            group_by.append(self.column_ref())
+            while self.accept(","):
+                group_by.append(self.column_ref())
+        order_by = []
+        if self.accept("ORDER"):
+            self.expect("BY")
+            order_by.append(self.order_key(select))
+            while self.accept(","):
+                order_by.append(self.order_key(select))
+        limit, offset = None, 0
+        if self.accept("LIMIT"):
+            limit = self.literal()
+            if self.accept("OFFSET"):
+                offset = self.literal()
+            elif self.accept(","):
+                limit, offset = self.literal(), limit
+            if not isinstance(limit, int) or not isinstance(offset, int):
+                raise Unsupported("non-integer LIMIT")
+            limit = None if limit < 0 else limit
+        self.accept(";")
+        if self.peek()[0] != "end":
+            raise Unsupported(f"unsupported clause at {self.peek()[2]}")
+        return AggregateQuery(tables, joins, where, select, group_by, order_by, limit, max(offset, 0))
+
+    def table_ref(self) -> TableRef:
+        name = self.identifier()
+        if self.accept("."):
+            name = self.identifier()  # schema-qualified (e.g. main.TABLE)
+        alias = self.optional_alias()
+        return TableRef(name, alias.upper() if alias else name)
+
+    def select_item(self) -> SelectItem:
+        start = self.peek()[2]
+        kind, value, *_ = self.peek()
+        if kind == "ident" and value in AGGREGATES and self.peek(1)[1] == "(":
+            self.pos += 2
+            item = SelectItem("", func=value, distinct=self.accept("DISTINCT"))
+            if self.accept("*"):
+                if value != "COUNT" or item.distinct:
+                    raise Unsupported(f"{value}(*)")
+            else:
+                item.arg = self.column_ref()
+            self.expect(")")
+        else:
+            item = SelectItem("", column=self.column_ref())
+        item.text = self.sql[start:self.tokens[self.pos - 1][3]]
+        if self.peek()[1] not in (",", "FROM"):
+            item.alias = self.optional_alias()
+        if self.peek()[1] not in (",", "FROM"):
+            raise Unsupported(f"unsupported select expression at {start}")
+        return item
+
+    def conjunction(self) -> list:
+        items = [self.predicate()]
+        while self.accept("AND"):
+            items.append(self.predicate())
+        if self.peek()[1] == "OR":
+            raise Unsupported("OR")
+        return items
+
+    def predicate(self):
+        if self.peek()[0] in ("number", "string") or self.peek()[1] == "-":
+            value = self.literal()
+            kind, op, *_ = self.peek()
+            if op not in _FLIPPED and op != "==":
+                raise Unsupported(f"unsupported predicate at {self.peek()[2]}")
+            self.pos += 1
+            return Predicate(self.column_ref(), _FLIPPED.get(op, "="), (value,))
+        column = self.column_ref()
+        kind, op, *_ = self.peek()
+        if kind == "op" and op in ("=", "==", "!=", "<>", "<", "<=", ">", ">="):
+            self.pos += 1
+            op = {"==": "=", "<>": "!="}.get(op, op)
+            kind, *_ = self.peek()
+            if kind in ("ident", "quoted"):
+                if op != "=":
+                    raise Unsupported("column comparison")
+                return (column, self.column_ref())
+            return Predicate(column, op, (self.literal(),))
+        if self.accept("IS"):
+            negated = self.accept("NOT")
+            self.expect("NULL")
+            return Predicate(column, "NULL", (), negated)
+        negated = self.accept("NOT")
+        if self.accept("IN"):
+            self.expect("(")
+            values = [self.literal()]
+            while self.accept(","):
+                values.append(self.literal())
+            self.expect(")")
+            return Predicate(column, "IN", tuple(values), negated)
+        if self.accept("BETWEEN"):
+            low = self.literal()
+            self.expect("AND")
+            return Predicate(column, "BETWEEN", (low, self.literal()), negated)
+        if self.accept("LIKE"):
+            pattern = self.literal()
+            if not isinstance(pattern, str) or self.peek()[1] == "ESCAPE":
+                raise Unsupported("LIKE pattern")
+            return Predicate(column, "LIKE", (pattern,), negated)
+        raise Unsupported(f"unsupported predicate at {self.peek()[2]}")
+
+    def order_key(self, select: List[SelectItem]) -> Tuple[int, bool]:
+        kind, value, *_ = self.peek()
+        if kind == "number":
+            self.pos += 1
+            if not isinstance(value, int) or not 1 <= value <= len(select):
+                raise Unsupported("ORDER BY position")
+            index = value - 1
+        elif kind == "ident" and value in AGGREGATES and self.peek(1)[1] == "(":
+            start = self.pos
+            probe = self.select_item_signature()
+            index = next((i for i, item in enumerate(select) if item.func and item.signature == probe), None)
+            if index is None:
+                self.pos = start
+                raise Unsupported("ORDER BY an aggregate that is not selected")
+        else:
+            ref = self.column_ref()
+            index = next((i for i, item in enumerate(select) if ref.qualifier is None and (item.alias or "").upper() == ref.name), None)
+            if index is None:
+                index = next((i for i, item in enumerate(select) if item.column == ref), None)
+            if index is None:
+                raise Unsupported("ORDER BY a column that is not selected")
+        if self.accept("NULLS", "COLLATE"):
+            raise Unsupported("ORDER BY modifiers")
+        descending = self.accept("DESC")
+        if not descending:
+            self.accept("ASC")
+        return index, descending
+
+    def select_item_signature(self):
+        func = self.peek()[1]
+        self.pos += 2
+        distinct = self.accept("DISTINCT")
+        arg = None if self.accept("*") else self.column_ref()
+        self.expect(")")
+        return func, arg, distinct
+
+def parse_aggregate(sql: str) -> AggregateQuery:
+    """
+    Parses an aggregate query in the shape the columnar engine runs (raises Unsupported otherwise).
+    """
+    return _Parser(sql).parse()
+
+# Execution
+
+def _like_regex(pattern: str) -> "re.Pattern":
+    # SQLite LIKE: % and _ wildcards, case-insensitive for ASCII only
+    parts = ("." * (ch == "_") + ".*" * (ch == "%") or re.escape(ch) for ch in pattern)
+    return re.compile("".join(parts), re.IGNORECASE | re.ASCII | re.DOTALL)
+
+def _text_literal(column: Column, value):
+    # TEXT affinity converts numeric operands to text; other affinities would compare as numbers
+    if isinstance(value, str):
+        if not column.text_affinity:
+            try:
+                float(value)
+            except ValueError:
+                return value
+            raise Unsupported("numeric literal against a non-TEXT column holding text")
+        return value
+    if not column.text_affinity:
+        raise Unsupported("number compared with text")
+    return repr(value) if isinstance(value, float) else str(value)
+
+def _numeric_literal(value) -> float:
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            raise Unsupported("text compared with a numeric column")
+    return float(value)
+
+_COMPARE = {
+    "=": lambda a, b: a == b, "!=": lambda a, b: a != b, "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+}
+
+def _evaluate(predicate: Predicate, column: Column) -> np.ndarray:
+    """
+    Row mask over a table's own rows. NULL never satisfies a predicate (except IS NULL).
+    """
+    op, values = predicate.op, predicate.values
+    if op == "NULL":
+        nulls = column.values < 0 if column.is_text else np.isnan(column.values)
+        return ~nulls if predicate.negated else nulls
+    if column.is_text:
+        # Decide once per distinct value, then broadcast through the codes
+        if op == "LIKE":
+            regex = _like_regex(values[0])
+            test = lambda s: regex.fullmatch(s) is not None
+        elif op == "IN":
+            members = {_text_literal(column, v) for v in values}
+            test = lambda s: s in members
+        elif op == "BETWEEN":
+            low, high = (_text_literal(column, v) for v in values)
+            test = lambda s: low <= s <= high
+        else:
+            operand, compare = _text_literal(column, values[0]), _COMPARE[op]
+            test = lambda s: compare(s, operand)
+        hits = np.fromiter((test(s) != predicate.negated for s in column.dictionary), dtype=bool, count=len(column.dictionary))
+        return np.append(hits, False)[column.values]
+    if op == "LIKE":
+        raise Unsupported("LIKE on a numeric column")
+    data, valid = column.values, ~np.isnan(column.values)
+    if op == "IN":
+        mask = np.isin(data, [_numeric_literal(v) for v in values])
+    elif op == "BETWEEN":
+        low, high = (_numeric_literal(v) for v in values)
+        mask = (data >= low) & (data <= high)
+    else:
+        mask = _COMPARE[op](data, _numeric_literal(values[0]))
+    if predicate.negated:
+        mask = ~mask
+    return mask & valid
+
+def _group_codes(column: Column, values: np.ndarray) -> Tuple[np.ndarray, int, Callable[[int], Any]]:
+    """
+    Dense codes (0..cardinality-1, NULL included) for grouping plus a decoder back to values.
+    """
+    if column.is_text:
+        dictionary = column.dictionary
+        return values.astype(np.int64) + 1, len(dictionary) + 1, lambda code: None if code == 0 else dictionary[code - 1]
+    uniques, inverse = np.unique(values, return_inverse=True)
+    cast = int if column.integer else float
+    return inverse.astype(np.int64), max(len(uniques), 1), lambda code: None if np.isnan(uniques[code]) else cast(uniques[code])
+
+def _sort_key(value):
+    # SQLite orders NULLs first, then numbers, then text
+    if value is None:
+        return (0, 0)
+    return (2, value) if isinstance(value, str) else (1, value)
+
+class ColumnarEngine(QueryEngine):
+    """
+    In-process columnar execution for aggregate queries over large tables.
+
+    Queries in the shape parse_aggregate() accepts run as vectorized numpy operations
+    over the ColumnStore: the largest table drives, every other table is attached with
+    a lookup on a key that is unique on its side (star/snowflake joins), predicates are
+    decided once per distinct value of dictionary-encoded columns, and groups are
+    aggregated with bincount. Only queries whose driving table has at least `min_rows`
+    rows are taken; everything else is left to SQLite.
+    """
+    name = "columnar"
+
+    def __init__(self, fingerprint: Callable[[], Hashable], row_counts: Callable[[sqlite3.Connection], Dict[str, int]], min_rows: int = 100_000):
+        self.store = ColumnStore(fingerprint)
+        self.min_rows = min_rows
+        self._row_counts = row_counts
+        self._stats = {"planned": 0, "declined": 0}
+        self._lock = threading.Lock()
+
+    def plan(self, conn: sqlite3.Connection, sql: str) -> Optional[AggregateQuery]:
+        try:
+            query = parse_aggregate(sql)
+            counts = self._row_counts(conn)
+            if max(counts.get(t.name.upper(), 0) for t in query.tables) < self.min_rows:
+                raise Unsupported("tables too small to benefit")
+            for table in query.tables:
+                self.store.schema(conn, table.name)
+        except Exception as e:
+            # Whatever the planner cannot handle (including its own bugs) goes to SQLite
+            if not isinstance(e, Unsupported):
+                print(f"Columnar planner failed on query, leaving it to SQLite: {e!r}")
+            with self._lock:
+                self._stats["declined"] += 1
+            return None
+        with self._lock:
+            self._stats["planned"] += 1
+        return query
+
+    def open(self, conn: sqlite3.Connection, plan: AggregateQuery, guard: QueryGuard) -> MaterializedCursor:
+        return MaterializedCursor(self.execute(conn, plan, guard.token))
+
+    def execute(self, conn: sqlite3.Connection, query: AggregateQuery, token: Optional[CancelToken] = None) -> QueryResult:
+        tables = {t.key: t for t in query.tables}
+        if len(tables) != len(query.tables):
+            raise Unsupported("duplicate table alias")
+        schemas = {key: self.store.schema(conn, t.name) for key, t in tables.items()}
+
+        def resolve(ref: ColumnRef) -> Tuple[str, str]:
+            if ref.qualifier is not None:
+                if ref.qualifier not in tables or ref.name not in schemas[ref.qualifier]:
+                    raise Unsupported(f"unknown column {ref.qualifier}.{ref.name}")
+                return ref.qualifier, ref.name
+            owners = [key for key in tables if ref.name in schemas[key]]
+            if len(owners) != 1:
+                raise Unsupported(f"unknown or ambiguous column {ref.name}")
+            return owners[0], ref.name
+
+        def column(ref: ColumnRef) -> Tuple[str, Column]:
+            key, name = resolve(ref)
+            return key, self.store.column(conn, tables[key].name, name)
+
+        # The largest table drives; the others are attached through unique-key lookups
+        counts = self._row_counts(conn)
+        driver = max(query.tables, key=lambda t: counts.get(t.name.upper(), 0)).key
+        rows: Dict[str, Optional[np.ndarray]] = {driver: None}
+        lengths: Dict[str, int] = {}
+        mask: Optional[np.ndarray] = None
+        pending = list(query.joins)
+        while pending:
+            for left, right in pending:
+                (left_key, left_col), (right_key, right_col) = column(left), column(right)
+                if left_key in rows and right_key not in rows:
+                    break
+                if right_key in rows and left_key not in rows:
+                    left_key, left_col, right_key, right_col = right_key, right_col, left_key, left_col
+                    break
+            else:
+                raise Unsupported("join graph is not a tree rooted at the largest table")
+            pending.remove((left, right))
+            lookup = self._lookup(left_col, right_col)
+            source = left_col.values if rows[left_key] is None else left_col.values[rows[left_key]]
+            if left_col.is_text:
+                matched = lookup[source]
+            else:
+                uniques, inverse = np.unique(source, return_inverse=True)
+                matched = np.array([lookup.get(v, -1) for v in uniques.tolist()] + [-1], dtype=np.int64)[inverse]
+            rows[right_key] = matched
+            mask = matched >= 0 if mask is None else mask & (matched >= 0)
+            raise_if_expired(token)
+        if set(rows) != set(tables):
+            raise Unsupported("table without a join condition")
+
+        def length_of(key: str, col: Column) -> int:
+            if lengths.setdefault(key, len(col.values)) != len(col.values):
+                raise Unsupported("table changed while its columns were loading")
+            return len(col.values)
+
+        def in_driver_space(key: str, per_row: np.ndarray, fill) -> np.ndarray:
+            if rows[key] is None:
+                return per_row
+            return np.append(per_row, fill)[rows[key]]
+
+        for predicate in query.where:
+            key, col = column(predicate.column)
+            length_of(key, col)
+            hits = in_driver_space(key, _evaluate(predicate, col), False)
+            mask = hits if mask is None else mask & hits
+            raise_if_expired(token)
+
+        if mask is not None:
+            selected, count = np.flatnonzero(mask), int(mask.sum())
+        else:
+            # No joins or filters: every driving row takes part
+            first_column = next(iter(schemas[driver]))
+            selected, count = None, len(self.store.column(conn, tables[driver].name, first_column).values)
+
+        def values(ref: ColumnRef) -> Tuple[Column, np.ndarray]:
+            key, col = column(ref)
+            length_of(key, col)
+            index = rows[key]
+            if selected is not None:
+                index = selected if index is None else index[selected]
+            return col, col.values if index is None else col.values[index]
+
+        group_cols = [resolve(ref) for ref in query.group_by]
+        output_group = {}
+        for i, item in enumerate(query.select):
+            if item.column is not None:
+                if resolve(item.column) not in group_cols:
+                    raise Unsupported(f"{item.text} is neither grouped nor aggregated")
+                output_group[i] = group_cols.index(resolve(item.column))
+
+        # Groups: fold the per-column codes into one dense key, then number the distinct keys
+        decoders, key = [], None
+        for ref in query.group_by:
+            col, data = values(ref)
+            codes, cardinality, decode = _group_codes(col, data)
+            decoders.append((codes, decode))
+            key = codes if key is None else np.unique(key * cardinality + codes, return_inverse=True)[1].astype(np.int64)
+        if key is not None:
+            _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+            groups = len(first)
+        else:
+            first, inverse, groups = None, np.zeros(count, dtype=np.int64), 1
+        raise_if_expired(token)
+
+        columns_out = []
+        for i, item in enumerate(query.select):
+            if item.func is None:
+                codes, decode = decoders[output_group[i]]
+                columns_out.append([decode(code) for code in codes[first].tolist()])
+            else:
+                columns_out.append(self._aggregate(item, values, inverse, groups))
+            raise_if_expired(token)
+        names = []
+        for item in query.select:
+            if item.alias:
+                names.append(item.alias)
+            elif item.column is not None:
+                # SQLite names a plain column reference after its declared name
+                key, name = resolve(item.column)
+                names.append(schemas[key][name][0])
+            else:
+                names.append(item.text)
+        result_rows = list(zip(*columns_out))
+
+        # Without ORDER BY, match SQLite's sorter output: ascending group columns
+        order = query.order_by or [(i, False) for i in sorted(output_group, key=output_group.get)]
+        for index, descending in reversed(order):
+            result_rows.sort(key=lambda row: _sort_key(row[index]), reverse=descending)
+        end = None if query.limit is None else query.offset + query.limit
+        return QueryResult(names, result_rows[query.offset:end])
+
+    @staticmethod
+    def _aggregate(item: SelectItem, values: Callable, inverse: np.ndarray, groups: int) -> list:
+        if item.arg is None:
+            return np.bincount(inverse, minlength=groups).tolist()
+        col, data = values(item.arg)
+        valid = data >= 0 if col.is_text else ~np.isnan(data)
+        owners = inverse[valid]
+        counts = np.bincount(owners, minlength=groups)
+        if item.func == "COUNT":
+            if not item.distinct:
+                return counts.tolist()
+            codes, cardinality, _ = _group_codes(col, data[valid])
+            pairs = np.unique(owners * cardinality + codes)
+            return np.bincount(pairs // cardinality, minlength=groups).tolist()
+        if item.distinct:
+            raise Unsupported(f"{item.func}(DISTINCT ...)")
+        if item.func in ("MIN", "MAX"):
+            if col.is_text:
+                # Rank the dictionary so codes compare like the strings they stand for
+                order = sorted(range(len(col.dictionary)), key=col.dictionary.__getitem__)
+                ranks = np.empty(len(order), dtype=np.float64)
+                ranks[order] = np.arange(len(order))
+                picked = ColumnarEngine._extreme(item.func, ranks[data[valid]], owners, groups)
+                return [None if c == 0 else col.dictionary[order[int(v)]] for v, c in zip(picked.tolist(), counts.tolist())]
+            picked = ColumnarEngine._extreme(item.func, data[valid], owners, groups)
+            cast = int if col.integer else float
+            return [None if c == 0 else cast(v) for v, c in zip(picked.tolist(), counts.tolist())]
+        if col.is_text:
+            raise Unsupported(f"{item.func} over a text column")
+        sums = np.bincount(owners, weights=data[valid], minlength=groups)
+        if item.func == "TOTAL":
+            return sums.tolist()
+        if item.func == "AVG":
+            return [None if c == 0 else s / c for s, c in zip(sums.tolist(), counts.tolist())]
+        cast = int if col.integer else float
+        return [None if c == 0 else cast(s) for s, c in zip(sums.tolist(), counts.tolist())]
+
+    @staticmethod
+    def _extreme(func: str, data: np.ndarray, owners: np.ndarray, groups: int) -> np.ndarray:
+        if func == "MIN":
+            out = np.full(groups, np.inf)
+            np.minimum.at(out, owners, data)
+        else:
+            out = np.full(groups, -np.inf)
+            np.maximum.at(out, owners, data)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, **self.store.stats()}
+
+    @staticmethod
+    def _lookup(left: Column, right: Column):
+        """
+        Maps join-key values of the left side to row positions on the right side, which
+        must be unique on the key. Text keys give an array indexed by left codes (with a
+        trailing -1 for NULL); numeric keys a dict.
+        """
+        if left.is_text != right.is_text:
+            raise Unsupported("join between text and numeric keys")
+        positions: Dict[Any, int] = {}
+        if right.is_text:
+            for row, code in enumerate(right.values.tolist()):
+                if code >= 0 and positions.setdefault(right.dictionary[code], row) != row:
+                    raise Unsupported("join key is not unique")
+            return np.array([positions.get(v, -1) for v in left.dictionary] + [-1], dtype=np.int64)
+        for row, value in enumerate(right.values.tolist()):
+            if value == value and positions.setdefault(value, row) != row:
+                raise Unsupported("join key is not unique")
+        return positions
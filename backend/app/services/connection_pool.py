@@ -0,0 +1,144 @@
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no pooled connection becomes free within the checkout timeout."""
+
+class SQLiteConnectionPool:
+    """
+    Bounded pool of read-only SQLite connections.
+
+    Connections are created lazily up to `max_size`, tuned once with WAL-friendly pragmas
+    and handed out to one thread/task at a time via `connection()`. Callers that cannot
+    get a connection wait up to `timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = 8,
+        timeout: float = 10.0,
+        mmap_size: int = 256 * 1024 * 1024,
+        cache_size_kb: int = 32 * 1024,
+        read_only: bool = True,
+    ):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.read_only = read_only
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._wal_checked = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_s": 0.0,
+            "timeouts": 0,
+            "in_use": 0,
+            "peak_in_use": 0,
+        }
+
+    def _enable_wal(self):
+        # journal_mode is persistent in the database file, but can only be changed
+        # through a writable connection; readers then inherit it.
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"Could not enable WAL mode: {e}")
+
+    def _open(self) -> sqlite3.Connection:
+        if not self._wal_checked:
+            self._enable_wal()
+            self._wal_checked = True
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolExhaustedError(f"No SQLite connection available after {self.timeout}s")
+        with self._lock:
+            self._stats["waits"] += 1
+            self._stats["wait_time_s"] += time.perf_counter() - start
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        conn.set_progress_handler(None, 0)
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Checks out a connection for the duration of the `with` block.
+        """
+        conn = self._acquire()
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+            self._release(conn)
+
+    def close(self):
+        """
+        Closes idle connections (e.g. after the database file was replaced).
+        """
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "size": self._created, "max_size": self.max_size, "idle": self._idle.qsize()}
@@ -0,0 +1,344 @@
+import bisect
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, ContextManager, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+@dataclass(frozen=True)
+class EntitySource:
+    type: str
+    table: str
+    column: str
+    fuzzy: bool = True  # False: whole-phrase matches only (years, period names, ids)
+    code: bool = False  # short codes ("US", "DEU"): matched verbatim, case-sensitive
+
+# Dimension columns whose values the initializer resolves in questions
+ENTITY_SOURCES = (
+    EntitySource("brand", "DIM_SOURCE_PRODUCT", "PRODUCT_BRAND"),
+    EntitySource("molecule", "DIM_SOURCE_PRODUCT", "MOLECULE_LIST"),
+    EntitySource("category", "DIM_SOURCE_PRODUCT", "CATEGORY_NM"),
+    EntitySource("corporation", "DIM_SOURCE_PRODUCT", "CORPORATION"),
+    EntitySource("country", "DIM_COUNTRY", "COUNTRY"),
+    EntitySource("country", "DIM_COUNTRY", "COUNTRY_SHORT_CD", fuzzy=False, code=True),
+    EntitySource("country", "DIM_COUNTRY", "COUNTRY_SHORT_CD_ALPHA3", fuzzy=False, code=True),
+    EntitySource("panel", "DIM_PANEL", "PANEL"),
+    EntitySource("channel", "DIM_PANEL", "CHANNEL"),
+    EntitySource("year", "DIM_CALENDAR", "YEAR", fuzzy=False),
+    EntitySource("quarter", "DIM_CALENDAR", "QUARTER_NM", fuzzy=False),
+    EntitySource("month", "DIM_CALENDAR", "MONTH_NM"),
+    EntitySource("week", "DIM_CALENDAR", "WEEK_NM", fuzzy=False),
+    EntitySource("period", "DIM_CALENDAR", "CALENDAR_ID", fuzzy=False),
+)
+
+# Words that are part of nearly every question; spans made only of these are never matched
+STOPWORDS = {
+    "a", "all", "an", "and", "are", "as", "at", "be", "by", "compare", "count", "for", "from", "give",
+    "how", "in", "is", "it", "last", "list", "many", "me", "much", "of", "on", "or", "per", "show",
+    "the", "their", "this", "to", "top", "total", "versus", "vs", "what", "which", "with", "year",
+    "brand", "brands", "country", "countries", "product", "products", "sales", "sale", "revenue",
+    "units", "volume", "value", "month", "monthly", "quarter", "quarterly", "week", "weekly",
+}
+
+# Longest value (in words) considered when slicing a question into candidate spans
+MAX_SPAN_WORDS = 4
+# Fuzzy/prefix matching only for spans at least this long (characters)
+MIN_FUZZY_CHARS = 4
+# A prefix must cover at least this fraction of the value it completes
+MIN_PREFIX_COVERAGE = 0.5
+# Fuzzy lookups remembered per span (question vocabulary repeats); cleared when the index changes
+FUZZY_MEMO_SIZE = 20_000
+# Trigram Dice a key needs to be considered at all; candidates are then scored by edit distance
+CANDIDATE_MIN_DICE = 0.5
+
+_WORD = re.compile(r"[A-Za-z0-9]+")
+
+def normalize(text: str) -> str:
+    return " ".join(w.lower() for w in _WORD.findall(text))
+
+def trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def edit_similarity(a: str, b: str, min_score: float = 0.0) -> float:
+    """
+    1 - (optimal string alignment distance / longer length): insertions, deletions,
+    substitutions and adjacent transpositions each count as one edit. Returns 0.0 as soon
+    as the similarity is known to fall below `min_score`.
+    """
+    longest = max(len(a), len(b), 1)
+    max_edits = int((1 - min_score) * longest + 1e-9)
+    if abs(len(a) - len(b)) > max_edits:
+        return 0.0
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        row = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        # Distances never decrease down the rows
+        if min(row) > max_edits:
+            return 0.0
+        prev2, prev = prev, row
+    return 1 - prev[len(b)] / longest
+
+@dataclass(frozen=True)
+class Entity:
+    type: str
+    value: Any  # the dimension value as stored (canonical spelling)
+    table: str
+    column: str
+
+@dataclass
+class EntityMatch:
+    type: str
+    value: Any
+    table: str
+    column: str
+    text: str  # the span of the question that matched
+    score: float  # 1.0 for exact matches, similarity otherwise
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+class EntityIndex:
+    """
+    In-memory index of dimension values for resolving the entities a question mentions
+    (brands, molecules, categories, countries, panels, periods) without an LLM.
+
+    Questions are sliced into word spans (up to MAX_SPAN_WORDS words). A span resolves by
+    exact lookup on the normalized value, else by edit similarity to the values an inverted
+    trigram index proposes, or as an unambiguous prefix of a value (sorted keys + bisect). Overlapping matches are settled greedily, best score
+    and longest span first.
+
+    `connect` returns a context manager yielding a connection (e.g. a pool checkout).
+    When `fingerprint` moves, at most every `check_interval` seconds, the source columns
+    are re-read and only values that appeared or disappeared are added to or removed from
+    the index. `columns(table)` lists a table's columns, so sources missing from the
+    warehouse are skipped.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], ContextManager[sqlite3.Connection]],
+        fingerprint: Callable[[], Hashable],
+        columns: Callable[[str], List[str]],
+        sources: Iterable[EntitySource] = ENTITY_SOURCES,
+        min_score: float = 0.8,
+        check_interval: float = 5.0,
+    ):
+        self._connect = connect
+        self._fingerprint = fingerprint
+        self._columns = columns
+        self.sources = list(sources)
+        self.min_score = min_score
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loaded_fingerprint: Optional[Hashable] = None
+        self._last_check = 0.0
+        self._values: Dict[EntitySource, Set[Any]] = {}
+        # normalized key -> entities spelled that way; key -> trigrams (fuzzy keys only)
+        self._exact: Dict[str, List[Entity]] = {}
+        self._codes: Dict[str, List[Entity]] = {}
+        self._key_grams: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._sorted_keys: List[str] = []
+        self._fuzzy_memo: Dict[str, Optional[Tuple[float, str]]] = {}
+        self._stats = {"builds": 0, "refreshes": 0, "added": 0, "removed": 0, "resolves": 0}
+
+    # --- maintenance ---
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-reads the source columns if the data changed. Returns True when the index was modified.
+        """
+        now = time.monotonic()
+        if not force and self._loaded_fingerprint is not None and now - self._last_check < self.check_interval:
+            return False
+        fingerprint = self._fingerprint()
+        self._last_check = now
+        if not force and fingerprint == self._loaded_fingerprint:
+            return False
+
+        with self._connect() as conn:
+            current = {source: self._read_values(conn, source) for source in self.sources}
+
+        added = removed = 0
+        with self._lock:
+            for source, values in current.items():
+                previous = self._values.get(source, set())
+                for value in previous - values:
+                    self._remove(Entity(source.type, value, source.table, source.column), source)
+                    removed += 1
+                for value in values - previous:
+                    self._add(Entity(source.type, value, source.table, source.column), source)
+                    added += 1
+                self._values[source] = values
+            if added or removed:
+                self._fuzzy_memo.clear()
+            self._stats["builds" if self._loaded_fingerprint is None else "refreshes"] += 1
+            self._stats["added"] += added
+            self._stats["removed"] += removed
+            self._loaded_fingerprint = fingerprint
+        if added or removed:
+            print(f"Entity index: +{added} / -{removed} values ({len(self._exact) + len(self._codes)} keys)")
+        return bool(added or removed)
+
+    def _read_values(self, conn: sqlite3.Connection, source: EntitySource) -> Set[Any]:
+        if source.column not in self._columns(source.table):
+            return set()
+        rows = conn.execute(
+            f"SELECT DISTINCT {source.column} FROM {source.table} WHERE {source.column} IS NOT NULL"
+        ).fetchall()
+        return {value for (value,) in rows if str(value).strip()}
+
+    def _add(self, entity: Entity, source: EntitySource):
+        if source.code:
+            self._codes.setdefault(str(entity.value).strip(), []).append(entity)
+            return
+        key = normalize(str(entity.value))
+        if not key:
+            return
+        self._exact.setdefault(key, []).append(entity)
+        if source.fuzzy and key not in self._key_grams:
+            grams = trigrams(key)
+            self._key_grams[key] = grams
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(key)
+            bisect.insort(self._sorted_keys, key)
+
+    def _remove(self, entity: Entity, source: EntitySource):
+        table, key = (self._codes, str(entity.value).strip()) if source.code else (self._exact, normalize(str(entity.value)))
+        entities = table.get(key)
+        if not entities or entity not in entities:
+            return
+        entities.remove(entity)
+        if entities:
+            return
+        del table[key]
+        grams = self._key_grams.pop(key, None) if not source.code else None
+        if grams is not None:
+            for gram in grams:
+                self._postings[gram].discard(key)
+                if not self._postings[gram]:
+                    del self._postings[gram]
+            self._sorted_keys.pop(bisect.bisect_left(self._sorted_keys, key))
+
+    # --- lookup ---
+
+    def resolve(self, text: str) -> List[EntityMatch]:
+        """
+        Entities mentioned in `text`, in the order they appear.
+        """
+        self.refresh()
+        words = [(m.group(), m.start(), m.end()) for m in _WORD.finditer(text)]
+        lowered = [w.lower() for w, _, _ in words]
+        candidates: List[Tuple[float, int, int, List[Entity]]] = []
+
+        with self._lock:
+            self._stats["resolves"] += 1
+            for i, (word, _, _) in enumerate(words):
+                if word in self._codes:
+                    candidates.append((1.0, i, i + 1, self._codes[word]))
+            for size in range(min(MAX_SPAN_WORDS, len(words)), 0, -1):
+                for i in range(len(words) - size + 1):
+                    span = lowered[i:i + size]
+                    if all(w in STOPWORDS for w in span):
+                        continue
+                    key = " ".join(span)
+                    if key in self._exact:
+                        candidates.append((1.0, i, i + size, self._exact[key]))
+                        continue
+                    if len(key) < MIN_FUZZY_CHARS or span[0] in STOPWORDS or span[-1] in STOPWORDS:
+                        continue
+                    if key in self._fuzzy_memo:
+                        best = self._fuzzy_memo[key]
+                    else:
+                        best = self._similar(key) or self._completion(key)
+                        if len(self._fuzzy_memo) >= FUZZY_MEMO_SIZE:
+                            self._fuzzy_memo.clear()
+                        self._fuzzy_memo[key] = best
+                    if best is not None:
+                        candidates.append((best[0], i, i + size, self._exact[best[1]]))
+
+        # Best score first, then the longest span ("Alflex 254" over "Alflex")
+        candidates.sort(key=lambda c: (-c[0], -(c[2] - c[1]), c[1]))
+        taken: Set[int] = set()
+        matches = []
+        for score, start, end, entities in candidates:
+            if taken.intersection(range(start, end)):
+                continue
+            taken.update(range(start, end))
+            span = text[words[start][1]:words[end - 1][2]]
+            matches.extend((start, EntityMatch(e.type, e.value, e.table, e.column, span, round(score, 3))) for e in entities)
+        matches.sort(key=lambda m: m[0])
+        return [match for _, match in matches]
+
+    def _similar(self, key: str) -> Optional[Tuple[float, str]]:
+        """
+        Most similar fuzzy key by edit similarity, if it reaches min_score.
+
+        Candidates share at least CANDIDATE_MIN_DICE of their trigrams with `key`. Only the
+        rarest grams are probed: a key sharing none of them overlaps in fewer than
+        ceil(a*t/(2-t)) of the a grams and cannot reach that Dice coefficient t.
+        """
+        grams = trigrams(key)
+        probes = sorted(grams, key=lambda g: len(self._postings.get(g, ())))
+        min_overlap = math.ceil(len(grams) * CANDIDATE_MIN_DICE / (2 - CANDIDATE_MIN_DICE))
+        counts: Counter = Counter()
+        for gram in probes[:len(grams) - min_overlap + 1]:
+            counts.update(self._postings.get(gram, ()))
+        best = None
+        for candidate in counts:
+            other = self._key_grams[candidate]
+            if 2 * len(grams & other) / (len(grams) + len(other)) < CANDIDATE_MIN_DICE:
+                continue
+            score = edit_similarity(key, candidate, self.min_score)
+            if score >= self.min_score and (best is None or score > best[0]):
+                best = (score, candidate)
+        return best
+
+    def _completion(self, prefix: str) -> Optional[Tuple[float, str]]:
+        """
+        The only fuzzy key starting with `prefix`, scored by how much of it the prefix covers.
+        """
+        i = bisect.bisect_left(self._sorted_keys, prefix)
+        found = self._sorted_keys[i:i + 2]
+        found = [k for k in found if k.startswith(prefix)]
+        if len(found) != 1:
+            return None
+        coverage = len(prefix) / len(found[0])
+        if coverage < MIN_PREFIX_COVERAGE:
+            return None
+        return max(self.min_score, coverage * 0.95), found[0]
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Entity]:
+        """
+        Entities whose normalized value starts with `prefix` (for type-ahead).
+        """
+        self.refresh()
+        prefix = normalize(prefix)
+        with self._lock:
+            i = bisect.bisect_left(self._sorted_keys, prefix)
+            keys = []
+            for key in self._sorted_keys[i:]:
+                if not key.startswith(prefix) or len(keys) >= limit:
+                    break
+                keys.append(key)
+            return [entity for key in keys for entity in self._exact[key]][:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "keys": len(self._exact),
+                "codes": len(self._codes),
+                "fuzzy_keys": len(self._key_grams),
+                "trigrams": len(self._postings),
+            }
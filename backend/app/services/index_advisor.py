@@ -0,0 +1,323 @@
+import re
+import sqlite3
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Set, Tuple
+from app.services.query_cache import canonical_sql
+from app.services.query_cost import table_aliases
+from app.services.snowflake_service import snowflake_service
+from app.services.workload import QueryRecord
+
+# Indexes created by the advisor carry this prefix so they can be listed and dropped
+ADVISOR_PREFIX = "IDX_ADV_"
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_REF = r"(?:(\w+)\.)?([A-Za-z_]\w*)"
+_JOIN = re.compile(rf"{_REF}\s*=\s*{_REF}")
+_EQUALITY = re.compile(rf"{_REF}\s*(?:=|\bIN\b|\bIS\b)\s*(?=__LIT|\?|[-\d(]|NULL\b)", re.IGNORECASE)
+_RANGE = re.compile(rf"{_REF}\s*(?:<=|>=|<(?!>)|>|\bBETWEEN\b|\bLIKE\b)", re.IGNORECASE)
+_GROUP_BY = re.compile(r"\bGROUP\s+BY\b(.*?)(?=\bHAVING\b|\bORDER\b|\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+_ANY_REF = re.compile(_REF)
+
+@dataclass
+class WorkloadEntry:
+    sql: str
+    executions: int = 0
+    total_s: float = 0.0
+
+    @property
+    def mean_s(self) -> float:
+        return self.total_s / self.executions if self.executions else 0.0
+
+def workload_entries(records: Iterable[QueryRecord]) -> List[WorkloadEntry]:
+    """
+    Distinct statements (by canonical SQL) with execution counts and total time, most expensive first.
+    """
+    grouped: Dict[str, WorkloadEntry] = {}
+    for record in records:
+        sql = canonical_sql(record.sql)
+        entry = grouped.setdefault(sql, WorkloadEntry(sql))
+        entry.executions += 1
+        entry.total_s += record.elapsed_s
+    return sorted(grouped.values(), key=lambda e: -e.total_s)
+
+@dataclass
+class ColumnUsage:
+    equality: Set[str] = field(default_factory=set)
+    joins: Set[str] = field(default_factory=set)
+    ranges: Set[str] = field(default_factory=set)
+    group_by: Set[str] = field(default_factory=set)
+    referenced: Set[str] = field(default_factory=set)
+
+@dataclass(frozen=True)
+class IndexCandidate:
+    table: str
+    columns: Tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        return f"{ADVISOR_PREFIX}{self.table}_{'_'.join(self.columns)}"
+
+    @property
+    def ddl(self) -> str:
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table} ({', '.join(self.columns)})"
+
+    def covered_by(self, columns: Tuple[str, ...]) -> bool:
+        # An index whose leading columns match makes this one redundant
+        return tuple(columns[:len(self.columns)]) == self.columns
+
+@dataclass
+class IndexRecommendation:
+    candidate: IndexCandidate
+    statements: List[str]
+    workload_s: float  # recorded time of the statements this index newly serves
+
+    def to_dict(self):
+        return {
+            "table": self.candidate.table,
+            "columns": list(self.candidate.columns),
+            "ddl": self.candidate.ddl,
+            "statements": len(self.statements),
+            "workload_s": round(self.workload_s, 6),
+        }
+
+class IndexAdvisor:
+    """
+    Proposes secondary indexes for a recorded SQL workload.
+
+    For each statement the advisor collects, per table, the columns used in equality
+    filters, join conditions, range filters and GROUP BY, and derives candidate indexes
+    from them (equality and join columns first, then one range column; optionally widened
+    to cover every referenced column). Candidates are tested "what-if" style: each is
+    created inside a transaction that is rolled back, and EXPLAIN QUERY PLAN shows which
+    statements the planner would use it for. Candidates are picked greedily by the recorded
+    time of the statements they would newly serve.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], ContextManager[sqlite3.Connection]],
+        connect_rw: Callable[[], sqlite3.Connection],
+        columns: Callable[[str], Iterable[str]],
+        max_columns: int = 6,
+        max_indexes: int = 5,
+        on_change: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self._connect = connect
+        self._connect_rw = connect_rw
+        self._on_change = on_change
+        self._columns = columns
+        self.max_columns = max_columns
+        self.max_indexes = max_indexes
+
+    def column_usage(self, sql: str) -> Dict[str, ColumnUsage]:
+        masked = _LITERAL.sub("__LIT__", sql)
+        aliases = table_aliases(masked)
+        tables = set(aliases.values())
+        table_columns = {t: {c.upper() for c in self._columns(t)} for t in tables if self._table_exists(t)}
+
+        def resolve(qualifier: Optional[str], column: str) -> Optional[Tuple[str, str]]:
+            column = column.upper()
+            if qualifier:
+                table = aliases.get(qualifier.upper())
+                return (table, column) if column in table_columns.get(table, ()) else None
+            owners = [t for t, cols in table_columns.items() if column in cols]
+            return (owners[0], column) if len(owners) == 1 else None
+
+        usage: Dict[str, ColumnUsage] = {t: ColumnUsage() for t in table_columns}
+        for match in _ANY_REF.finditer(masked):
+            ref = resolve(*match.groups())
+            if ref:
+                usage[ref[0]].referenced.add(ref[1])
+        for match in _JOIN.finditer(masked):
+            left, right = resolve(match.group(1), match.group(2)), resolve(match.group(3), match.group(4))
+            if left and right and left[0] != right[0]:
+                usage[left[0]].joins.add(left[1])
+                usage[right[0]].joins.add(right[1])
+        for pattern, kind in ((_EQUALITY, "equality"), (_RANGE, "ranges")):
+            for match in pattern.finditer(masked):
+                ref = resolve(*match.groups())
+                if ref:
+                    getattr(usage[ref[0]], kind).add(ref[1])
+        for group in _GROUP_BY.findall(masked):
+            for match in _ANY_REF.finditer(group):
+                ref = resolve(*match.groups())
+                if ref:
+                    usage[ref[0]].group_by.add(ref[1])
+        return usage
+
+    def _table_exists(self, table: str) -> bool:
+        try:
+            return bool(list(self._columns(table)))
+        except Exception:
+            return False
+
+    def candidates(self, sql: str) -> List[IndexCandidate]:
+        found: List[IndexCandidate] = []
+        for table, use in self.column_usage(sql).items():
+            lead = sorted(use.equality) + sorted(use.joins - use.equality)
+            ranged = sorted(use.ranges - set(lead))[:1]
+            shapes = [tuple(lead + ranged), tuple(sorted(use.group_by))]
+            shapes += [(col,) for col in sorted(use.joins)]
+            key = lead + ranged
+            extra = sorted(use.referenced - set(key))
+            if key and len(key) + len(extra) <= self.max_columns:
+                shapes.append(tuple(key + extra))
+            for columns in shapes:
+                candidate = IndexCandidate(table, columns)
+                if columns and candidate not in found:
+                    found.append(candidate)
+        return found
+
+    def existing_indexes(self, conn: sqlite3.Connection, table: str) -> List[Tuple[str, Tuple[str, ...]]]:
+        indexes = []
+        for row in conn.execute(f"PRAGMA index_list({table})").fetchall():
+            name = row[1]
+            columns = tuple(r[2].upper() for r in conn.execute(f"PRAGMA index_info({name})").fetchall() if r[2])
+            indexes.append((name, columns))
+        return indexes
+
+    def recommend(self, entries: List[WorkloadEntry]) -> List[IndexRecommendation]:
+        """
+        Ranks candidate indexes for the workload by the time of the statements that would use them.
+        """
+        per_candidate: Dict[IndexCandidate, List[WorkloadEntry]] = {}
+        for entry in entries:
+            for candidate in self.candidates(entry.sql):
+                per_candidate.setdefault(candidate, []).append(entry)
+
+        conn = self._connect_rw()
+        conn.isolation_level = None  # explicit BEGIN/ROLLBACK around each what-if index
+        try:
+            existing = {}
+            for candidate in per_candidate:
+                if candidate.table not in existing:
+                    existing[candidate.table] = [cols for _, cols in self.existing_indexes(conn, candidate.table)]
+            recommendations = []
+            for candidate, users in per_candidate.items():
+                if any(candidate.covered_by(cols) for cols in existing[candidate.table]):
+                    continue
+                conn.execute("BEGIN")
+                try:
+                    conn.execute(candidate.ddl)
+                    using = [e for e in users if self._plan_uses(conn, e.sql, candidate.name)]
+                finally:
+                    conn.execute("ROLLBACK")
+                if using:
+                    recommendations.append(IndexRecommendation(candidate, [e.sql for e in using], sum(e.total_s for e in using)))
+        finally:
+            conn.close()
+
+        # Greedy pick by marginal benefit: statements a chosen index already serves on its
+        # table no longer count towards other candidates for that table
+        served: Set[Tuple[str, str]] = set()
+        by_sql = {e.sql: e for e in entries}
+        chosen: List[IndexRecommendation] = []
+        while recommendations and len(chosen) < self.max_indexes:
+            def marginal(rec: IndexRecommendation) -> Tuple[float, int]:
+                fresh = [sql for sql in rec.statements if (rec.candidate.table, sql) not in served]
+                return sum(by_sql[sql].total_s for sql in fresh), len(rec.candidate.columns)
+            best = max(recommendations, key=marginal)
+            gain = marginal(best)[0]
+            if gain <= 0:
+                break
+            recommendations.remove(best)
+            served.update((best.candidate.table, sql) for sql in best.statements)
+            chosen.append(IndexRecommendation(best.candidate, best.statements, gain))
+        return chosen
+
+    @staticmethod
+    def _plan_uses(conn: sqlite3.Connection, sql: str, index_name: str) -> bool:
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        except sqlite3.Error:
+            return False
+        return any(index_name in detail for *_, detail in plan)
+
+    def measure(self, entries: List[WorkloadEntry], repeat: int = 3) -> Dict[str, float]:
+        """
+        Median latency of each statement, re-run `repeat` times against the current database.
+        """
+        timings = {}
+        with self._connect() as conn:
+            for entry in entries:
+                samples = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    try:
+                        conn.execute(entry.sql).fetchall()
+                    except sqlite3.Error:
+                        break
+                    samples.append(time.perf_counter() - started)
+                if samples:
+                    timings[entry.sql] = statistics.median(samples)
+        return timings
+
+    def apply(self, recommendations: List[IndexRecommendation], analyze: bool = True):
+        conn = self._connect_rw()
+        try:
+            with conn:
+                for rec in recommendations:
+                    conn.execute(rec.candidate.ddl)
+            if analyze:
+                conn.execute("ANALYZE")
+                conn.commit()
+        finally:
+            conn.close()
+        if recommendations and self._on_change is not None:
+            self._on_change(sorted({rec.candidate.table for rec in recommendations}))
+
+    def drop_applied(self) -> List[str]:
+        """
+        Drops every index the advisor created.
+        """
+        conn = self._connect_rw()
+        try:
+            indexes = conn.execute("SELECT name, tbl_name FROM sqlite_master WHERE type = 'index' AND name LIKE ?", (ADVISOR_PREFIX + "%",)).fetchall()
+            with conn:
+                for name, _ in indexes:
+                    conn.execute(f"DROP INDEX IF EXISTS {name}")
+        finally:
+            conn.close()
+        if indexes and self._on_change is not None:
+            self._on_change(sorted({table for _, table in indexes}))
+        return [name for name, _ in indexes]
+
+    def report(self, records: Iterable[QueryRecord], apply: bool = False, repeat: int = 3) -> Dict:
+        """
+        Recommendations for a recorded workload. With `apply`, the indexes are created and
+        the workload is replayed before and after to report the measured latency change.
+        """
+        entries = workload_entries(records)
+        recommendations = self.recommend(entries)
+        report = {
+            "statements": len(entries),
+            "executions": sum(e.executions for e in entries),
+            "recorded_s": round(sum(e.total_s for e in entries), 6),
+            "recommendations": [r.to_dict() for r in recommendations],
+            "applied": False,
+        }
+        if apply and recommendations:
+            before = self.measure(entries, repeat)
+            self.apply(recommendations)
+            after = self.measure(entries, repeat)
+            # Replay time weighted by how often each statement ran in the workload
+            weights = {e.sql: e.executions for e in entries}
+            report.update({
+                "applied": True,
+                "before_s": round(sum(t * weights[sql] for sql, t in before.items()), 6),
+                "after_s": round(sum(after.get(sql, t) * weights[sql] for sql, t in before.items()), 6),
+                "per_statement": [
+                    {"sql": sql, "before_s": round(t, 6), "after_s": round(after.get(sql, t), 6)}
+                    for sql, t in before.items()
+                ],
+            })
+        return report
+
+index_advisor = IndexAdvisor(
+    snowflake_service.pool.connection,
+    snowflake_service.get_connection,
+    columns=lambda table: snowflake_service.schema_catalog.table(table).column_names,
+    on_change=snowflake_service.tables_changed,
+)
@@ -1,42 +1,171 @@
-from langchain_aws import ChatBedrock
-from langchain_community.chat_models import ChatOpenAI
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.language_models.chat_models import BaseChatModel
 from app.core.config import settings
+from app.services.metrics import llm_tokens_total, metrics
+from app.services.tracing import Span, failure_status, start_span
+from typing import Any, Dict, Iterable, Optional, Tuple
+from uuid import UUID
+import math
 import os
+import threading
+import time
+
+DEFAULT_MODEL_ID = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+class LLMTelemetry(BaseCallbackHandler):
+    """
+    Times every call of the model it is attached to as an "llm" span and counts tokens:
+    the provider's usage figures when it reports them, otherwise ~4 characters per token.
+    Runs inline so spans see the calling request's trace.
+    """
+    run_inline = True
+
+    def __init__(self, provider: str, model_id: str):
+        self.provider = provider
+        self.model_id = model_id
+        self._spans: Dict[UUID, Tuple[Span, int]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._spans[run_id] = (start_span("llm", self.provider, model=self.model_id), math.ceil(chars / 4))
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        entry = self._spans.pop(run_id, None)
+        if entry is None:
+            return
+        span, estimated_input = entry
+        usage = self._usage(response)
+        input_tokens = usage.get("input_tokens", estimated_input)
+        output_tokens = usage.get("output_tokens")
+        if output_tokens is None:
+            chars = sum(len(g.text) for batch in response.generations for g in batch)
+            output_tokens = math.ceil(chars / 4)
+        span.attrs.update(input_tokens=input_tokens, output_tokens=output_tokens, estimated=not usage)
+        llm_tokens_total.inc(input_tokens, provider=self.provider, direction="input")
+        llm_tokens_total.inc(output_tokens, provider=self.provider, direction="output")
+        span.finish()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        entry = self._spans.pop(run_id, None)
+        if entry is not None:
+            entry[0].finish(failure_status(error))
+
+    @staticmethod
+    def _usage(response) -> Dict[str, int]:
+        for batch in response.generations:
+            for generation in batch:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    return {"input_tokens": metadata["input_tokens"], "output_tokens": metadata["output_tokens"]}
+        return {}
 
 class LLMFactory:
+    """
+    Builds chat models and keeps one instance per (provider, model_id) for the life of
+    the process, so HTTP clients, TLS sessions and resolved credentials are reused
+    across requests. The cache is dropped automatically when credentials change.
+
+    The offline mock is the exception: it replays a fixed list of responses, so each
+    call gets a fresh instance that starts from the first one, whatever other requests do.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str], BaseChatModel] = {}
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[Tuple[str, ...]] = None
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "construction_time_s": 0.0}
+        self._construction_times: Dict[Tuple[str, str], float] = {}
+        self._warned_mock = False
+
     @staticmethod
-    def create_llm(model_id: str = "anthropic.claude-3-sonnet-20240229-v1:0") -> BaseChatModel:
+    def _credentials() -> Dict[str, str]:
+        return {
+            "anthropic": os.getenv("ANTHROPIC_API_KEY") or settings.ANTHROPIC_API_KEY,
+            "aws": os.getenv("AWS_ACCESS_KEY_ID") or settings.AWS_ACCESS_KEY_ID,
+            "openai": settings.OPENAI_API_KEY,
+            "region": settings.AWS_REGION,
+        }
+
+    def resolve_provider(self) -> str:
+        """
+        Picks the provider the same way create_llm always has:
+        Anthropic, then Bedrock, then OpenAI, then the offline mock.
         """
-        Creates an LLM instance based on configuration.
-        Defaults to AWS Bedrock, falls back to Mock/OpenAI if credentials missing.
+        creds = self._credentials()
+        if creds["anthropic"] and "mock" not in creds["anthropic"]:
+            return "anthropic"
+        if creds["aws"] and "mock" not in creds["aws"]:
+            return "bedrock"
+        if creds["openai"] and "mock" not in creds["openai"]:
+            return "openai"
+        return "mock"
+
+    def create_llm(self, model_id: str = DEFAULT_MODEL_ID) -> BaseChatModel:
+        """
+        Returns the shared LLM instance for the configured provider and model_id,
+        constructing it on first use.
         """
-        
-        # Check for Anthropic API Key
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY") or settings.ANTHROPIC_API_KEY
-        if anthropic_key and "mock" not in anthropic_key:
+        fingerprint = tuple(self._credentials().values())
+        provider = self.resolve_provider()
+        key = (provider, model_id)
+        if provider == "mock":
+            llm = self._build_llm(provider, model_id)
+            llm.callbacks = [LLMTelemetry(provider, model_id)]
+            return llm
+
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                if self._clients:
+                    self._stats["evictions"] += len(self._clients)
+                self._clients.clear()
+                self._fingerprint = fingerprint
+
+            llm = self._clients.get(key)
+            if llm is not None:
+                self._stats["hits"] += 1
+                return llm
+
+            # Constructed under the lock so concurrent first calls don't build duplicates
+            self._stats["misses"] += 1
+            start = time.perf_counter()
+            llm = self._build_llm(provider, model_id)
+            llm.callbacks = [LLMTelemetry(provider, model_id)]
+            elapsed = time.perf_counter() - start
+            self._stats["construction_time_s"] += elapsed
+            self._construction_times[key] = elapsed
+            self._clients[key] = llm
+            return llm
+
+    def _build_llm(self, provider: str, model_id: str) -> BaseChatModel:
+        """
+        Creates a new LLM instance for the given provider. Provider SDKs are imported
+        here, so only the configured one is ever loaded (langchain_aws alone adds about a
+        second to a cold start).
+        """
+        if provider == "anthropic":
             from langchain_anthropic import ChatAnthropic
             return ChatAnthropic(
                 model=model_id,
-                api_key=anthropic_key,
+                api_key=self._credentials()["anthropic"],
                 temperature=0
             )
 
-        # Check for AWS Creds
-        aws_key = os.getenv("AWS_ACCESS_KEY_ID") or settings.AWS_ACCESS_KEY_ID
-        if aws_key and "mock" not in aws_key:
+        if provider == "bedrock":
+            from langchain_aws import ChatBedrock
             return ChatBedrock(
                 model_id=model_id,
                 client=None, # let langchain create client
                 region_name=settings.AWS_REGION
             )
-        
-        # Fallback to Mock / OpenAI (if key exists) or a custom FakeLLM (for demo)
-        if settings.OPENAI_API_KEY and "mock" not in settings.OPENAI_API_KEY:
-             return ChatOpenAI(model="gpt-4o", temperature=0)
-        
+
+        if provider == "openai":
+            from langchain_community.chat_models import ChatOpenAI
+            return ChatOpenAI(model="gpt-4o", temperature=0)
+
         # If completely offline/mock
-        print("WARNING: Using Mock LLM (FakeListChatModel) as no valid credentials found.")
+        if not self._warned_mock:
+            print("WARNING: Using Mock LLM (FakeListChatModel) as no valid credentials found.")
+            self._warned_mock = True
         from langchain_community.chat_models import FakeListChatModel
         return FakeListChatModel(responses=[
             "Mock response: I have analyzed the sales data.",
@@ -44,4 +173,50 @@ class LLMFactory:
             "Mock response: Creating a bar chart for you."
         ])
 
+    def warm_up(self, model_ids: Iterable[str] = (DEFAULT_MODEL_ID,)) -> None:
+        """
+        Constructs clients ahead of the first request (called from application startup).
+        """
+        for model_id in model_ids:
+            self.create_llm(model_id)
+
+    def evict(self, provider: Optional[str] = None, model_id: Optional[str] = None) -> int:
+        """
+        Drops cached clients matching provider/model_id (all of them when both are None).
+        Returns the number of evicted clients.
+        """
+        with self._lock:
+            keys = [
+                key for key in self._clients
+                if (provider is None or key[0] == provider) and (model_id is None or key[1] == model_id)
+            ]
+            for key in keys:
+                del self._clients[key]
+            self._stats["evictions"] += len(keys)
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Cache counters plus per-client construction time in seconds.
+        """
+        with self._lock:
+            return {
+                **self._stats,
+                "cached_clients": len(self._clients),
+                "construction_times_s": {f"{p}:{m}": t for (p, m), t in self._construction_times.items()},
+            }
+
 llm_factory = LLMFactory()
+
+# Client cache behaviour on /metrics, next to the token counters
+metrics.sampled(
+    "datapella_llm_client_cache_total", "LLM client cache hits, misses and evictions", "counter",
+    lambda: {(event,): llm_factory.stats()[key] for event, key in (("hit", "hits"), ("miss", "misses"), ("eviction", "evictions"))},
+    ("event",),
+)
+metrics.sampled("datapella_llm_clients", "LLM clients currently cached", "gauge", lambda: {(): llm_factory.stats()["cached_clients"]})
+metrics.sampled(
+    "datapella_llm_client_construction_seconds", "Time taken to construct each LLM client", "gauge",
+    lambda: {tuple(name.split(":", 1)): t for name, t in llm_factory.stats()["construction_times_s"].items()},
+    ("provider", "model"),
+)
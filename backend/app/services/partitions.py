@@ -0,0 +1,407 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from app.services.query_cost import table_aliases
+
+CALENDAR_DIM = "DIM_CALENDAR"
+PARTITION_COLUMN = "CALENDAR_ID"
+# Rows whose CALENDAR_ID doesn't start with a year; never pruned
+OTHER_PARTITION = "other"
+MANIFEST = "manifest.json"
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_TABLE_REF = re.compile(
+    r"(\bFROM|\bJOIN|,)\s+(?:main\.)?([A-Za-z_]\w*)\b(?!\s*\.)"
+    r"(\s+(?:AS\s+)?(?!(?:ON|USING|WHERE|FROM|SELECT|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|NATURAL|GROUP|ORDER|LIMIT|HAVING|UNION|WINDOW)\b)[A-Za-z_]\w*)?",
+    re.IGNORECASE,
+)
+# Predicates under these can't be read as plain filters on the fact rows
+_NOT_PRUNABLE = re.compile(r"\b(?:OR|NOT|UNION|INTERSECT|EXCEPT|WITH|CASE|LEFT|RIGHT|FULL|OUTER)\b|\(\s*SELECT\b", re.IGNORECASE)
+_FROM = re.compile(r"\bFROM\b", re.IGNORECASE)
+_CALENDAR_JOIN = re.compile(r"(\w+)\.CALENDAR_ID\s*=\s*(\w+)\.CALENDAR_ID\b", re.IGNORECASE)
+_VALUE = r"(?:'[^']*'|-?\d+)"
+_PREDICATE = re.compile(
+    r"(?:\b(\w+)\.)?\b(CALENDAR_ID|YEAR)\s*"
+    rf"(?:(?P<op>>=|<=|<>|!=|==|=|<|>)\s*(?P<value>{_VALUE})"
+    rf"|IN\s*\((?P<list>\s*{_VALUE}(?:\s*,\s*{_VALUE})*)\s*\)"
+    rf"|BETWEEN\s+(?P<low>{_VALUE})\s+AND\s+(?P<high>{_VALUE})"
+    r"|LIKE\s+'(?P<like>\d{4})[^%_']*(?:[%_][^']*)?')",
+    re.IGNORECASE,
+)
+
+def _year_of(literal: str) -> Optional[int]:
+    text = literal.strip("'")
+    return int(text[:4]) if re.match(r"\d{4}", text) else None
+
+class PartitionManager:
+    """
+    Year-partitioned copies of the large fact tables, one SQLite file per (table, year),
+    attached to pooled connections on demand.
+
+    build()/refresh() copy each year's rows (by the CALENDAR_ID prefix) out of the main
+    table into a new file, several partitions in parallel, then switch the manifest to the
+    new files in one atomic rename. Readers keep whatever files they already attached, so
+    nothing waits on a load. refresh() rebuilds only the years that gained rows past the
+    table's rowid watermark; updates and deletes in place need build().
+
+    rewrite() replaces references to a fresh partitioned table with the union of the
+    partitions its calendar predicates (on the fact's CALENDAR_ID, or DIM_CALENDAR
+    YEAR/CALENDAR_ID when joined on CALENDAR_ID) can match. Queries whose predicates can't
+    be reasoned about safely (OR, NOT, subqueries, ...) read every partition; stale
+    tables are read from the main database until a background refresh catches up.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        directory: str,
+        tables: Iterable[str],
+        fingerprint: Callable[[], Hashable],
+        columns: Callable[[str], Iterable[str]],
+        workers: int = 4,
+        max_attached: int = 8,
+        on_change: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.db_path = db_path
+        self.directory = directory
+        self.tables = [t.upper() for t in tables]
+        self.workers = workers
+        self.max_attached = max_attached
+        self._fingerprint = fingerprint
+        self._columns = columns
+        self._on_change = on_change
+        self._manifest: Dict[str, Dict] = {}
+        self._manifest_mtime: Optional[int] = None
+        self._fresh: Dict[str, bool] = {}
+        self._fresh_at: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._refreshing: Optional[threading.Thread] = None
+        self._stats = {"queries": 0, "pruned": 0, "stale": 0, "partitions_read": 0, "partitions_total": 0, "builds": 0, "build_time_s": 0.0}
+
+    # Manifest
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST)
+
+    def manifest(self) -> Dict[str, Dict]:
+        """
+        {table: {"watermark": max rowid copied, "partitions": {key: {"file", "rows"}}}},
+        reloaded when the manifest file changes.
+        """
+        try:
+            mtime = os.stat(self._manifest_path()).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(self._manifest_path()) as f:
+                    self._manifest = json.load(f)["tables"]
+                self._manifest_mtime = mtime
+                self._fresh_at = None
+            return self._manifest
+
+    def _swap(self, table: str, entry: Dict) -> List[str]:
+        # Publish the new entry with an atomic rename; returns files no longer referenced
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            tables = dict(self._manifest)
+        old = tables.get(table, {}).get("partitions", {})
+        tables[table] = entry
+        tmp = f"{self._manifest_path()}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"tables": tables}, f, indent=2)
+        os.replace(tmp, self._manifest_path())
+        with self._lock:
+            self._manifest = tables
+            self._manifest_mtime = os.stat(self._manifest_path()).st_mtime_ns
+            self._fresh_at = None
+        live = {p["file"] for p in entry["partitions"].values()}
+        return [p["file"] for p in old.values() if p["file"] not in live]
+
+    # Maintenance
+
+    def build(self, tables: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        (Re)builds every partition of the given tables (default: all configured ones).
+        Returns rows copied per table and partition.
+        """
+        return self._update(tables or self.tables, full=True)
+
+    def refresh(self, tables: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Rebuilds only the partitions of already-partitioned tables that gained rows.
+        """
+        manifest = self.manifest()
+        return self._update([t for t in (tables or self.tables) if t.upper() in manifest], full=False)
+
+    def _update(self, tables: Iterable[str], full: bool) -> Dict[str, Dict[str, int]]:
+        results = {}
+        with self._build_lock:
+            started = time.perf_counter()
+            for table in tables:
+                table = table.upper()
+                results[table] = self._update_table(table, full)
+            with self._lock:
+                self._stats["builds"] += 1
+                self._stats["build_time_s"] += time.perf_counter() - started
+        # Same rows, new physical layout: unordered results may now come back in another order
+        changed = [table for table, loaded in results.items() if loaded]
+        if changed and self._on_change is not None:
+            self._on_change(changed)
+        return results
+
+    def _update_table(self, table: str, full: bool) -> Dict[str, int]:
+        entry = self.manifest().get(table)
+        src = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            watermark = src.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+            if entry is None or full or watermark < entry["watermark"]:
+                keys = self._keys(src, table, 0, watermark)
+                partitions = {}
+            else:
+                if watermark == entry["watermark"]:
+                    return {}
+                keys = self._keys(src, table, entry["watermark"], watermark)
+                partitions = dict(entry["partitions"])
+            ddl = src.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+            indexes = [row[0] for row in src.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+            )]
+        finally:
+            src.close()
+
+        # Partitions load in parallel, each into its own new file
+        with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="partition-load") as pool:
+            built = list(pool.map(lambda key: self._load_partition(table, key, watermark, ddl, indexes), keys))
+        for key, file, rows in built:
+            partitions[key] = {"file": file, "rows": rows}
+        for file in self._swap(table, {"watermark": watermark, "partitions": partitions}):
+            try:
+                os.remove(os.path.join(self.directory, file))  # attached readers keep their open handle
+            except FileNotFoundError:
+                pass
+        print(f"Partitioned {table}: {len(built)} partition(s) loaded, {len(partitions)} total")
+        return {key: rows for key, _, rows in built}
+
+    @staticmethod
+    def _keys(conn: sqlite3.Connection, table: str, after: int, until: int) -> List[str]:
+        keys = conn.execute(
+            f"SELECT DISTINCT CASE WHEN {PARTITION_COLUMN} GLOB '[0-9][0-9][0-9][0-9]*' THEN substr({PARTITION_COLUMN}, 1, 4) "
+            f"ELSE '{OTHER_PARTITION}' END FROM {table} WHERE rowid > ? AND rowid <= ?",
+            (after, until),
+        ).fetchall()
+        return sorted(key for (key,) in keys)
+
+    def _load_partition(self, table: str, key: str, watermark: int, ddl: str, indexes: List[str]) -> Tuple[str, str, int]:
+        file = os.path.join(table, f"{key}.{uuid.uuid4().hex[:8]}.db")
+        path = os.path.join(self.directory, file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if key == OTHER_PARTITION:
+            where = f"NOT coalesce({PARTITION_COLUMN} GLOB '[0-9][0-9][0-9][0-9]*', 0)"
+            params: tuple = ()
+        else:
+            where = f"{PARTITION_COLUMN} >= ? AND {PARTITION_COLUMN} < ?"
+            params = (key, str(int(key) + 1))
+        conn = sqlite3.connect(f"file:{path}", uri=True, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute(ddl)
+            conn.execute("ATTACH DATABASE ? AS src", (f"file:{self.db_path}?mode=ro",))
+            conn.execute("BEGIN")
+            rows = conn.execute(
+                f"INSERT INTO main.{table} SELECT * FROM src.{table} WHERE {where} AND rowid <= ? ORDER BY rowid",
+                params + (watermark,),
+            ).rowcount
+            conn.execute("COMMIT")
+            conn.execute("DETACH DATABASE src")
+            for index in indexes:
+                conn.execute(index)
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            conn.close()
+        return key, file, rows
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            self._refreshing = threading.Thread(target=self._background_refresh, name="partition-refresh", daemon=True)
+            self._refreshing.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Partition refresh failed: {e}")
+
+    def _fresh_tables(self, conn: sqlite3.Connection, manifest: Dict[str, Dict]) -> Set[str]:
+        # Partitions hold every main-table row up to the current max rowid; re-checked when the data fingerprint moves
+        fingerprint = self._fingerprint()
+        with self._lock:
+            if self._fresh_at == fingerprint:
+                return {t for t, fresh in self._fresh.items() if fresh}
+        fresh = {}
+        for table, entry in manifest.items():
+            try:
+                watermark = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM main.{table}").fetchone()[0]
+            except sqlite3.OperationalError:
+                watermark = None
+            fresh[table] = watermark == entry["watermark"]
+        with self._lock:
+            self._fresh, self._fresh_at = fresh, fingerprint
+        return {t for t, ok in fresh.items() if ok}
+
+    # Query rewriting
+
+    def rewrite(self, conn: sqlite3.Connection, sql: str) -> str:
+        """
+        Returns the statement with each fresh partitioned table read from the partitions
+        its calendar predicates can match (attaching them to `conn` as needed).
+        """
+        manifest = self.manifest()
+        if not manifest:
+            return sql
+        masked = _LITERAL.sub(lambda m: "'" + "_" * (len(m.group()) - 2) + "'", sql)
+        refs = [m for m in _TABLE_REF.finditer(masked) if m.group(2).upper() in manifest]
+        if not refs:
+            return sql
+        fresh = self._fresh_tables(conn, manifest)
+        if any(m.group(2).upper() not in fresh for m in refs):
+            with self._lock:
+                self._stats["stale"] += 1
+            self.refresh_in_background()
+            return sql
+
+        tables = {m.group(2).upper() for m in refs}
+        years = self._years(sql, masked, tables.pop()) if len(refs) == 1 else None
+        plans = []
+        for m in refs:
+            table = m.group(2).upper()
+            partitions = manifest[table]["partitions"]
+            keys = [k for k in partitions if k == OTHER_PARTITION or years is None or int(k) in years]
+            with self._lock:
+                self._stats["queries"] += 1
+                self._stats["pruned"] += len(keys) < len(partitions)
+                self._stats["partitions_read"] += len(keys)
+                self._stats["partitions_total"] += len(partitions)
+            # Reading every partition gains nothing over the (indexed) main table
+            if len(keys) < len(partitions):
+                plans.append((m, table, keys))
+
+        files = [manifest[table]["partitions"][k]["file"] for _, table, keys in plans for k in keys]
+        if len(files) > self.max_attached:
+            return sql  # too many to attach at once; the main table has the same rows
+        schemas = self._attach(conn, files)
+        for m, table, keys in reversed(plans):
+            sources = [f"{schemas[manifest[table]['partitions'][k]['file']]}.{table}" for k in keys]
+            if not sources:
+                replacement = f"(SELECT * FROM main.{table} WHERE 0)"
+            elif len(sources) == 1:
+                replacement = sources[0]
+            else:
+                replacement = "(" + " UNION ALL ".join(f"SELECT * FROM {s}" for s in sources) + ")"
+            if m.group(3) is None:
+                replacement += f" AS {m.group(2)}"  # keeps table-qualified column references working
+            sql = sql[:m.start(2)] + replacement + sql[m.end(2):]
+        return sql
+
+    def _years(self, sql: str, masked: str, table: str) -> Optional[Set[int]]:
+        """
+        Years the query's predicates allow for `table`, or None when it can't be narrowed safely.
+        """
+        if _NOT_PRUNABLE.search(masked):
+            return None
+        aliases = table_aliases(masked)
+        fact_names = {name for name, source in aliases.items() if source == table}
+        calendar_names = {name for name, source in aliases.items() if source == CALENDAR_DIM}
+        calendar_joined = any(
+            {a.upper(), b.upper()} & fact_names and {a.upper(), b.upper()} & calendar_names
+            for a, b in _CALENDAR_JOIN.findall(masked)
+        )
+        referenced = set(aliases.values())
+
+        def owner(column: str) -> Set[str]:
+            return {t for t in referenced if column in {c.upper() for c in (self._columns(t) or ())}}
+
+        years: Optional[Set[int]] = None
+        start = _FROM.search(masked)
+        for m in _PREDICATE.finditer(sql, start.start() if start else 0):
+            qualifier, column = (m.group(1) or "").upper(), m.group(2).upper()
+            source = aliases.get(qualifier) if qualifier else None
+            if qualifier and source is None:
+                continue
+            if column == PARTITION_COLUMN:
+                usable = source == table or (source == CALENDAR_DIM and calendar_joined) or (
+                    not qualifier and (owner(column) == {table} or owner(column) <= {table, CALENDAR_DIM} and calendar_joined)
+                )
+            else:
+                usable = calendar_joined and (source == CALENDAR_DIM or (not qualifier and owner(column) == {CALENDAR_DIM}))
+            if not usable:
+                continue
+            allowed = self._allowed_years(m, text=column == PARTITION_COLUMN)
+            if allowed is not None:
+                years = allowed if years is None else years & allowed
+        return years
+
+    @staticmethod
+    def _allowed_years(m: "re.Match", text: bool) -> Optional[Set[int]]:
+        # Text CALENDAR_IDs only pin the year prefix; YEAR compares as a number
+        span = range(1000, 10000)
+        if m.group("like"):
+            return {int(m.group("like"))}
+        if m.group("list"):
+            years = {_year_of(v) for v in re.findall(_VALUE, m.group("list"))}
+            return None if None in years else years
+        if m.group("low"):
+            low, high = _year_of(m.group("low")), _year_of(m.group("high"))
+            return None if low is None or high is None else set(range(low, high + 1))
+        op, year = m.group("op"), _year_of(m.group("value"))
+        if year is None or op in ("!=", "<>"):
+            return None
+        exact_year = len(m.group("value").strip("'")) == 4
+        if op in ("=", "=="):
+            return {year} if exact_year or text else None
+        if op == ">=":
+            return {y for y in span if y >= year}
+        if op == ">":
+            return {y for y in span if y > year or (text and y == year)}
+        if op == "<=":
+            return {y for y in span if y <= year}
+        return {y for y in span if y < year or (text and not exact_year and y == year)}
+
+    def _attach(self, conn: sqlite3.Connection, files: List[str]) -> Dict[str, str]:
+        """
+        Attaches partition files (read-only, immutable) under stable schema names and
+        returns {file: schema}. Partitions this query doesn't need are detached first
+        when the connection would go over `max_attached`.
+        """
+        wanted = {file: "part_" + re.sub(r"\W", "_", file) for file in files}
+        attached = {name for _, name, _ in conn.execute("PRAGMA database_list") if name.startswith("part_")}
+        missing = [f for f, schema in wanted.items() if schema not in attached]
+        if len(attached) + len(missing) > self.max_attached:
+            for schema in attached - set(wanted.values()):
+                conn.execute(f"DETACH DATABASE {schema}")
+        for file in missing:
+            path = os.path.abspath(os.path.join(self.directory, file))
+            conn.execute(f"ATTACH DATABASE ? AS {wanted[file]}", (f"file:{path}?mode=ro&immutable=1",))
+        return wanted
+
+    def stats(self) -> Dict[str, object]:
+        manifest = self.manifest()
+        with self._lock:
+            return {
+                **self._stats,
+                "tables": {
+                    table: {"watermark": entry["watermark"], "partitions": {k: p["rows"] for k, p in sorted(entry["partitions"].items())}}
+                    for table, entry in manifest.items()
+                },
+            }
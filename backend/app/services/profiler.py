@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# (function name, file, first line of the function)
+FrameKey = Tuple[str, str, int]
+Stack = Tuple[FrameKey, ...]
+
+# Frames below these are scheduler plumbing, not the request's code
+_LOOP_ROOT = ("asyncio", "events.py", "_run")
+_WORKER_ROOT = ("futures", "thread.py", "run")
+AWAITING: Stack = (("[awaiting I/O]", "", 0),)
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "profiles")
+PROFILE_SUFFIXES = {"collapsed": ".collapsed.txt", "speedscope": ".speedscope.json"}
+
+def _frame_key(frame) -> FrameKey:
+    code = frame.f_code
+    return code.co_name, code.co_filename, code.co_firstlineno
+
+def _is_root(key: FrameKey, root: Tuple[str, str, str]) -> bool:
+    package, filename, name = root
+    path = key[1].replace("\\", "/")
+    return key[0] == name and path.endswith(f"/{package}/{filename}")
+
+def _stack(frame, root: Tuple[str, str, str]) -> Stack:
+    """
+    Root-first stack of `frame`, trimmed to the frames above the scheduler's entry point.
+    """
+    keys: List[FrameKey] = []
+    while frame is not None:
+        keys.append(_frame_key(frame))
+        frame = frame.f_back
+    keys.reverse()
+    for i in range(len(keys) - 1, -1, -1):
+        if _is_root(keys[i], root):
+            return tuple(keys[i + 1:])
+    return tuple(keys)
+
+class Profiler:
+    """
+    Sampling profiler for a single request.
+
+    A background thread wakes every `interval` seconds and records the Python stack of
+    - the event loop thread, when the task it is running belongs to the request
+      (tasks are registered by add_task, e.g. on entering a span), and
+    - worker threads while they run the request's blocking work (enter/leave_thread,
+      called by spans opened off the loop: SQLite queries, schema and entity lookups).
+    Ticks where none of the request's code is on a CPU count as "[awaiting I/O]"
+    (LLM calls, queue waits), so sample counts add up to wall-clock time.
+
+    Nothing runs unless a request is being profiled.
+    """
+
+    def __init__(self, interval: float = 0.005, max_samples: int = 20_000):
+        self.interval = interval
+        self.max_samples = max_samples
+        self.samples: Dict[str, Counter] = {}  # track ("event loop", "worker <name>") -> stack -> count
+        self.sample_count = 0
+        self.started = 0.0
+        self.duration_s = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+        self._threads: Counter = Counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Starts sampling; must be called from the event loop running the request.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        task = asyncio.current_task()
+        if task is not None:
+            self._tasks.add(task)
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration_s = time.perf_counter() - self.started
+
+    def add_task(self, task: asyncio.Task):
+        self._tasks.add(task)
+
+    def enter_thread(self):
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def leave_thread(self):
+        with self._lock:
+            ident = threading.get_ident()
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            if self.sample_count >= self.max_samples:
+                break
+            frames = sys._current_frames()
+            with self._lock:
+                workers = list(self._threads)
+            sampled = False
+            if asyncio.current_task(self._loop) in self._tasks:
+                frame = frames.get(self._loop_thread)
+                if frame is not None:
+                    self._add("event loop", _stack(frame, _LOOP_ROOT))
+                    sampled = True
+            for ident in workers:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                if ident not in names:
+                    thread = next((t for t in threading.enumerate() if t.ident == ident), None)
+                    names[ident] = f"worker {thread.name if thread else ident}"
+                self._add(names[ident], _stack(frame, _WORKER_ROOT))
+                sampled = True
+            if not sampled:
+                self._add("event loop", AWAITING)
+            del frames
+
+    def _add(self, track: str, stack: Stack):
+        self.samples.setdefault(track, Counter())[stack] += 1
+        self.sample_count += 1
+
+    # --- output ---
+
+    def collapsed(self) -> str:
+        """
+        Brendan Gregg's collapsed-stack format ("track;frame;frame count"), for flamegraph.pl
+        and most flame graph viewers.
+        """
+        lines = []
+        for track, stacks in sorted(self.samples.items()):
+            for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                frames = [track] + [f"{name} ({os.path.basename(path)}:{line})" if path else name for name, path, line in stack]
+                lines.append(";".join(f.replace(";", ":") for f in frames) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> Dict[str, Any]:
+        """
+        speedscope.app file: one sampled profile per track, weights in seconds.
+        """
+        frame_index: Dict[FrameKey, int] = {}
+        frames: List[Dict[str, Any]] = []
+        profiles = []
+        for track, stacks in sorted(self.samples.items()):
+            samples, weights = [], []
+            for stack, count in stacks.items():
+                indexes = []
+                for key in stack:
+                    if key not in frame_index:
+                        frame_index[key] = len(frames)
+                        frame = {"name": key[0]}
+                        if key[1]:
+                            frame.update(file=key[1], line=key[2])
+                        frames.append(frame)
+                    indexes.append(frame_index[key])
+                samples.append(indexes)
+                weights.append(count * self.interval)
+            profiles.append({
+                "type": "sampled",
+                "name": f"{name} - {track}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            })
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": name,
+            "exporter": "datapella request profiler",
+        }
+
+    def save(self, directory: str, name: str, formats: List[str]) -> List[str]:
+        """
+        Writes the capture as <name>.collapsed.txt and/or <name>.speedscope.json. Returns the paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        if "collapsed" in formats:
+            path = os.path.join(directory, name + PROFILE_SUFFIXES["collapsed"])
+            with open(path, "w") as f:
+                f.write(self.collapsed())
+            paths.append(path)
+        if "speedscope" in formats:
+            path = os.path.join(directory, name + PROFILE_SUFFIXES["speedscope"])
+            with open(path, "w") as f:
+                json.dump(self.speedscope(name), f)
+            paths.append(path)
+        return paths
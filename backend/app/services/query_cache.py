@@ -0,0 +1,177 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+from app.core.config import settings
+from app.services.snowflake_service import snowflake_service
+
+# Words that don't change what a question asks for
+FILLER_WORDS = {"please", "the", "a", "an", "me", "can", "you", "could", "would", "kindly"}
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+
+def normalize_question(question: str) -> str:
+    """
+    Canonical form of a user question: lowercase, punctuation stripped, filler words
+    dropped and whitespace collapsed ("Total sales for Allegra?" == "total sales for allegra").
+    """
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    return " ".join(w for w in words if w not in FILLER_WORDS)
+
+def canonical_sql(sql: str) -> str:
+    """
+    Canonical SQL text: whitespace collapsed outside string literals, trailing ';' removed.
+    """
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(";"))
+    return "".join(part if part.startswith("'") else re.sub(r"\s+", " ", part) for part in parts).strip()
+
+def referenced_tables(sql: str) -> Set[str]:
+    return {name.split(".")[-1].upper() for name in _TABLE_REF.findall(sql)}
+
+class TTLLRUCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries also expire after `ttl` seconds.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats["misses"] += 1
+                return default
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def pop(self, key: Hashable):
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def discard_where(self, predicate: Callable[[Any], bool]) -> int:
+        with self._lock:
+            keys = [k for k, (_, v) in self._data.items() if predicate(v)]
+            for key in keys:
+                del self._data[key]
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._stats["invalidations"] += len(self._data)
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            }
+
+class QueryCache:
+    """
+    Two-level cache in front of the SQL writer and executor.
+
+    Level 1 maps normalized questions to generated SQL, so a repeated question skips
+    the LLM. Level 2 maps canonical SQL to complete result sets. Result entries remember
+    the database fingerprint and the versions of the tables they read, and are dropped
+    when either has moved since.
+    """
+
+    def __init__(
+        self,
+        fingerprint: Callable[[], Hashable],
+        sql_max_size: int = 1024,
+        sql_ttl: float = 3600.0,
+        result_max_size: int = 256,
+        result_ttl: float = 300.0,
+    ):
+        self._fingerprint = fingerprint
+        self.sql_cache = TTLLRUCache(sql_max_size, sql_ttl)
+        self.result_cache = TTLLRUCache(result_max_size, result_ttl)
+        self._table_versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    # Level 1: question -> SQL
+
+    def get_sql(self, question: str) -> Optional[str]:
+        return self.sql_cache.get(normalize_question(question))
+
+    def put_sql(self, question: str, sql: str):
+        self.sql_cache.set(normalize_question(question), sql)
+
+    def forget_sql(self, question: str):
+        self.sql_cache.pop(normalize_question(question))
+
+    # Level 2: SQL -> results
+
+    def _versions(self, tables: Iterable[str]) -> Tuple[Tuple[str, int], ...]:
+        with self._lock:
+            return tuple(sorted((t, self._table_versions.get(t, 0)) for t in tables))
+
+    def get_result(self, sql: str) -> Optional[Any]:
+        key = canonical_sql(sql)
+        entry = self.result_cache.get(key)
+        if entry is None:
+            return None
+        fingerprint, versions, result = entry
+        if fingerprint != self._fingerprint() or versions != self._versions(t for t, _ in versions):
+            self.result_cache.pop(key)
+            return None
+        return result
+
+    def put_result(self, sql: str, result: Any):
+        versions = self._versions(referenced_tables(sql))
+        self.result_cache.set(canonical_sql(sql), (self._fingerprint(), versions, result))
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        """
+        Called (through SnowflakeService.tables_changed) by in-process writers after
+        changing tables; drops dependent results.
+        """
+        tables = {t.upper() for t in tables}
+        with self._lock:
+            for table in tables:
+                self._table_versions[table] = self._table_versions.get(table, 0) + 1
+        return self.result_cache.discard_where(lambda entry: any(t in tables for t, _ in entry[1]))
+
+    def clear(self):
+        self.sql_cache.clear()
+        self.result_cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sql": self.sql_cache.stats(), "results": self.result_cache.stats()}
+
+query_cache = QueryCache(
+    fingerprint=snowflake_service.data_fingerprint,
+    sql_max_size=settings.SQL_CACHE_MAX_ENTRIES,
+    sql_ttl=settings.SQL_CACHE_TTL_S,
+    result_max_size=settings.RESULT_CACHE_MAX_ENTRIES,
+    result_ttl=settings.RESULT_CACHE_TTL_S,
+)
+snowflake_service.on_tables_changed(query_cache.invalidate_tables)
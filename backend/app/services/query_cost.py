@@ -0,0 +1,239 @@
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+class QueryTooExpensive(ValueError):
+    """
+    Raised for statements whose estimated cost exceeds the budget. `diagnosis` explains
+    why in terms the SQL writer can act on.
+    """
+
+    def __init__(self, diagnosis: str):
+        super().__init__(f"Query rejected by cost guard: {diagnosis}")
+        self.diagnosis = diagnosis
+
+@dataclass
+class CostEstimate:
+    cost: float  # estimated rows visited
+    scans: List[Tuple[str, float]] = field(default_factory=list)  # (table, rows visited per loop) for full scans
+    streaming: bool = True  # no sort/aggregate/distinct step: rows flow out as they are found
+    limit: Optional[int] = None
+
+    @property
+    def bounded(self) -> bool:
+        # A LIMIT only caps the work when rows are produced as they are found
+        return self.streaming and self.limit is not None
+
+@dataclass
+class CostReview:
+    sql: str  # the statement to run; may carry an injected LIMIT
+    estimate: CostEstimate
+    rewritten: bool = False
+    diagnosis: Optional[str] = None
+
+    @property
+    def accepted(self) -> bool:
+        return self.diagnosis is None
+
+_TABLE_ALIAS = re.compile(
+    r"(?:\bFROM|\bJOIN|,)\s+([A-Za-z_][\w.]*)(?:\s+(?:AS\s+)?(?!(?:ON|USING|WHERE|FROM|SELECT|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|NATURAL|GROUP|ORDER|LIMIT|HAVING|UNION|WINDOW)\b)([A-Za-z_]\w*))?",
+    re.IGNORECASE,
+)
+_LIMIT = re.compile(r"\bLIMIT\s+(\d+)\s*(?:OFFSET\s+\d+\s*)?$", re.IGNORECASE)
+_AGGREGATE = re.compile(r"\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b|\bDISTINCT\b", re.IGNORECASE)
+_PLAN_STEP = re.compile(r"^(SCAN|SEARCH)\s+(\S+)")
+_SUBPLAN = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE)\s+(\S+)")
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    """
+    Maps every table name and alias in FROM/JOIN clauses to its (uppercased) table name.
+    """
+    aliases = {}
+    for table, alias in _TABLE_ALIAS.findall(sql):
+        table = table.split(".")[-1].upper()
+        aliases[table] = table
+        if alias:
+            aliases[alias.upper()] = table
+    return aliases
+
+# Fraction of a table assumed to match an index lookup that isn't on a unique key
+EQUALITY_SELECTIVITY = 0.1
+RANGE_SELECTIVITY = 0.25
+# Rows assumed for sources the plan doesn't let us size (e.g. recursive CTEs)
+UNKNOWN_SOURCE_ROWS = 1000
+
+class QueryCostGuard:
+    """
+    Pre-execution cost check based on EXPLAIN QUERY PLAN.
+
+    The plan's loops are costed with a nested-loop model: a full SCAN visits every row of
+    its table, a SEARCH visits a fraction of it (one row for unique keys), and nested loops
+    multiply. Row counts come from sqlite_stat1 when ANALYZE has run and from COUNT(*)
+    otherwise. When the data fingerprint moves, the previous counts keep being served while
+    they are recounted in the background on a connection from `connect`.
+
+    Plans over `max_cost` are accepted only if a LIMIT bounds a streaming plan (one is
+    injected when missing); anything else is rejected with a diagnosis suggesting a
+    cheaper formulation. The request deadline remains the backstop for bad estimates.
+    """
+
+    def __init__(
+        self,
+        fingerprint: Callable[[], Hashable],
+        max_cost: float = 20_000_000,
+        auto_limit: int = 10_000,
+        connect: Optional[Callable[[], sqlite3.Connection]] = None,
+    ):
+        self.max_cost = max_cost
+        self.auto_limit = auto_limit
+        self._fingerprint = fingerprint
+        self._connect = connect
+        self._row_counts: Dict[str, int] = {}
+        self._counted_at: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._refreshing: Optional[threading.Thread] = None
+
+    def row_counts(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """
+        Row count per (uppercased) table. Only the very first call, or a guard without
+        `connect`, counts on the caller's connection; later changes are picked up in the background.
+        """
+        fingerprint = self._fingerprint()
+        with self._lock:
+            counts, counted_at = self._row_counts, self._counted_at
+        if counted_at == fingerprint:
+            return counts
+        if counted_at is None or self._connect is None:
+            return self._count(conn, fingerprint)
+        self.refresh_in_background()
+        return counts
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Recounts on a dedicated connection (startup warm-up and background refreshes).
+        """
+        fingerprint = self._fingerprint()
+        conn = self._connect()
+        try:
+            return self._count(conn, fingerprint)
+        finally:
+            conn.close()
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            self._refreshing = threading.Thread(target=self._background_refresh, name="row-count-refresh", daemon=True)
+            self._refreshing.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Row count refresh failed: {e}")
+
+    def _count(self, conn: sqlite3.Connection, fingerprint: Hashable) -> Dict[str, int]:
+        counts = {}
+        try:
+            for table, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+                counts[table.upper()] = max(counts.get(table.upper(), 0), int(stat.split()[0]))
+        except sqlite3.OperationalError:
+            pass  # never analyzed
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+            if table.upper() not in counts:
+                counts[table.upper()] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        with self._lock:
+            self._row_counts, self._counted_at = counts, fingerprint
+        return counts
+
+    def estimate(self, conn: sqlite3.Connection, sql: str) -> CostEstimate:
+        sql = sql.strip().rstrip(";")
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        counts = self.row_counts(conn)
+        aliases = table_aliases(sql)
+
+        children: Dict[int, List[Tuple[int, str]]] = {}
+        for node_id, parent, _, detail in plan:
+            children.setdefault(parent, []).append((node_id, detail))
+
+        subplan_rows: Dict[str, float] = {}
+        scans: List[Tuple[str, float]] = []
+
+        def source(name: str) -> str:
+            return aliases.get(name.upper(), name.upper())
+
+        def source_rows(name: str) -> float:
+            name = source(name)
+            if name in subplan_rows:
+                return subplan_rows[name]
+            return counts.get(name, UNKNOWN_SOURCE_ROWS)
+
+        def cost_of(parent: int) -> float:
+            # Loops at one level nest inside each other; subplans are run alongside them
+            loops, extra = None, 0.0
+            for node_id, detail in children.get(parent, []):
+                step = _PLAN_STEP.match(detail)
+                if step and step.group(2) != "CONSTANT":
+                    rows = source_rows(step.group(2))
+                    if step.group(1) == "SCAN":
+                        factor = rows
+                        scans.append((source(step.group(2)), rows))
+                    elif "PRIMARY KEY" in detail or "rowid" in detail or "autoindex" in detail:
+                        factor = 1.0
+                    elif "AUTOMATIC" in detail:
+                        extra += rows  # building the transient index reads the table once
+                        factor = 1.0
+                    else:
+                        selectivity = RANGE_SELECTIVITY if re.search(r"[<>]", detail) else EQUALITY_SELECTIVITY
+                        factor = max(rows * selectivity, 1.0)
+                    loops = factor if loops is None else loops * factor
+                    extra += cost_of(node_id)
+                    continue
+                subplan = _SUBPLAN.match(detail)
+                sub_cost = cost_of(node_id)
+                if subplan:
+                    subplan_rows[subplan.group(1).upper()] = max(sub_cost, 1.0)
+                extra += sub_cost
+            return (loops or 0.0) + extra
+
+        cost = cost_of(0)
+        limit = _LIMIT.search(sql)
+        streaming = not any("TEMP B-TREE" in detail for *_, detail in plan) and not _AGGREGATE.search(sql)
+        return CostEstimate(cost, scans, streaming, int(limit.group(1)) if limit else None)
+
+    def review(self, conn: sqlite3.Connection, sql: str) -> CostReview:
+        """
+        Returns the statement to run (possibly with an injected LIMIT) or a diagnosis.
+        """
+        estimate = self.estimate(conn, sql)
+        if estimate.cost <= self.max_cost or estimate.bounded:
+            return CostReview(sql, estimate)
+        if estimate.streaming:
+            limited = f"{sql.strip().rstrip(';')} LIMIT {self.auto_limit}"
+            return CostReview(limited, self.estimate(conn, limited), rewritten=True)
+        return CostReview(sql, estimate, diagnosis=self.diagnose(estimate))
+
+    def check(self, conn: sqlite3.Connection, sql: str) -> CostEstimate:
+        """
+        Raises QueryTooExpensive unless the statement fits the budget as written.
+        """
+        estimate = self.estimate(conn, sql)
+        if estimate.cost > self.max_cost and not estimate.bounded:
+            raise QueryTooExpensive(self.diagnose(estimate))
+        return estimate
+
+    def diagnose(self, estimate: CostEstimate) -> str:
+        notes = [f"estimated {estimate.cost:,.0f} row visits exceeds the budget of {self.max_cost:,.0f}"]
+        full_scans = list(dict.fromkeys(t for t, _ in estimate.scans))
+        if len(estimate.scans) > 1:
+            notes.append("full scans of " + ", ".join(full_scans) + " are nested; join them on their key columns")
+        facts = [t for t in full_scans if t.startswith("FCT_")]
+        if facts:
+            notes.append(f"restrict {', '.join(facts)} with a date predicate on CALENDAR_ID (via DIM_CALENDAR YEAR/QUARTER/MONTH)")
+            if any(t.endswith(("_WK", "_MTH")) for t in facts):
+                notes.append("aggregate from a coarser-grain table (e.g. FCT_SALES_NATIONAL_QTR) when the question allows it")
+        if not estimate.streaming:
+            notes.append("sorting/aggregating the full result is what makes a LIMIT ineffective here")
+        return "; ".join(notes)
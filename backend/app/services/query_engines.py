@@ -0,0 +1,66 @@
+import sqlite3
+from typing import Any, Callable, List, Optional, Tuple
+from app.services.cancellation import QueryGuard, install_guard
+from app.services.query_result import QueryResult
+
+class QueryEngine:
+    """
+    Executes read-only statements against the warehouse database.
+
+    plan() returns an engine-specific plan, or None when the engine does not run the
+    statement (SnowflakeService then offers it to the next engine). open() starts the
+    plan on a pooled connection and returns a DB-API style cursor (description,
+    fetchmany, fetchall, close); `guard` carries the request's cancel token.
+    """
+    name = ""
+
+    def plan(self, conn: sqlite3.Connection, sql: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def open(self, conn: sqlite3.Connection, plan: Any, guard: QueryGuard):
+        raise NotImplementedError
+
+class SQLiteEngine(QueryEngine):
+    """
+    The default engine: runs any statement on SQLite itself. The cost check sees the
+    statement as written; `rewrite` (e.g. partition pruning) then adapts it to the
+    physical layout on the connection that will run it.
+    """
+    name = "sqlite"
+
+    def __init__(
+        self,
+        check_cost: Callable[[sqlite3.Connection, str], Any],
+        rewrite: Optional[Callable[[sqlite3.Connection, str], str]] = None,
+    ):
+        self._check_cost = check_cost
+        self._rewrite = rewrite
+
+    def plan(self, conn: sqlite3.Connection, sql: str) -> str:
+        self._check_cost(conn, sql)
+        return self._rewrite(conn, sql) if self._rewrite is not None else sql
+
+    def open(self, conn: sqlite3.Connection, plan: str, guard: QueryGuard) -> sqlite3.Cursor:
+        install_guard(conn, guard)
+        return conn.execute(plan)
+
+class MaterializedCursor:
+    """
+    Cursor interface over a result that was computed up front (e.g. by the columnar engine).
+    """
+
+    def __init__(self, result: QueryResult):
+        self.description: List[Tuple] = [(name, None, None, None, None, None, None) for name in result.columns]
+        self._rows = result.rows
+        self._offset = 0
+
+    def fetchmany(self, size: int) -> List[tuple]:
+        rows = self._rows[self._offset:self._offset + size]
+        self._offset += len(rows)
+        return rows
+
+    def fetchall(self) -> List[tuple]:
+        return self.fetchmany(len(self._rows))
+
+    def close(self):
+        self._rows = []
@@ -0,0 +1,56 @@
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Tuple
+
+class QueryResult(Sequence):
+    """
+    Compact query result: column names plus the raw row tuples from the cursor.
+
+    Behaves like a read-only list of row dicts, but a dict is only built for the rows
+    that are actually indexed or iterated. Use `to_records()` at the JSON boundary.
+    """
+    __slots__ = ("columns", "rows")
+
+    def __init__(self, columns: List[str], rows: List[Tuple[Any, ...]]):
+        self.columns = columns
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return QueryResult(self.columns, self.rows[index])
+        return dict(zip(self.columns, self.rows[index]))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        columns = self.columns
+        for row in self.rows:
+            yield dict(zip(columns, row))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, QueryResult):
+            return self.columns == other.columns and self.rows == other.rows
+        if isinstance(other, list):
+            return self.to_records() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"QueryResult(columns={self.columns!r}, rows={len(self.rows)})"
+
+    def column(self, name: str) -> List[Any]:
+        """
+        Values of a single column, without building row dicts.
+        """
+        idx = self.columns.index(name)
+        return [row[idx] for row in self.rows]
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+def to_jsonable(obj: Any) -> Any:
+    """
+    `default=` hook for json.dumps: materializes QueryResults as row dicts.
+    """
+    if isinstance(obj, QueryResult):
+        return obj.to_records()
+    return str(obj)
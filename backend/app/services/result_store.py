@@ -0,0 +1,212 @@
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import ExitStack
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+from app.services.cancellation import CancelToken, QueryGuard, interrupted_error
+from app.services.metrics import sql_rows_total
+from app.services.query_result import QueryResult
+from app.services.tracing import span
+
+class ResultCursor:
+    """
+    Server-side cursor over a running query. Holds its pooled connection until the
+    result is exhausted or closed, and hands out rows one page at a time.
+    `elapsed_s` accumulates time spent in SQLite; `on_close` is called once with the
+    cursor when it closes. `engine` names the query engine producing the rows (for metrics).
+    """
+
+    def __init__(
+        self,
+        cursor: sqlite3.Cursor,
+        resources: ExitStack,
+        guard: Optional[QueryGuard] = None,
+        elapsed_s: float = 0.0,
+        on_close: Optional[Callable[["ResultCursor"], None]] = None,
+        engine: str = "sqlite",
+    ):
+        self.columns = [desc[0] for desc in cursor.description or ()]
+        self.rows_sent = 0
+        self.elapsed_s = elapsed_s
+        self.exhausted = False
+        self.last_used = time.monotonic()
+        self._cursor = cursor
+        self._ahead: List[tuple] = []  # read past the last page to know whether more rows exist
+        self._resources = resources
+        self._guard = guard or QueryGuard()
+        self._on_close = on_close
+        self.engine = engine
+        self._lock = threading.Lock()
+
+    def fetch_page(self, page_size: int, token: Optional[CancelToken] = None) -> QueryResult:
+        """
+        Returns up to page_size rows; closes the cursor with the page that drains it (one
+        row is read ahead, so a page ending exactly at the last row also closes it).
+        Producing the page is interrupted if `token` expires.
+        """
+        with self._lock:
+            self.last_used = time.monotonic()
+            if self.exhausted:
+                return QueryResult(self.columns, [])
+            self._guard.token = token
+            started = time.perf_counter()
+            try:
+                with span("sql", "fetch_page", engine=self.engine) as timing:
+                    rows = self._ahead + self._cursor.fetchmany(page_size + 1 - len(self._ahead))
+                    rows, self._ahead = rows[:page_size], rows[page_size:]
+                    timing.attrs["rows"] = len(rows)
+            except Exception as e:
+                self._close_locked()
+                raise interrupted_error(e, token)
+            finally:
+                self._guard.token = None
+                self.elapsed_s += time.perf_counter() - started
+            self.rows_sent += len(rows)
+            sql_rows_total.inc(len(rows), engine=self.engine)
+            if not self._ahead:
+                self._close_locked()
+            return QueryResult(self.columns, rows)
+
+    def close(self):
+        with self._lock:
+            self._close_locked()
+
+    def _close_locked(self):
+        if not self.exhausted:
+            self.exhausted = True
+            self._cursor.close()
+            self._resources.close()
+            if self._on_close is not None:
+                self._on_close(self)
+
+class ResultStore:
+    """
+    Registry of open ResultCursors addressable by handle id, owned by the session that
+    opened them. Only the owning session can page or close a handle.
+
+    Open cursors each pin a pooled connection, so the store is bounded: idle cursors
+    expire after `idle_timeout` seconds, a session holding `max_per_session` cursors has
+    its least recently used one closed to make room for a new one, and at most `max_open`
+    cursors are open in total (kept below the pool size so queries always get a
+    connection). A session never loses a cursor to another session; when the store is
+    full, register() declines the new cursor instead.
+    """
+
+    def __init__(self, max_open: int = 4, max_per_session: int = 2, idle_timeout: float = 120.0):
+        self.max_open = max_open
+        self.max_per_session = max_per_session
+        self.idle_timeout = idle_timeout
+        self._cursors: Dict[Optional[str], "OrderedDict[str, ResultCursor]"] = {}  # owner -> handle -> cursor
+        self._owners: Dict[str, Optional[str]] = {}  # handle -> owner
+        self._declined = 0
+        self._lock = threading.Lock()
+
+    def register(self, cursor: ResultCursor, owner: Optional[str] = None) -> Optional[str]:
+        """
+        Keeps the cursor open under a new handle, or returns None if the store is full
+        (the caller still owns the cursor then and must close it).
+        """
+        handle = uuid.uuid4().hex
+        with self._lock:
+            evicted = self._sweep_locked()
+            cursors = self._cursors.get(owner, OrderedDict())
+            # The session's own least recently used cursors make room, but only for a cursor that is kept
+            excess = max(0, len(cursors) - self.max_per_session + 1)
+            if len(self._owners) - excess >= self.max_open:
+                self._declined += 1
+                handle = None
+            else:
+                for _ in range(excess):
+                    oldest, oldest_cursor = cursors.popitem(last=False)
+                    del self._owners[oldest]
+                    evicted.append(oldest_cursor)
+                cursors[handle] = cursor
+                self._owners[handle] = owner
+                self._cursors[owner] = cursors
+        for stale in evicted:
+            stale.close()
+        return handle
+
+    def get(self, handle: str, owner: Optional[str] = None) -> Optional[ResultCursor]:
+        """
+        The open cursor for a handle, if it exists and belongs to `owner`.
+        """
+        with self._lock:
+            expired = self._sweep_locked()
+            cursor = None
+            if handle in self._owners and self._owners[handle] == owner:
+                cursors = self._cursors[owner]
+                cursors.move_to_end(handle)
+                cursor = cursors[handle]
+        for stale in expired:
+            stale.close()
+        return cursor
+
+    def fetch_page(self, handle: str, page_size: Optional[int] = None, owner: Optional[str] = None) -> Optional[QueryResult]:
+        """
+        Next page for a handle, or None if the handle is unknown, expired or not `owner`'s.
+        Exhausted cursors are dropped from the store after their last page.
+        """
+        cursor = self.get(handle, owner)
+        if cursor is None:
+            return None
+        page = cursor.fetch_page(page_size or settings.RESULT_PAGE_SIZE)
+        if cursor.exhausted:
+            self.close(handle, owner)
+        return page
+
+    def close(self, handle: str, owner: Optional[str] = None) -> bool:
+        """
+        Closes `owner`'s cursor for a handle. Returns False if there was none.
+        """
+        with self._lock:
+            if handle not in self._owners or self._owners[handle] != owner:
+                return False
+            cursor = self._pop_locked(handle)
+        cursor.close()
+        return True
+
+    def close_owner(self, owner: str):
+        """
+        Closes every cursor opened on behalf of a session (e.g. on disconnect).
+        """
+        with self._lock:
+            cursors = self._cursors.pop(owner, {})
+            for handle in cursors:
+                del self._owners[handle]
+        for cursor in cursors.values():
+            cursor.close()
+
+    def _pop_locked(self, handle: str) -> ResultCursor:
+        owner = self._owners.pop(handle)
+        cursors = self._cursors[owner]
+        cursor = cursors.pop(handle)
+        if not cursors:
+            del self._cursors[owner]
+        return cursor
+
+    def _sweep_locked(self) -> List[ResultCursor]:
+        # Expired cursors are returned for the caller to close outside the lock
+        now = time.monotonic()
+        expired = [h for cursors in self._cursors.values() for h, c in cursors.items() if now - c.last_used > self.idle_timeout]
+        return [self._pop_locked(handle) for handle in expired]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open_cursors": len(self._owners),
+                "sessions": len(self._cursors),
+                "max_open": self.max_open,
+                "max_per_session": self.max_per_session,
+                "declined": self._declined,
+            }
+
+# Cursors pin pooled connections: keep at least one connection free for queries
+result_store = ResultStore(
+    max_open=max(1, min(settings.RESULT_MAX_OPEN_CURSORS, settings.SQLITE_POOL_SIZE - 1)),
+    max_per_session=settings.RESULT_MAX_OPEN_CURSORS_PER_SESSION,
+    idle_timeout=settings.RESULT_CURSOR_IDLE_TIMEOUT_S,
+)
@@ -0,0 +1,360 @@
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# Materialized aggregates are built over the monthly sales fact joined to products
+SALES_FACT = "FCT_SALES_NATIONAL_MTH"
+PRODUCT_DIM = "DIM_SOURCE_PRODUCT"
+JOIN_KEY = "SOURCE_PRODUCT_ID"
+SALES_MEASURES = (
+    "QTY_UNITS", "QTY_SU", "QTY_CU", "VALUE_LC", "VALUE_RX", "VALUE_MNF_LC", "VALUE_TRADE_LC",
+    "VALUE_PUBLIC_LC", "VALUE_MNF_EU", "VALUE_TRADE_EU", "VALUE_PUBLIC_EU",
+)
+
+# Rollup tables and their bookkeeping share this prefix (and are hidden from the LLM schema)
+ROLLUP_PREFIX = "AGG_"
+STATE_TABLE = "AGG_REFRESH_STATE"
+
+@dataclass(frozen=True)
+class AggregateDefinition:
+    name: str
+    dimensions: Tuple[Tuple[str, str], ...]  # (source table, column) pairs the rollup groups by
+
+    @property
+    def columns(self) -> List[str]:
+        return [col for _, col in self.dimensions]
+
+SALES_AGGREGATES = [
+    AggregateDefinition("AGG_SALES_BRAND", ((PRODUCT_DIM, "PRODUCT_BRAND"),)),
+    AggregateDefinition("AGG_SALES_BRAND_CATEGORY_COUNTRY", (
+        (PRODUCT_DIM, "PRODUCT_BRAND"), (PRODUCT_DIM, "CATEGORY_NM"), (SALES_FACT, "COUNTRY_ID"),
+    )),
+    AggregateDefinition("AGG_SALES_BRAND_CATEGORY_COUNTRY_MTH", (
+        (PRODUCT_DIM, "PRODUCT_BRAND"), (PRODUCT_DIM, "CATEGORY_NM"), (SALES_FACT, "COUNTRY_ID"), (SALES_FACT, "CALENDAR_ID"),
+    )),
+]
+
+class _NotEligible(Exception):
+    pass
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_UNSUPPORTED = re.compile(
+    r"\b(?:WITH|UNION|INTERSECT|EXCEPT|OVER|LEFT|RIGHT|FULL|OUTER|CROSS|NATURAL|AVG|TOTAL|GROUP_CONCAT)\b|\bCOUNT\s*\(\s*(?!\*|DISTINCT\b|(?:\w+\.)?\w+\s*\))",
+    re.IGNORECASE,
+)
+_SELECT = re.compile(r"^\s*SELECT\s+(DISTINCT\s+)?", re.IGNORECASE)
+_FROM_JOIN = re.compile(
+    r"\bFROM\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:INNER|JOIN)\b)(\w+))?\s+(?:INNER\s+)?JOIN\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b)(\w+))?"
+    r"\s+ON\s+(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)(?=\s*$|\s+(?:WHERE|GROUP|HAVING|ORDER|LIMIT)\b)",
+    re.IGNORECASE,
+)
+_TOKEN = re.compile(
+    r"(?P<count>\bCOUNT\s*\(\s*\*\s*\))"
+    r"|(?P<count_col>\bCOUNT\s*\(\s*(?:(?P<count_alias>\w+)\.)?(?P<count_column>\w+)\s*\))"
+    r"|(?P<sum>\bSUM\s*\(\s*(?:(?P<sum_alias>\w+)\.)?(?P<sum_col>\w+)\s*\))"
+    r"|(?P<alias>\b[A-Za-z_]\w*)\.(?P<col>\w+)"
+    r"|(?P<word>\b[A-Za-z_]\w*\b)",
+    re.IGNORECASE,
+)
+_HAS_ALIAS = re.compile(r"(?:\)|\s)\s*(?:AS\s+)?(?:(?!END\b)[A-Za-z_]\w*|\"[^\"]*\")\s*$", re.IGNORECASE)
+_PLAIN_COLUMN = re.compile(r"^\s*(?:\w+\.)?\w+\s*$")
+_AGGREGATE_ITEM = re.compile(r"^\s*(?:SUM|COUNT|MIN|MAX)\s*\(", re.IGNORECASE)
+
+def _split_select_list(text: str) -> List[str]:
+    items, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            items.append(text[start:i])
+            start = i + 1
+    items.append(text[start:])
+    return items
+
+class RollupManager:
+    """
+    Materialized sales aggregates plus a rewriter that routes eligible queries to them.
+
+    Each rollup stores SUMs of every sales measure and a ROW_COUNT per group. Refreshes are
+    incremental: only fact rows past the rowid watermark recorded for a rollup are
+    aggregated and upserted into it. Changes the watermark cannot see (fact updates or
+    deletes, VACUUM, edits to products) need rebuild(); a change in the product table's
+    size is detected and triggers one.
+
+    route() rewrites aggregate queries over the fact/product join (SUM of measures, COUNT(*)
+    and COUNT of rollup columns, grouping and filters on rollup columns) to read the
+    smallest fresh rollup that covers them. Stale rollups are never used; a background refresh is started instead.
+    """
+
+    def __init__(
+        self,
+        connect_rw: Callable[[], sqlite3.Connection],
+        columns: Callable[[str], Iterable[str]],
+        fingerprint: Callable[[], Hashable],
+        aggregates: Optional[List[AggregateDefinition]] = None,
+        on_change: Optional[Callable[[List[str]], None]] = None,
+    ):
+        self.aggregates = aggregates or SALES_AGGREGATES
+        self._on_change = on_change
+        self._connect_rw = connect_rw
+        self._columns = columns
+        self._fingerprint = fingerprint
+        self._watermarks: Dict[str, Tuple[int, str]] = {}
+        self._row_counts: Dict[str, int] = {}
+        self._fresh_at: Optional[Hashable] = None
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._refreshing: Optional[threading.Thread] = None
+        self._stats = {"routed": 0, "not_eligible": 0, "stale": 0, "refreshes": 0, "rebuilds": 0, "groups_upserted": 0, "refresh_time_s": 0.0}
+
+    # Maintenance
+
+    def _ensure_tables(self, conn: sqlite3.Connection):
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (NAME TEXT PRIMARY KEY, FACT_ROWID INTEGER, DIM_SIGNATURE TEXT, REFRESHED_TS TIMESTAMP)")
+        for agg in self.aggregates:
+            columns = ", ".join([f"{col} TEXT" for col in agg.columns] + [f"{m} REAL" for m in SALES_MEASURES] + ["ROW_COUNT INTEGER"])
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {agg.name} ({columns})")
+            conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS IDX_{agg.name} ON {agg.name} ({', '.join(agg.columns)})")
+
+    @staticmethod
+    def _source_state(conn: sqlite3.Connection) -> Tuple[int, str]:
+        fact_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {SALES_FACT}").fetchone()[0]
+        dim_signature = "%s:%s" % conn.execute(f"SELECT COUNT(*), COALESCE(MAX(rowid), 0) FROM {PRODUCT_DIM}").fetchone()
+        return fact_rowid, dim_signature
+
+    def refresh(self, full: bool = False) -> Dict[str, int]:
+        """
+        Folds fact rows inserted since the last refresh into every rollup (all rows when
+        `full` or when the product table changed). Returns groups upserted per rollup.
+        Changed rollups are reported to `on_change` together with their source tables,
+        whose new rows they now reflect.
+        """
+        started = time.perf_counter()
+        folded: Dict[str, int] = {}
+        changed: List[str] = []
+        with self._refresh_lock:
+            conn = self._connect_rw()
+            try:
+                with conn:
+                    self._ensure_tables(conn)
+                    fact_rowid, dim_signature = self._source_state(conn)
+                    state = {name: (rowid, sig) for name, rowid, sig in conn.execute(f"SELECT NAME, FACT_ROWID, DIM_SIGNATURE FROM {STATE_TABLE}")}
+                    for agg in self.aggregates:
+                        since, signature = state.get(agg.name, (0, None))
+                        if full or signature != dim_signature or since > fact_rowid:
+                            conn.execute(f"DELETE FROM {agg.name}")
+                            since = 0
+                            self._stats["rebuilds"] += 1
+                            changed.append(agg.name)
+                        if since < fact_rowid:
+                            folded[agg.name] = self._fold(conn, agg, since, fact_rowid)
+                            if folded[agg.name] and agg.name not in changed:
+                                changed.append(agg.name)
+                        conn.execute(
+                            f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+                            (agg.name, fact_rowid, dim_signature),
+                        )
+                    row_counts = {agg.name: conn.execute(f"SELECT COUNT(*) FROM {agg.name}").fetchone()[0] for agg in self.aggregates}
+            finally:
+                conn.close()
+            with self._lock:
+                self._watermarks = {agg.name: (fact_rowid, dim_signature) for agg in self.aggregates}
+                self._row_counts = row_counts
+                self._fresh_at = None
+                self._stats["refreshes"] += 1
+                self._stats["groups_upserted"] += sum(folded.values())
+                self._stats["refresh_time_s"] += time.perf_counter() - started
+        if changed and self._on_change is not None:
+            self._on_change(changed + [SALES_FACT, PRODUCT_DIM])
+        return folded
+
+    def rebuild(self) -> Dict[str, int]:
+        return self.refresh(full=True)
+
+    @staticmethod
+    def _fold(conn: sqlite3.Connection, agg: AggregateDefinition, since: int, until: int) -> int:
+        aliases = {SALES_FACT: "s", PRODUCT_DIM: "p"}
+        dims = ", ".join(f"{aliases[table]}.{col}" for table, col in agg.dimensions)
+        sums = ", ".join(f"SUM(s.{m})" for m in SALES_MEASURES)
+        # NULL-safe addition: SUM ignores NULLs, so a NULL on either side keeps the other
+        updates = ", ".join(f"{m} = COALESCE({m} + excluded.{m}, {m}, excluded.{m})" for m in SALES_MEASURES)
+        cursor = conn.execute(
+            f"""
+            INSERT INTO {agg.name} ({', '.join(agg.columns + list(SALES_MEASURES))}, ROW_COUNT)
+            SELECT {dims}, {sums}, COUNT(*)
+            FROM {SALES_FACT} s JOIN {PRODUCT_DIM} p ON s.{JOIN_KEY} = p.{JOIN_KEY}
+            WHERE s.rowid > ? AND s.rowid <= ?
+            GROUP BY {dims}
+            ON CONFLICT ({', '.join(agg.columns)}) DO UPDATE SET {updates}, ROW_COUNT = ROW_COUNT + excluded.ROW_COUNT
+            """,
+            (since, until),
+        )
+        return cursor.rowcount
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            self._refreshing = threading.Thread(target=self._background_refresh, name="rollup-refresh", daemon=True)
+            self._refreshing.start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"Rollup refresh failed: {e}")
+
+    def is_fresh(self, conn: sqlite3.Connection) -> bool:
+        """
+        True when every rollup has folded in all fact rows. Re-checked only when the
+        data fingerprint moves.
+        """
+        fingerprint = self._fingerprint()
+        with self._lock:
+            if self._fresh_at is not None and self._fresh_at == fingerprint:
+                return True
+            watermarks = dict(self._watermarks)
+        if len(watermarks) < len(self.aggregates):
+            return False
+        state = self._source_state(conn)
+        fresh = all(mark == state for mark in watermarks.values())
+        if fresh:
+            with self._lock:
+                self._fresh_at = fingerprint
+        return fresh
+
+    # Routing
+
+    def route(self, conn: sqlite3.Connection, sql: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns (rewritten SQL, rollup name) when a fresh rollup can answer the query, else None.
+        """
+        try:
+            needed, rewrite = self._analyze(sql)
+        except _NotEligible:
+            self._stats["not_eligible"] += 1
+            return None
+        with self._lock:
+            row_counts = dict(self._row_counts)
+        candidates = [agg for agg in self.aggregates if needed <= set(agg.dimensions) and agg.name in row_counts]
+        if not candidates:
+            self._stats["not_eligible"] += 1
+            return None
+        if not self.is_fresh(conn):
+            self._stats["stale"] += 1
+            self.refresh_in_background()
+            return None
+        target = min(candidates, key=lambda agg: row_counts[agg.name])
+        self._stats["routed"] += 1
+        return rewrite(target.name), target.name
+
+    def _analyze(self, sql: str):
+        """
+        Parses an eligible query. Returns the (table, column) dimensions it needs and a
+        function producing the rewritten SQL for a given rollup; raises _NotEligible otherwise.
+        """
+        literals: List[str] = []
+
+        def mask(match):
+            literals.append(match.group(0))
+            return f"__LIT{len(literals) - 1}__"
+
+        def unmask(text: str) -> str:
+            return re.sub(r"__LIT(\d+)__", lambda m: literals[int(m.group(1))], text)
+
+        masked = _LITERAL.sub(mask, sql.strip().rstrip(";"))
+        if len(re.findall(r"\bSELECT\b", masked, re.IGNORECASE)) != 1 or _UNSUPPORTED.search(masked):
+            raise _NotEligible()
+        select = _SELECT.match(masked)
+        source = _FROM_JOIN.search(masked)
+        if select is None or source is None:
+            raise _NotEligible()
+        left, left_alias, right, right_alias, on_a, on_a_col, on_b, on_b_col = source.groups()
+        aliases = {(left_alias or left).upper(): left.upper(), (right_alias or right).upper(): right.upper()}
+        if set(aliases.values()) != {SALES_FACT, PRODUCT_DIM}:
+            raise _NotEligible()
+        if {aliases.get(on_a.upper()), aliases.get(on_b.upper())} != {SALES_FACT, PRODUCT_DIM} or on_a_col.upper() != JOIN_KEY or on_b_col.upper() != JOIN_KEY:
+            raise _NotEligible()
+
+        fact_columns = {c.upper() for c in self._columns(SALES_FACT)}
+        dim_columns = {c.upper() for c in self._columns(PRODUCT_DIM)}
+        needed: Set[Tuple[str, str]] = set()
+
+        def dimension(table: str, column: str):
+            if table == SALES_FACT and column in SALES_MEASURES:
+                raise _NotEligible()  # measures are only usable inside SUM()
+            needed.add((table, column))
+
+        def column_of(alias: Optional[str], column: str) -> Tuple[str, str]:
+            column = column.upper()
+            if alias:
+                table = aliases.get(alias.upper())
+                if table is None:
+                    raise _NotEligible()
+                return table, column
+            in_fact, in_dim = column in fact_columns, column in dim_columns
+            if in_fact == in_dim:
+                raise _NotEligible()  # unknown, or ambiguous without a qualifier
+            return (SALES_FACT if in_fact else PRODUCT_DIM), column
+
+        def substitute(match) -> str:
+            # Counts are sums of per-group row counts; COALESCE keeps COUNT's 0 (not NULL) when nothing matches
+            if match.group("count"):
+                return "COALESCE(SUM(ROW_COUNT), 0)"
+            if match.group("count_col"):
+                table, column = column_of(match.group("count_alias"), match.group("count_column"))
+                dimension(table, column)
+                return f"COALESCE(SUM(CASE WHEN {column} IS NOT NULL THEN ROW_COUNT END), 0)"
+            if match.group("sum"):
+                alias, column = match.group("sum_alias"), match.group("sum_col").upper()
+                if column not in SALES_MEASURES or (alias and aliases.get(alias.upper()) != SALES_FACT):
+                    raise _NotEligible()
+                return f"SUM({column})"
+            if match.group("alias"):
+                table = aliases.get(match.group("alias").upper())
+                column = match.group("col").upper()
+                if table is None:
+                    raise _NotEligible()
+                dimension(table, column)
+                return column
+            word = match.group("word").upper()
+            in_fact, in_dim = word in fact_columns, word in dim_columns
+            if in_fact and in_dim:
+                raise _NotEligible()  # ambiguous without a qualifier
+            if in_fact or in_dim:
+                dimension(SALES_FACT if in_fact else PRODUCT_DIM, word)
+            return match.group(0)
+
+        items = _split_select_list(masked[select.end():source.start()])
+        tail = masked[source.end():]
+        if "*" in re.sub(r"COUNT\s*\(\s*\*\s*\)", "", masked[select.end():source.start()], flags=re.IGNORECASE):
+            raise _NotEligible()
+        # Rollups hold one row per group, so only already-aggregated output is answerable
+        aggregated = select.group(1) or re.search(r"\bGROUP\s+BY\b", tail, re.IGNORECASE)
+        if not aggregated and not all(_AGGREGATE_ITEM.match(item) for item in items):
+            raise _NotEligible()
+
+        new_items = []
+        for item in items:
+            new_item = _TOKEN.sub(substitute, item)
+            if new_item != item and not _PLAIN_COLUMN.match(item) and not _HAS_ALIAS.search(item.strip()):
+                # Keep the result column named as before (SQLite names it after the expression text)
+                name = unmask(item.strip()).replace('"', '""')
+                new_item = f'{new_item.rstrip()} AS "{name}"'
+            new_items.append(new_item.strip())
+        new_tail = _TOKEN.sub(substitute, tail)
+        prefix = masked[:select.end()]
+
+        def rewrite(table: str) -> str:
+            return unmask(f"{prefix}{', '.join(new_items)} FROM {table}{new_tail}")
+
+        return needed, rewrite
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {**self._stats, "rollups": dict(self._row_counts), "watermarks": {k: v[0] for k, v in self._watermarks.items()}}
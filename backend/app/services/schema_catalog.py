@@ -0,0 +1,160 @@
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, ContextManager, Dict, Iterable, List, Optional, Tuple
+
+@dataclass
+class ColumnInfo:
+    name: str
+    type: str
+    not_null: bool = False
+    primary_key: bool = False
+
+@dataclass
+class ForeignKeyInfo:
+    column: str
+    ref_table: str
+    ref_column: str
+
+@dataclass
+class TableInfo:
+    name: str
+    ddl: str
+    columns: List[ColumnInfo] = field(default_factory=list)
+    foreign_keys: List[ForeignKeyInfo] = field(default_factory=list)
+
+    @property
+    def column_names(self) -> List[str]:
+        return [col.name for col in self.columns]
+
+class SchemaCatalog:
+    """
+    In-memory copy of the warehouse schema.
+
+    The catalog is loaded once and then only re-checked against `PRAGMA schema_version`
+    (bumped by SQLite on every DDL change), at most every `check_interval` seconds.
+    When the version moves, only tables whose CREATE statement changed are re-read.
+    `connect` returns a context manager yielding a connection (e.g. a pool checkout).
+    Tables starting with one of `hidden_prefixes` (and SQLite's own) are left out.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], ContextManager[sqlite3.Connection]],
+        check_interval: float = 5.0,
+        hidden_prefixes: Tuple[str, ...] = (),
+    ):
+        self._connect = connect
+        self.check_interval = check_interval
+        self.hidden_prefixes = ("sqlite_",) + tuple(hidden_prefixes)
+        self._tables: Dict[str, TableInfo] = {}
+        self._version: Optional[int] = None
+        self._last_check = 0.0
+        self._rendered: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[int]:
+        return self._version
+
+    @property
+    def tables(self) -> Dict[str, TableInfo]:
+        self.refresh()
+        return self._tables
+
+    def table(self, name: str) -> Optional[TableInfo]:
+        return self.tables.get(name)
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-syncs with the database if the schema version changed.
+        Returns True when the catalog was modified.
+        """
+        now = time.monotonic()
+        if not force and self._version is not None and now - self._last_check < self.check_interval:
+            return False
+
+        with self._lock:
+            if not force and self._version is not None and now - self._last_check < self.check_interval:
+                return False
+            with self._connect() as conn:
+                version = conn.execute("PRAGMA schema_version").fetchone()[0]
+                self._last_check = now
+                if version == self._version and not force:
+                    return False
+                changed = self._sync_tables(conn)
+                self._version = version
+                if changed:
+                    self._rendered = None
+                return changed
+
+    def _sync_tables(self, conn: sqlite3.Connection) -> bool:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table';")
+        current = {name: ddl or "" for name, ddl in cursor.fetchall() if not name.startswith(self.hidden_prefixes)}
+
+        changed = False
+        for name in list(self._tables):
+            if name not in current:
+                del self._tables[name]
+                changed = True
+
+        for name, ddl in current.items():
+            existing = self._tables.get(name)
+            if existing is not None and existing.ddl == ddl:
+                continue
+            self._tables[name] = self._load_table(cursor, name, ddl)
+            changed = True
+        return changed
+
+    @staticmethod
+    def _load_table(cursor: sqlite3.Cursor, name: str, ddl: str) -> TableInfo:
+        cursor.execute(f"PRAGMA table_info({name})")
+        columns = [
+            ColumnInfo(name=col[1], type=col[2], not_null=bool(col[3]), primary_key=bool(col[5]))
+            for col in cursor.fetchall()
+        ]
+        cursor.execute(f"PRAGMA foreign_key_list({name})")
+        foreign_keys = [
+            ForeignKeyInfo(column=fk[3], ref_table=fk[2], ref_column=fk[4])
+            for fk in cursor.fetchall()
+        ]
+        return TableInfo(name=name, ddl=ddl, columns=columns, foreign_keys=foreign_keys)
+
+    def render(self, tables: Optional[Iterable[str]] = None, include_foreign_keys: bool = False) -> str:
+        """
+        Renders the schema as prompt text. Without arguments the full rendering is cached
+        until the schema changes.
+        """
+        catalog = self.tables
+        if tables is None and not include_foreign_keys:
+            if self._rendered is None:
+                self._rendered = self._render(catalog.values(), False)
+            return self._rendered
+        names = list(catalog) if tables is None else [t for t in tables if t in catalog]
+        return self._render((catalog[name] for name in names), include_foreign_keys)
+
+    @staticmethod
+    def _render(tables: Iterable[TableInfo], include_foreign_keys: bool) -> str:
+        schema_text = ""
+        for table in tables:
+            col_strings = [f"{col.name} ({col.type})" for col in table.columns]
+            schema_text += f"Table: {table.name}\nColumns: {', '.join(col_strings)}\n"
+            if include_foreign_keys and table.foreign_keys:
+                fk_strings = [f"{fk.column} -> {fk.ref_table}.{fk.ref_column}" for fk in table.foreign_keys]
+                schema_text += f"Foreign keys: {', '.join(fk_strings)}\n"
+            schema_text += "\n"
+        return schema_text
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """
+        Structured metadata (tables, columns, types, foreign keys) for API consumers.
+        """
+        return {
+            name: {
+                "columns": [{"name": c.name, "type": c.type, "not_null": c.not_null, "primary_key": c.primary_key} for c in table.columns],
+                "foreign_keys": [{"column": fk.column, "ref_table": fk.ref_table, "ref_column": fk.ref_column} for fk in table.foreign_keys],
+            }
+            for name, table in self.tables.items()
+        }
@@ -0,0 +1,206 @@
+import math
+import re
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+from app.services.schema_catalog import SchemaCatalog
+
+# Question words that map onto schema name tokens
+SYNONYMS = {
+    "brands": ["brand"],
+    "product": ["product"],
+    "products": ["product"],
+    "revenue": ["sales", "value"],
+    "units": ["qty", "units", "sales"],
+    "volume": ["qty", "units", "sales"],
+    "monthly": ["mth", "month"],
+    "month": ["mth", "month"],
+    "months": ["mth", "month"],
+    "weekly": ["wk", "week"],
+    "week": ["wk", "week"],
+    "weeks": ["wk", "week"],
+    "quarterly": ["qtr", "quarter"],
+    "quarter": ["qtr", "quarter"],
+    "quarters": ["qtr", "quarter"],
+    "year": ["calendar", "year"],
+    "yearly": ["calendar", "year"],
+    "countries": ["country"],
+    "panels": ["panel"],
+    "channels": ["channel"],
+    "markets": ["market"],
+    "currency": ["currency", "exchange"],
+    "fx": ["currency", "exchange"],
+    "regional": ["subnat", "sub", "geo"],
+    "region": ["subnat", "sub", "geo"],
+    "company": ["corporation", "manufacturer"],
+    "companies": ["corporation", "manufacturer"],
+    "molecule": ["molecule"],
+    "molecules": ["molecule"],
+    "category": ["category"],
+    "categories": ["category"],
+}
+
+# Small prior so ties between fact grains resolve to the table most questions are written against
+TABLE_PRIORS = {"FCT_SALES_NATIONAL_MTH": 0.5, "DIM_SOURCE_PRODUCT": 0.25}
+
+TABLE_NAME_WEIGHT = 3.0
+COLUMN_NAME_WEIGHT = 1.0
+# Tables matched only through column names and scoring below this fraction of the
+# best table are considered noise
+MIN_RELATIVE_SCORE = 0.3
+
+# Fact tables that exist at several time grains; only the grain the question asks for
+# (or the default one) is offered to the LLM
+GRAIN_TOKENS = {"wk", "mth", "qtr"}
+DEFAULT_GRAIN = "mth"
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token) used for prompt budgeting.
+    """
+    return math.ceil(len(text) / 4)
+
+def _name_tokens(name: str) -> List[str]:
+    return [t for t in name.lower().split("_") if t]
+
+def _question_tokens(question: str) -> List[str]:
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", question.lower()):
+        tokens.append(word)
+        tokens.extend(SYNONYMS.get(word, []))
+    return tokens
+
+class SchemaRetriever:
+    """
+    Offline lexical retriever that selects the tables relevant to a question.
+
+    Tables are scored by IDF-weighted overlap between question words (plus synonyms)
+    and table/column name tokens. The top tables are connected through the shortest
+    foreign-key paths and the rendered context is kept under a token budget.
+    """
+
+    def __init__(self, catalog: SchemaCatalog, token_budget: int = 1500, max_tables: int = 4, max_join_hops: int = 3):
+        self.catalog = catalog
+        self.token_budget = token_budget
+        self.max_tables = max_tables
+        self.max_join_hops = max_join_hops
+        self._indexed_version: Optional[int] = None
+        self._table_tokens: Dict[str, Set[str]] = {}
+        self._column_tokens: Dict[str, Set[str]] = {}
+        self._idf: Dict[str, float] = {}
+        self._graph: Dict[str, Set[str]] = {}
+
+    def _ensure_index(self):
+        tables = self.catalog.tables
+        if self._indexed_version == self.catalog.version and self._table_tokens:
+            return
+        self._table_tokens = {name: set(_name_tokens(name)) for name in tables}
+        self._column_tokens = {
+            name: {tok for col in table.columns for tok in _name_tokens(col.name)}
+            for name, table in tables.items()
+        }
+        doc_freq: Dict[str, int] = {}
+        for name in tables:
+            for tok in self._table_tokens[name] | self._column_tokens[name]:
+                doc_freq[tok] = doc_freq.get(tok, 0) + 1
+        n = max(len(tables), 1)
+        self._idf = {tok: math.log(1 + n / df) for tok, df in doc_freq.items()}
+
+        self._graph = {name: set() for name in tables}
+        for name, table in tables.items():
+            for fk in table.foreign_keys:
+                if fk.ref_table in self._graph:
+                    self._graph[name].add(fk.ref_table)
+                    self._graph[fk.ref_table].add(name)
+        self._indexed_version = self.catalog.version
+
+    def score_tables(self, question: str) -> List[Tuple[str, float]]:
+        """
+        Returns (table, score) pairs with a positive score, best first.
+        """
+        self._ensure_index()
+        tokens = set(_question_tokens(question))
+        asked_grains = tokens & GRAIN_TOKENS or {DEFAULT_GRAIN}
+        scores = []
+        for name in self._table_tokens:
+            grains = self._table_tokens[name] & GRAIN_TOKENS
+            if grains and not grains & asked_grains:
+                continue
+            score = 0.0
+            name_match = False
+            for tok in tokens:
+                idf = self._idf.get(tok, 0.0)
+                if tok in self._table_tokens[name]:
+                    score += TABLE_NAME_WEIGHT * idf
+                    name_match = True
+                elif tok in self._column_tokens[name]:
+                    score += COLUMN_NAME_WEIGHT * idf
+            if score > 0:
+                scores.append((name, score + TABLE_PRIORS.get(name, 0.0), name_match))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        if not scores:
+            return []
+        cutoff = scores[0][1] * MIN_RELATIVE_SCORE
+        return [(name, score) for name, score, name_match in scores if name_match or score >= cutoff]
+
+    def _join_path(self, source: str, target: str) -> List[str]:
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            if node == target:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = previous[node]
+                return path[::-1]
+            for neighbour in sorted(self._graph.get(node, ())):
+                if neighbour not in previous:
+                    previous[neighbour] = node
+                    queue.append(neighbour)
+        return []
+
+    def select_tables(self, question: str) -> List[str]:
+        """
+        Picks the relevant tables plus any tables needed to join them, in relevance order.
+        """
+        ranked = [name for name, _ in self.score_tables(question)][: self.max_tables]
+        if not ranked:
+            return []
+        selected = [ranked[0]]
+        pending = ranked[1:]
+        # Tables only reachable through a later pick are retried until nothing changes
+        while pending:
+            deferred = []
+            for name in pending:
+                if name in selected:
+                    continue
+                paths = [self._join_path(table, name) for table in selected]
+                paths = [p for p in paths if p and len(p) - 1 <= self.max_join_hops]
+                if not paths:
+                    deferred.append(name)
+                    continue
+                for table in min(paths, key=len):
+                    if table not in selected:
+                        selected.append(table)
+            if len(deferred) == len(pending):
+                break
+            pending = deferred
+        return selected
+
+    def schema_context(self, question: str, token_budget: Optional[int] = None) -> str:
+        """
+        Renders the pruned schema for a question, staying within the token budget.
+        Falls back to the full schema when nothing in the question matches.
+        """
+        budget = token_budget or self.token_budget
+        selected = self.select_tables(question)
+        if not selected:
+            return self.catalog.render()
+
+        kept: List[str] = []
+        for table in selected:
+            candidate = self.catalog.render(kept + [table], include_foreign_keys=True)
+            if kept and estimate_tokens(candidate) > budget:
+                break
+            kept.append(table)
+        return self.catalog.render(kept, include_foreign_keys=True)
@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution.
+
+    The first caller (leader) starts the work as its own task; callers arriving while it
+    is in flight await the same task and receive its result or exception. The work is
+    shielded from any single caller's cancellation and is only cancelled once every
+    waiter has gone away.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._inflight: Dict[Hashable, Tuple[asyncio.Task, list]] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Runs fn() unless an identical call is in flight. Returns (result, shared), where
+        shared is True for callers that piggybacked on another caller's execution.
+        """
+        self._stats["calls"] += 1
+        entry = self._inflight.get(key)
+        shared = entry is not None
+        if shared:
+            self._stats["coalesced"] += 1
+            task, waiters = entry
+        else:
+            self._stats["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            waiters = []
+            self._inflight[key] = (task, waiters)
+            task.add_done_callback(lambda _t: self._forget(key, task))
+
+        waiters.append(1)
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            waiters.pop()
+            if not waiters and not task.done():
+                task.cancel()
+            raise
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        entry = self._inflight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._inflight[key]
+        # Retrieve the exception so an unobserved failure doesn't log "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._inflight)}
@@ -1,55 +1,304 @@
+import asyncio
 import sqlite3
-import pandas as pd
 import os
-from typing import List, Dict, Any
+import time
+from contextlib import ExitStack
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.services.cancellation import CancelToken, DeadlineExceeded, QueryGuard, interrupted_error, run_in_thread
+from app.services.columnar import ColumnarEngine, Unsupported
+from app.services.connection_pool import SQLiteConnectionPool
+from app.services.entity_index import EntityIndex
+from app.services.metrics import metrics, sql_rows_total
+from app.services.partitions import PartitionManager
+from app.services.query_cost import CostReview, QueryCostGuard
+from app.services.query_engines import QueryEngine, SQLiteEngine
+from app.services.query_result import QueryResult
+from app.services.result_store import ResultCursor
+from app.services.rollups import ROLLUP_PREFIX, RollupManager
+from app.services.schema_catalog import SchemaCatalog
+from app.services.schema_retriever import SchemaRetriever
+from app.services.tracing import span
+from app.services.workload import WorkloadRecorder
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "database", "mock_snowflake.db")
+DB_PATH = settings.WAREHOUSE_DB_PATH or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "database", "mock_snowflake.db")
 
 class SnowflakeService:
     def __init__(self, db_path: str = DB_PATH):
         self.db_path = db_path
+        self._change_listeners: List[Callable[[List[str]], Any]] = []
+        self.pool = SQLiteConnectionPool(
+            db_path,
+            max_size=settings.SQLITE_POOL_SIZE,
+            timeout=settings.SQLITE_POOL_TIMEOUT_S,
+            mmap_size=settings.SQLITE_MMAP_SIZE,
+            cache_size_kb=settings.SQLITE_CACHE_SIZE_KB,
+        )
+        # Rollup tables are an execution detail; the LLM writes SQL against the base tables
+        self.schema_catalog = SchemaCatalog(
+            self.pool.connection,
+            check_interval=settings.SCHEMA_CHECK_INTERVAL_S,
+            hidden_prefixes=(ROLLUP_PREFIX,),
+        )
+        self.schema_retriever = SchemaRetriever(self.schema_catalog, token_budget=settings.SCHEMA_CONTEXT_TOKEN_BUDGET)
+        self.cost_guard = QueryCostGuard(
+            self.data_fingerprint,
+            max_cost=settings.QUERY_COST_MAX_ROWS,
+            auto_limit=settings.QUERY_COST_AUTO_LIMIT,
+            connect=self.get_connection,
+        )
+        self.workload = WorkloadRecorder(max_records=settings.WORKLOAD_MAX_RECORDS, log_path=settings.WORKLOAD_LOG_PATH)
+        self.rollups = RollupManager(
+            self.get_connection,
+            columns=lambda table: self.schema_catalog.table(table).column_names,
+            fingerprint=self.data_fingerprint,
+            on_change=self.tables_changed,
+        )
+        self.partitions = PartitionManager(
+            db_path,
+            directory=settings.PARTITION_DIR or os.path.join(os.path.dirname(db_path), "partitions"),
+            tables=settings.PARTITIONED_TABLES,
+            fingerprint=self.data_fingerprint,
+            columns=lambda table: self.schema_catalog.table(table).column_names if self.schema_catalog.table(table) else [],
+            workers=settings.PARTITION_BUILD_WORKERS,
+            max_attached=settings.PARTITION_MAX_ATTACHED,
+            on_change=self.tables_changed,
+        )
+        self.entity_index = EntityIndex(
+            self.pool.connection,
+            fingerprint=self.data_fingerprint,
+            columns=lambda table: self.schema_catalog.table(table).column_names if self.schema_catalog.table(table) else [],
+            min_score=settings.ENTITY_MIN_SCORE,
+            check_interval=settings.ENTITY_CHECK_INTERVAL_S,
+        )
+        self.sqlite_engine = SQLiteEngine(self._check_cost, rewrite=self._prune_partitions)
+        self.columnar_engine = ColumnarEngine(
+            self.data_fingerprint,
+            row_counts=self.cost_guard.row_counts,
+            min_rows=0 if settings.QUERY_ENGINE == "columnar" else settings.COLUMNAR_MIN_ROWS,
+        )
+
+    def warm_up(self) -> None:
+        """
+        Loads the schema catalog, the schema retriever's index, table row counts and the
+        entity index ahead of the first request (called from application startup).
+        """
+        self.schema_catalog.refresh(force=True)
+        self.schema_retriever.score_tables("")
+        self.cost_guard.refresh()
+        if settings.ENTITY_INDEX_ENABLED:
+            self.entity_index.refresh()
 
     def get_connection(self):
+        """
+        Opens a dedicated read-write connection (for maintenance/DDL).
+        Queries go through the read-only pool instead.
+        """
         return sqlite3.connect(self.db_path)
 
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    def data_fingerprint(self):
+        """
+        Cheap change detector for the database contents: size and mtime of the database
+        file and its WAL. Any committed write moves at least one of them.
+        """
+        stamp = []
+        for path in (self.db_path, self.db_path + "-wal"):
+            try:
+                st = os.stat(path)
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def on_tables_changed(self, listener: Callable[[List[str]], Any]):
+        """
+        Registers `listener` to be called with the (uppercased) names of tables that
+        in-process writers (rollups, partitions, the index advisor) have changed.
+        """
+        self._change_listeners.append(listener)
+
+    def tables_changed(self, tables: Iterable[str]):
+        tables = [t.upper() for t in tables]
+        for listener in self._change_listeners:
+            listener(tables)
+
+    def execute_query(self, query: str, token: Optional[CancelToken] = None) -> QueryResult:
         """
-        Executes a SQL query and returns the results as a list of dictionaries.
+        Executes a SQL query and returns the results as a QueryResult
+        (column names plus row tuples, readable as a list of dictionaries).
+        The query is interrupted once `token` expires.
         """
-        conn = self.get_connection()
         try:
-            # For security in real app we use parameterized queries, but here we expect generated SQL
-            # We should at least be careful about restricted commands (DROP, DELETE etc)
-            if "DROP" in query.upper() or "DELETE" in query.upper():
-                 raise ValueError("Destructive queries are not allowed.")
-            
-            df = pd.read_sql_query(query, conn)
-            return df.to_dict(orient="records")
+            self._check_query(query)
+            with span("sql", "execute_query") as timing, self.pool.connection() as conn:
+                query = self._route(conn, query)
+                started = time.perf_counter()
+                engine, cursor = self._open(conn, query, QueryGuard(token))
+                columns = [desc[0] for desc in cursor.description or ()]
+                rows = cursor.fetchall()
+                if engine is self.sqlite_engine:
+                    self._record(query, time.perf_counter() - started, len(rows))
+                timing.attrs.update(engine=engine.name, rows=len(rows))
+                sql_rows_total.inc(len(rows), engine=engine.name)
+            return QueryResult(columns, rows)
         except Exception as e:
             print(f"Error executing query: {e}")
-            raise e
-        finally:
-            conn.close()
+            raise interrupted_error(e, token)
+
+    @staticmethod
+    def _check_query(query: str):
+        # For security in real app we use parameterized queries, but here we expect generated SQL
+        # We should at least be careful about restricted commands (DROP, DELETE etc)
+        if "DROP" in query.upper() or "DELETE" in query.upper():
+             raise ValueError("Destructive queries are not allowed.")
+
+    def _route(self, conn: sqlite3.Connection, query: str) -> str:
+        # Aggregate queries a fresh rollup can answer read the smallest such rollup instead
+        if settings.ROLLUP_ROUTING_ENABLED:
+            routed = self.rollups.route(conn, query)
+            if routed is not None:
+                print(f"Routed query to rollup {routed[1]}")
+                return routed[0]
+        return query
 
-    def get_schema_info(self) -> str:
+    def _open(self, conn: sqlite3.Connection, query: str, guard: QueryGuard) -> Tuple[QueryEngine, Any]:
+        """
+        Starts the query on the engine chosen for its shape and returns (engine, cursor).
+        SQLite is the default and runs whatever the columnar engine declines, including
+        queries it only finds it cannot run once it starts.
+        """
+        if settings.QUERY_ENGINE != "sqlite":
+            plan = self.columnar_engine.plan(conn, query)
+            if plan is not None:
+                try:
+                    cursor = self.columnar_engine.open(conn, plan, guard)
+                    print("Ran query on the columnar engine")
+                    return self.columnar_engine, cursor
+                except Unsupported as e:
+                    print(f"Columnar engine declined query: {e}")
+                except Exception as e:
+                    # Deadlines and cancellation stop the query; engine failures fall back to SQLite
+                    if isinstance(e, DeadlineExceeded) or (guard.token is not None and guard.token.expired()):
+                        raise
+                    print(f"Columnar engine failed, running query on SQLite: {e!r}")
+        return self.sqlite_engine, self.sqlite_engine.open(conn, self.sqlite_engine.plan(conn, query), guard)
+
+    def _prune_partitions(self, conn: sqlite3.Connection, query: str) -> str:
+        # Partitioned fact tables are read from just the partitions the calendar predicates select
+        if settings.PARTITIONING_ENABLED:
+            return self.partitions.rewrite(conn, query)
+        return query
+
+    def _record(self, query: str, elapsed_s: float, rows: int):
+        # Statements SQLite executed (after routing) feed the index advisor
+        if settings.WORKLOAD_RECORDING_ENABLED:
+            self.workload.record(query, elapsed_s, rows)
+
+    def _check_cost(self, conn: sqlite3.Connection, query: str):
+        # Refuses plans the cost guard considers runaway (raises QueryTooExpensive)
+        if settings.QUERY_COST_GUARD_ENABLED:
+            self.cost_guard.check(conn, query)
+
+    def review_query(self, query: str) -> CostReview:
+        """
+        Cost review for generated SQL before it is handed to the executor: the statement
+        to run (LIMIT injected where that bounds the work) or a diagnosis of why it is too
+        expensive.
+        """
+        self._check_query(query)
+        with span("sql", "review_query"), self.pool.connection() as conn:
+            if settings.QUERY_ENGINE != "sqlite" and self.columnar_engine.plan(conn, query) is not None:
+                # Columnar scans are linear in the table size; the nested-loop budget doesn't apply
+                return CostReview(query, self.cost_guard.estimate(conn, query))
+            return self.cost_guard.review(conn, query)
+
+    def open_cursor(self, query: str, token: Optional[CancelToken] = None) -> ResultCursor:
+        """
+        Starts a query and returns a server-side cursor for paging through its rows.
+        The cursor keeps a pooled connection checked out until it is exhausted or closed.
+        """
+        self._check_query(query)
+        resources = ExitStack()
+        try:
+            with span("sql", "open_cursor") as timing:
+                conn = resources.enter_context(self.pool.connection())
+                query = self._route(conn, query)
+                guard = QueryGuard(token)
+                started = time.perf_counter()
+                engine, cursor = self._open(conn, query, guard)
+                timing.attrs["engine"] = engine.name
+            return ResultCursor(
+                cursor,
+                resources,
+                guard,
+                elapsed_s=time.perf_counter() - started,
+                on_close=(lambda c: self._record(query, c.elapsed_s, c.rows_sent)) if engine is self.sqlite_engine else None,
+                engine=engine.name,
+            )
+        except Exception as e:
+            resources.close()
+            print(f"Error executing query: {e}")
+            raise interrupted_error(e, token)
+
+    async def aopen_cursor(self, query: str, token: Optional[CancelToken] = None) -> ResultCursor:
+        """
+        Async variant of open_cursor, offloaded to a worker thread.
+        """
+        token = token or CancelToken()
+        opening = asyncio.ensure_future(asyncio.to_thread(self.open_cursor, query, token))
+        try:
+            return await asyncio.shield(opening)
+        except asyncio.CancelledError:
+            token.cancel()
+            # The thread may still hand back a cursor nobody will read; close it when it does
+            opening.add_done_callback(lambda f: f.cancelled() or f.exception() or f.result().close())
+            raise
+
+    async def aexecute_query(self, query: str, token: Optional[CancelToken] = None) -> QueryResult:
+        """
+        Async variant of execute_query. The blocking sqlite work runs in a worker
+        thread so the event loop keeps serving other WebSockets meanwhile; cancelling
+        the awaiting task interrupts the query.
+        """
+        token = token or CancelToken()
+        return await run_in_thread(token, self.execute_query, query, token)
+
+    def get_schema_info(self, question: Optional[str] = None) -> str:
         """
         Returns schema information for the LLM to understand table structures.
+        Served from the in-memory schema catalog; the database is only consulted
+        when the schema version changes. When a question is given (and pruning is
+        enabled) only the tables relevant to it, with their join keys, are included.
+        """
+        with span("lookup", "schema"):
+            if question and settings.SCHEMA_PRUNING_ENABLED:
+                return self.schema_retriever.schema_context(question)
+            return self.schema_catalog.render()
+
+    async def aget_schema_info(self, question: Optional[str] = None) -> str:
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-        
-        schema_text = ""
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            col_strings = [f"{col[1]} ({col[2]})" for col in columns]
-            schema_text += f"Table: {table_name}\nColumns: {', '.join(col_strings)}\n\n"
-            
-        conn.close()
-        return schema_text
+        Async variant of get_schema_info, offloaded to a worker thread.
+        """
+        return await asyncio.to_thread(self.get_schema_info, question)
+
+    def resolve_entities(self, question: str):
+        """
+        Dimension values mentioned in a question (EntityMatch list), from the entity index.
+        """
+        with span("lookup", "entities") as timing:
+            matches = self.entity_index.resolve(question)
+            timing.attrs["entities"] = len(matches)
+            return matches
 
 snowflake_service = SnowflakeService()
+
+# Connection pool usage on /metrics, read from the pool's own counters
+for _name, _type, _key, _help in (
+    ("datapella_sqlite_pool_checkouts_total", "counter", "checkouts", "Connections checked out of the SQLite pool"),
+    ("datapella_sqlite_pool_waits_total", "counter", "waits", "Checkouts that had to wait for a free connection"),
+    ("datapella_sqlite_pool_wait_seconds_total", "counter", "wait_time_s", "Time spent waiting for a free connection"),
+    ("datapella_sqlite_pool_timeouts_total", "counter", "timeouts", "Checkouts that gave up after SQLITE_POOL_TIMEOUT_S"),
+    ("datapella_sqlite_pool_in_use", "gauge", "in_use", "Connections currently checked out"),
+    ("datapella_sqlite_pool_connections", "gauge", "size", "Connections open, in use or idle"),
+):
+    metrics.sampled(_name, _help, _type, lambda key=_key: {(): snowflake_service.pool.stats()[key]})
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+from app.core.config import settings
+from app.services.cancellation import DeadlineExceeded
+from app.services.metrics import span_seconds
+from app.services.profiler import Profiler
+
+@dataclass
+class Span:
+    kind: str  # "request", "node", "llm", "sql", "lookup", "serialize", "startup"
+    name: str
+    started: float  # time.perf_counter()
+    offset_s: float = 0.0  # start relative to the trace start
+    duration_s: Optional[float] = None
+    status: str = "ok"
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    def finish(self, status: str = "ok"):
+        """
+        Ends the span (once) and feeds its duration to the span histogram.
+        """
+        if self.duration_s is not None:
+            return
+        self.duration_s = time.perf_counter() - self.started
+        self.status = status
+        if settings.TELEMETRY_ENABLED:
+            span_seconds.observe(self.duration_s, kind=self.kind, name=self.name, status=status)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "name": self.name,
+            "offset_ms": round(self.offset_s * 1000, 3),
+            "duration_ms": None if self.duration_s is None else round(self.duration_s * 1000, 3),
+            "status": self.status,
+            **self.attrs,
+        }
+
+class Trace:
+    """
+    The spans recorded while answering one request. Nodes, worker threads and LLM
+    callbacks all see the trace through a context variable, so spans opened anywhere
+    below the request land here.
+    """
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.spans: List[Span] = []
+        self.profiler: Optional[Profiler] = None  # set while the request is being profiled
+        self.profile_files: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        span.offset_s = span.started - self.started
+        with self._lock:
+            if len(self.spans) < settings.TRACE_MAX_SPANS:
+                self.spans.append(span)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Spans in start order plus total time per span kind.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.started)
+        by_kind: Dict[str, float] = {}
+        for span in spans:
+            if span.duration_s is not None and span.kind != "request":
+                by_kind[span.kind] = by_kind.get(span.kind, 0.0) + span.duration_s
+        return {
+            "trace_id": self.trace_id,
+            "started_at": self.started_at,
+            "by_kind_ms": {kind: round(total * 1000, 3) for kind, total in by_kind.items()},
+            "profile_files": self.profile_files,
+            "spans": [span.as_dict() for span in spans],
+        }
+
+class TraceStore:
+    """
+    The most recent traces, by id, for GET /api/traces/{trace_id}.
+    """
+
+    def __init__(self, max_traces: int = 200):
+        self.max_traces = max_traces
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace):
+        with self._lock:
+            self._traces[trace.trace_id] = trace
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return self._traces.get(trace_id)
+
+trace_store = TraceStore(max_traces=settings.TRACE_MAX_RECENT)
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+def start_trace(trace_id: Optional[str] = None) -> Trace:
+    """
+    Starts a trace for the current task (and everything it spawns from here on).
+    """
+    trace = Trace(trace_id)
+    _current_trace.set(trace)
+    if settings.TELEMETRY_ENABLED:
+        trace_store.add(trace)
+    return trace
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def start_span(kind: str, name: str, **attrs: Any) -> Span:
+    """
+    Opens a span on the current trace (if any); the caller must finish() it.
+    """
+    span = Span(kind, name, time.perf_counter(), attrs=attrs)
+    trace = _current_trace.get()
+    if trace is not None and settings.TELEMETRY_ENABLED:
+        trace.add(span)
+    return span
+
+def failure_status(e: BaseException) -> str:
+    if isinstance(e, asyncio.CancelledError):
+        return "cancelled"
+    if isinstance(e, (DeadlineExceeded, asyncio.TimeoutError)):
+        return "timeout"
+    return "error"
+
+def _profile_enter(trace: Optional[Trace]) -> Optional[Profiler]:
+    """
+    Makes the calling task (on the event loop) or thread (off it) visible to the request's
+    profiler. Returns the profiler if a worker thread was registered and must leave it.
+    """
+    profiler = trace.profiler if trace is not None else None
+    if profiler is None:
+        return None
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        profiler.add_task(task)
+        return None
+    profiler.enter_thread()
+    return profiler
+
+@contextmanager
+def span(kind: str, name: str, **attrs: Any) -> Iterator[Span]:
+    """
+    Times the block as a span; attributes can be added to the yielded span inside it.
+    """
+    current = start_span(kind, name, **attrs)
+    profiler = _profile_enter(_current_trace.get())
+    try:
+        yield current
+    except BaseException as e:
+        current.finish(failure_status(e))
+        raise
+    finally:
+        if profiler is not None:
+            profiler.leave_thread()
+    current.finish()
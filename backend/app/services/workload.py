@@ -0,0 +1,51 @@
+import json
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import List, Optional
+
+@dataclass
+class QueryRecord:
+    sql: str
+    elapsed_s: float
+    rows: int
+    recorded_at: float
+
+class WorkloadRecorder:
+    """
+    Bounded log of executed SQL with timings, the input to the index advisor.
+
+    Keeps the last `max_records` executions. With `log_path` every record is also
+    appended to a JSON-lines file, so a workload can be analyzed offline or across restarts.
+    """
+
+    def __init__(self, max_records: int = 2000, log_path: Optional[str] = None):
+        self.log_path = log_path
+        self._records: "deque[QueryRecord]" = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, elapsed_s: float, rows: int):
+        record = QueryRecord(sql, elapsed_s, rows, time.time())
+        with self._lock:
+            self._records.append(record)
+            if self.log_path:
+                with open(self.log_path, "a") as f:
+                    f.write(json.dumps(asdict(record)) + "\n")
+
+    def records(self) -> List[QueryRecord]:
+        with self._lock:
+            return list(self._records)
+
+    @staticmethod
+    def load(path: str) -> List[QueryRecord]:
+        with open(path) as f:
+            return [QueryRecord(**json.loads(line)) for line in f if line.strip()]
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"records": len(self._records), "max_records": self._records.maxlen, "log_path": self.log_path}
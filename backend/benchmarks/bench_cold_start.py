@@ -0,0 +1,113 @@
+"""
+Cold start benchmark: how soon a freshly started server can answer.
+
+For each run a new process is measured from scratch:
+  - import:  time to `import app.main`, and which provider SDKs that pulled in
+  - ready:   spawn -> uvicorn accepting requests (GET /health answers); includes startup_event
+  - first:   spawn -> first question's "Final Response" over /api/ws/chat
+  - answer:  ready -> that first response (what the first user waits for)
+  - second:  a second question on the same connection, for the warm comparison
+Runs with WARM_UP_ON_STARTUP on and off, so the work moved into startup shows up as a
+longer "ready" and a shorter "answer". Uses the offline mock LLM.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cold_start --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROVIDER_MODULES = ("langchain_aws", "boto3", "langchain_anthropic", "langchain_community.chat_models")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({{
+    "import_s": time.perf_counter() - started,
+    "providers": [m for m in {PROVIDER_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+def environment(warm_up: bool):
+    # Mock credentials: offline, and no provider SDK to import
+    return dict(os.environ, WARM_UP_ON_STARTUP=str(warm_up).lower(), PYTHONPATH=BACKEND, ANTHROPIC_API_KEY="mock-ant-key")
+
+def measure_import(warm_up: bool):
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND, env=environment(warm_up),
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def ask(ws, question: str) -> float:
+    started = time.perf_counter()
+    await ws.send(question)
+    while True:
+        message = await ws.recv()
+        if message.startswith("Final Response"):
+            return time.perf_counter() - started
+        if message.startswith("Error"):
+            raise RuntimeError(message)
+
+async def measure_server(warm_up: bool, question: str, timeout: float = 120.0):
+    import websockets
+
+    port = free_port()
+    spawned = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=environment(warm_up), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if server.poll() is not None or time.perf_counter() - spawned > timeout:
+                raise RuntimeError("Server did not start")
+            # A request that gets through waits for startup to finish, so don't time it out early
+            try:
+                await asyncio.to_thread(lambda: urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=timeout).read())
+                break
+            except OSError:
+                await asyncio.sleep(0.01)
+        ready = time.perf_counter()
+        async with websockets.connect(f"ws://127.0.0.1:{port}/api/ws/chat") as ws:
+            answer = await ask(ws, question)
+            first = time.perf_counter() - spawned
+            second = await ask(ws, question + " again")
+    finally:
+        server.terminate()
+        server.wait()
+    return {"ready_s": ready - spawned, "first_s": first, "answer_s": answer, "second_s": second}
+
+def median(runs, key):
+    return statistics.median(run[key] for run in runs) * 1000
+
+def main(args):
+    for warm_up in (True, False):
+        imports = [measure_import(warm_up) for _ in range(args.runs)]
+        servers = [asyncio.run(measure_server(warm_up, args.question)) for _ in range(args.runs)]
+        print(f"WARM_UP_ON_STARTUP={warm_up} (median of {args.runs})")
+        print(f"  import app.main   {median(imports, 'import_s'):8.1f} ms  provider SDKs loaded: {imports[0]['providers'] or 'none'}")
+        print(f"  spawn -> ready    {median(servers, 'ready_s'):8.1f} ms")
+        print(f"  spawn -> first    {median(servers, 'first_s'):8.1f} ms")
+        print(f"  ready -> answer   {median(servers, 'answer_s'):8.1f} ms")
+        print(f"  second question   {median(servers, 'second_s'):8.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import time and time-to-first-response of a fresh server")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--question", default="how many brands")
+    main(parser.parse_args())
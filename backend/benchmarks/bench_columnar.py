@@ -0,0 +1,121 @@
+"""
+SQLite versus the in-process columnar engine on the aggregate queries the SQL writer
+typically produces (brand/category/country/period totals over the sales facts).
+
+Runs against a database built by database/generate_mock_data.py: pass --db, or let the
+benchmark generate one at --scale in a temp directory. Columnar times are reported cold
+(first run, including loading the columns it touches) and warm.
+
+Usage (from backend/):
+    python -m benchmarks.bench_columnar --scale 0.5
+    python -m benchmarks.bench_columnar --db database/mock_snowflake_large.db --repeat 5
+"""
+import argparse
+import math
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "database"))
+
+from app.services.columnar import ColumnarEngine
+from app.services.query_cost import QueryCostGuard
+
+WORKLOAD = {
+    "brand_totals": (
+        "SELECT p.PRODUCT_BRAND, SUM(f.VALUE_LC) AS sales FROM FCT_SALES_NATIONAL_WK f "
+        "JOIN DIM_SOURCE_PRODUCT p ON f.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID "
+        "GROUP BY p.PRODUCT_BRAND ORDER BY sales DESC LIMIT 10"
+    ),
+    "country_year": (
+        "SELECT f.COUNTRY_ID, c.YEAR, SUM(f.QTY_UNITS), SUM(f.VALUE_LC) FROM FCT_SALES_NATIONAL_WK f "
+        "JOIN DIM_CALENDAR c ON f.CALENDAR_ID = c.CALENDAR_ID GROUP BY f.COUNTRY_ID, c.YEAR"
+    ),
+    "category_filtered": (
+        "SELECT p.CATEGORY_NM, COUNT(*), AVG(f.VALUE_LC) FROM FCT_SALES_NATIONAL_WK f "
+        "JOIN DIM_SOURCE_PRODUCT p ON f.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID "
+        "WHERE p.RX_STATUS = 'OTC' AND f.CALENDAR_ID >= '2022W01' GROUP BY p.CATEGORY_NM"
+    ),
+    "monthly_panel": (
+        "SELECT PANEL_ID, CALENDAR_ID, SUM(VALUE_MNF_LC) FROM FCT_SALES_NATIONAL_MTH "
+        "GROUP BY PANEL_ID, CALENDAR_ID ORDER BY PANEL_ID, CALENDAR_ID"
+    ),
+    "brand_country_quarter": (
+        "SELECT p.PRODUCT_BRAND, co.COUNTRY, f.CALENDAR_ID, SUM(f.VALUE_MNF_EU) FROM FCT_SALES_NATIONAL_QTR f "
+        "JOIN DIM_SOURCE_PRODUCT p ON f.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID "
+        "JOIN DIM_COUNTRY co ON f.COUNTRY_ID = co.COUNTRY_ID "
+        "WHERE p.PRODUCT_BRAND IN ('Advil', 'Tylenol', 'Allegra') GROUP BY p.PRODUCT_BRAND, co.COUNTRY, f.CALENDAR_ID"
+    ),
+    "distinct_products": (
+        "SELECT COUNTRY_ID, COUNT(DISTINCT SOURCE_PRODUCT_ID), MAX(QTY_UNITS) FROM FCT_SALES_NATIONAL_WK GROUP BY COUNTRY_ID"
+    ),
+}
+
+def same_rows(a, b) -> bool:
+    if len(a) != len(b):
+        return False
+    for row_a, row_b in zip(a, b):
+        for x, y in zip(row_a, row_b):
+            if isinstance(x, float) and isinstance(y, float):
+                if not math.isclose(x, y, rel_tol=1e-9, abs_tol=1e-6):
+                    return False
+            elif x != y:
+                return False
+    return True
+
+def timed(fn, repeat: int):
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+def run(db_path: str, repeat: int):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA cache_size = -262144")
+    engine = ColumnarEngine(lambda: db_path, QueryCostGuard(lambda: db_path).row_counts, min_rows=0)
+    print(f"{'query':>22} {'sqlite_s':>9} {'col_cold_s':>10} {'col_warm_s':>10} {'speedup':>8} {'rows':>6} {'match':>6}")
+    totals = [0.0, 0.0]
+    for name, sql in WORKLOAD.items():
+        sqlite_s, expected = timed(lambda: conn.execute(sql).fetchall(), repeat)
+        plan = engine.plan(conn, sql)
+        if plan is None:
+            print(f"{name:>22} {sqlite_s:>9.3f} {'(declined by columnar engine)':>36}")
+            continue
+        cold_s, _ = timed(lambda: engine.execute(conn, plan), 1)
+        warm_s, result = timed(lambda: engine.execute(conn, plan), repeat)
+        totals[0] += sqlite_s
+        totals[1] += warm_s
+        print(
+            f"{name:>22} {sqlite_s:>9.3f} {cold_s:>10.3f} {warm_s:>10.3f} {sqlite_s / warm_s:>7.1f}x "
+            f"{len(expected):>6} {str(same_rows(result.rows, expected)):>6}"
+        )
+    print(f"{'total':>22} {totals[0]:>9.3f} {'':>10} {totals[1]:>10.3f} {totals[0] / max(totals[1], 1e-9):>7.1f}x")
+    print(f"column store: {engine.store.stats()['columns']} columns, {engine.store.stats()['bytes'] / 1e6:.1f} MB")
+    conn.close()
+
+def main(args):
+    if args.db:
+        run(args.db, args.repeat)
+        return
+    import generate_mock_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        cfg = generate_mock_data.GeneratorConfig(seed=args.seed, scale=args.scale)
+        generate_mock_data.generate(cfg, generate_mock_data.SqliteWriter(path, cfg.batch_size, cfg.commit_every))
+        run(path, args.repeat)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite vs columnar engine on aggregate queries")
+    parser.add_argument("--db", help="existing generated database (skips generation)")
+    parser.add_argument("--scale", type=float, default=0.5, help="generator scale when no --db is given")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
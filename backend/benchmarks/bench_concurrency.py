@@ -0,0 +1,64 @@
+"""
+Concurrency benchmark for the agent graph.
+
+Runs N simultaneous "clients" against app_graph with a fake LLM that takes a fixed
+amount of time to answer, and reports throughput for each level of concurrency.
+With async nodes the LLM wait overlaps across clients, so throughput should grow
+roughly linearly with N until SQLite or the CPU becomes the bottleneck.
+
+Usage (from backend/):
+    python -m benchmarks.bench_concurrency --clients 1 8 32 --requests 64 --llm-latency 0.2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ANTHROPIC_API_KEY", "mock-ant-key")
+
+from langchain_core.messages import HumanMessage
+
+from app.agents.graph import app_graph
+from app.core.config import settings
+from benchmarks.fakes import install_fake_llm
+
+QUESTIONS = [
+    "total sales for Allegra",
+    "how many brands",
+    "list all brands",
+    "sales for Doliprane",
+    "show revenue by brand",
+]
+
+async def run_level(clients: int, requests: int) -> float:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(QUESTIONS[i % len(QUESTIONS)])
+
+    async def client():
+        while not queue.empty():
+            question = queue.get_nowait()
+            await app_graph.ainvoke({"user_query": question, "messages": [HumanMessage(content=question)]})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return time.perf_counter() - start
+
+async def main(args):
+    # Every request pays for its LLM call and query: no cached or speculatively prefetched answers
+    settings.QUERY_CACHE_ENABLED = False
+    settings.SPECULATIVE_SQL_ENABLED = False
+    install_fake_llm(args.llm_latency)
+    print(f"{'clients':>8} {'requests':>9} {'elapsed_s':>10} {'req/s':>8}")
+    for clients in args.clients:
+        elapsed = await run_level(clients, args.requests)
+        print(f"{clients:>8} {args.requests:>9} {elapsed:>10.3f} {args.requests / elapsed:>8.2f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of app_graph under N simultaneous clients")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+Entity resolution latency of the in-memory entity index, by dimension size.
+
+For each --brands count a dimension-only warehouse is generated with
+database/generate_mock_data.py (calendar, geography, products; no sales facts) and the
+index is built over it. Questions mix exact values, typos, prefixes and no entities.
+"cold" resolves with the fuzzy memo cleared before every question, "warm" with it filled.
+
+Usage (from backend/):
+    python -m benchmarks.bench_entity_index --brands 400 2000 5000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+sys.path.insert(0, os.path.join(BACKEND, "database"))
+
+from app.services.entity_index import EntityIndex
+
+QUESTIONS = [
+    "What were Doliprane sales in France in 2023?",
+    "sales of dolipran and tylenl in Q1 2021",
+    "total revenue for the Pain Releif category by country",
+    "compare Retail Panel vs hospital in Germany",
+    "monthly sales trend for ibuprofen in January",
+    "Allegra vs Zyrtec units in the US",
+    "How many brands are there?",
+    "top 10 products by revenue last quarter",
+]
+
+def build_dimensions(path: str, brands: int, seed: int):
+    import generate_mock_data as gen
+
+    cfg = gen.GeneratorConfig(seed=seed, brands=brands, products=max(5000, brands * 2))
+    out = gen.SqliteWriter(path, cfg.batch_size, cfg.commit_every)
+    _, months = gen.generate_calendar(cfg, out)
+    countries, _ = gen.generate_geography(cfg, out, months)
+    gen.generate_products(cfg, out, gen.generate_brands(cfg), countries)
+    out.close(build_indexes=False)
+
+def open_index(path: str, min_score: float) -> EntityIndex:
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(path)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def columns(table):
+        with connect() as conn:
+            return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+    return EntityIndex(connect, fingerprint=lambda: path, columns=columns, min_score=min_score)
+
+def per_question_us(index: EntityIndex, repeat: int, cold: bool) -> float:
+    times = []
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            if cold:
+                index._fuzzy_memo.clear()
+            start = time.perf_counter()
+            index.resolve(question)
+            times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e6
+
+def main(args):
+    print(f"{'brands':>7} {'keys':>6} {'build_ms':>9} {'cold_us':>8} {'warm_us':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for brands in args.brands:
+            path = os.path.join(tmp, f"dims_{brands}.db")
+            build_dimensions(path, brands, args.seed)
+            index = open_index(path, args.min_score)
+            start = time.perf_counter()
+            index.refresh()
+            build_ms = (time.perf_counter() - start) * 1000
+            cold = per_question_us(index, args.repeat, cold=True)
+            warm = per_question_us(index, args.repeat, cold=False)
+            print(f"{brands:>7} {index.stats()['keys']:>6} {build_ms:>9.1f} {cold:>8.1f} {warm:>8.1f}")
+    if args.show:
+        for question in QUESTIONS:
+            print(f"{question!r}: {[(m.type, m.value, m.score) for m in index.resolve(question)]}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entity index resolution latency")
+    parser.add_argument("--brands", type=int, nargs="+", default=[400, 2000, 5000])
+    parser.add_argument("--min-score", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--show", action="store_true", help="print the matches for the largest index")
+    main(parser.parse_args())
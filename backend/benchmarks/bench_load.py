@@ -0,0 +1,400 @@
+"""
+Load test / replay harness for the agent pipeline, fully offline.
+
+Replays a corpus of questions against app_graph directly (--target graph) or over the
+WebSocket API (--target ws: a uvicorn server on a loopback port in this process, or
+--url for a running server). The LLM is a deterministic fake: SQL-writer prompts for a
+corpus question are answered with that question's "sql" (if any, otherwise the keyword
+templates take over), after a delay drawn from --llm-latency (see fakes.LatencyDistribution).
+
+Load is closed-loop (--concurrency clients back to back) or open-loop (--rate arrivals
+per second, Poisson, at most --concurrency in flight; queueing counts towards latency).
+Reports throughput, end-to-end and per-span (graph node, LLM call, SQL) p50/p95/p99 from
+the request traces, and process memory. --json saves the report; --baseline compares
+against a saved one and exits non-zero on regressions.
+
+Corpus files are JSON lines ({"question": ..., "sql": ...}) or plain text, one question
+per line.
+
+Usage (from backend/):
+    python -m benchmarks.bench_load --requests 200 --concurrency 16 --llm-latency lognormal:0.3,0.5
+    python -m benchmarks.bench_load --target ws --rate 20 --requests 300 --json load.json
+    python -m benchmarks.bench_load --baseline load.json --max-regression 0.25
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ANTHROPIC_API_KEY", "mock-ant-key")
+
+from langchain_core.messages import HumanMessage
+
+from app.core.config import settings
+from app.services.tracing import start_trace, trace_store
+from benchmarks.fakes import LatencyDistribution, install_fake_llm, sql_responder
+
+DEFAULT_CORPUS = [
+    {"question": "total sales for Allegra"},
+    {"question": "how many brands"},
+    {"question": "list all brands"},
+    {"question": "sales for Doliprane"},
+    {"question": "show revenue by brand"},
+    {"question": "sales by country", "sql": (
+        "SELECT c.COUNTRY, SUM(s.VALUE_LC) AS SALES_LC FROM FCT_SALES_NATIONAL_MTH s "
+        "JOIN DIM_COUNTRY c ON s.COUNTRY_ID = c.COUNTRY_ID GROUP BY c.COUNTRY ORDER BY SALES_LC DESC"
+    )},
+    {"question": "monthly units for Advil", "sql": (
+        "SELECT s.CALENDAR_ID, SUM(s.QTY_UNITS) AS UNITS FROM FCT_SALES_NATIONAL_MTH s "
+        "JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID "
+        "WHERE p.PRODUCT_BRAND = 'Advil' GROUP BY s.CALENDAR_ID ORDER BY s.CALENDAR_ID"
+    )},
+    {"question": "sales by category and month", "sql": (
+        "SELECT p.CATEGORY_NM, s.CALENDAR_ID, SUM(s.VALUE_LC) AS SALES_LC FROM FCT_SALES_NATIONAL_MTH s "
+        "JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID GROUP BY p.CATEGORY_NM, s.CALENDAR_ID"
+    )},
+]
+
+def load_corpus(path: Optional[str]) -> List[Dict[str, str]]:
+    if path is None:
+        return DEFAULT_CORPUS
+    corpus = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            corpus.append(json.loads(line) if line.startswith("{") else {"question": line})
+    return corpus
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    # Nearest rank
+    index = max(0, min(len(sorted_values) - 1, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+# --- memory ---
+
+def rss_bytes() -> Dict[str, int]:
+    """
+    Current and peak resident set size (Linux /proc; ru_maxrss elsewhere).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss": int(fields["VmRSS"].split()[0]) * 1024, "peak": int(fields["VmHWM"].split()[0]) * 1024}
+    except (OSError, KeyError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak *= 1 if sys.platform == "darwin" else 1024
+        return {"rss": peak, "peak": peak}
+
+class MemorySampler:
+    """
+    Polls RSS while the load runs, for the peak reached during the measured phase.
+    """
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.start = rss_bytes()["rss"]
+        self.peak = self.start
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes()["rss"])
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end = rss_bytes()["rss"]
+        self.peak = max(self.peak, self.end)
+
+# --- targets ---
+
+class GraphTarget:
+    """
+    Runs questions through app_graph in this process, one trace per request.
+    """
+
+    async def start(self):
+        from app.agents.graph import app_graph
+        self.graph = app_graph
+
+    async def ask(self, question: str) -> Dict[str, Any]:
+        trace = start_trace()
+        inputs = {
+            "user_query": question,
+            "session_id": "load-test",
+            "deadline": time.monotonic() + settings.REQUEST_TIMEOUT_S,
+            "messages": [HumanMessage(content=question)],
+        }
+        await self.graph.ainvoke(inputs)
+        return trace.summary()
+
+    async def stop(self):
+        pass
+
+class WebSocketTarget:
+    """
+    Sends questions over /api/ws/chat, one per pooled connection at a time (the server
+    answers a session's questions in order). Without a URL, the app is served on a
+    loopback port from a thread of this process.
+    """
+
+    def __init__(self, url: Optional[str], connections: int):
+        self.url = url
+        self.connections = connections
+        self._server = None
+
+    async def start(self):
+        import websockets
+
+        if self.url is None:
+            self.url = await asyncio.to_thread(self._serve)
+        self._pool: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.connections):
+            self._pool.put_nowait(await websockets.connect(self.url, max_size=None))
+
+    def _serve(self) -> str:
+        import uvicorn
+        from app.main import app
+
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on"))
+        thread = threading.Thread(target=self._server.run, name="load-test-server", daemon=True)
+        thread.start()
+        while not self._server.started:
+            if not thread.is_alive():
+                raise RuntimeError("Load test server failed to start")
+            time.sleep(0.05)
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}/api/ws/chat"
+
+    async def ask(self, question: str) -> Dict[str, Any]:
+        ws = await self._pool.get()
+        try:
+            await ws.send(question)
+            trace_id = None
+            while True:
+                message = await ws.recv()
+                if message.startswith("Trace: "):
+                    trace_id = json.loads(message[len("Trace: "):])["trace_id"]
+                elif message.startswith("Final Response"):
+                    break
+                elif message.startswith("Error"):
+                    raise RuntimeError(message)
+        finally:
+            self._pool.put_nowait(ws)
+        return await self._trace(trace_id)
+
+    async def _trace(self, trace_id: Optional[str]) -> Dict[str, Any]:
+        if trace_id is None:
+            return {"spans": []}
+        if self._server is not None:
+            trace = trace_store.get(trace_id)
+            return trace.summary() if trace else {"spans": []}
+        # Remote server: its traces are served over HTTP
+        import requests
+
+        base = self.url.replace("ws://", "http://").replace("wss://", "https://").rsplit("/ws/chat", 1)[0]
+        response = await asyncio.to_thread(requests.get, f"{base}/traces/{trace_id}", timeout=10)
+        return response.json() if response.ok else {"spans": []}
+
+    async def stop(self):
+        while not self._pool.empty():
+            await self._pool.get_nowait().close()
+        if self._server is not None:
+            self._server.should_exit = True
+
+# --- load generation ---
+
+async def replay(target, corpus: List[Dict[str, str]], args) -> Dict[str, Any]:
+    latencies: List[float] = []
+    spans: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    error_examples: Dict[str, str] = {}
+    in_flight = asyncio.Semaphore(args.concurrency)
+
+    async def one(question: str, arrived: float):
+        async with in_flight:
+            try:
+                summary = await target.ask(question)
+            except Exception as e:
+                key = type(e).__name__
+                errors[key] = errors.get(key, 0) + 1
+                error_examples.setdefault(key, f"{question!r}: {e}")
+                return
+        latencies.append(time.perf_counter() - arrived)
+        for span in summary.get("spans", []):
+            if span.get("duration_ms") is not None and span["kind"] != "request":
+                spans.setdefault(f"{span['kind']}:{span['name']}", []).append(span["duration_ms"] / 1000)
+
+    questions = [corpus[i % len(corpus)]["question"] for i in range(args.requests)]
+    start = time.perf_counter()
+    if args.rate:
+        # Open loop: Poisson arrivals regardless of how fast requests complete
+        rng = random.Random(args.seed)
+        tasks, next_arrival = [], start
+        for question in questions:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(question, time.perf_counter())))
+            next_arrival += rng.expovariate(args.rate)
+        await asyncio.gather(*tasks)
+    else:
+        queue = list(reversed(questions))
+
+        async def client():
+            while queue:
+                await one(queue.pop(), time.perf_counter())
+
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    return {"elapsed_s": elapsed, "latencies": latencies, "spans": spans, "errors": errors, "error_examples": error_examples}
+
+def apply_overrides(pairs: List[str]):
+    for pair in pairs:
+        key, _, raw = pair.partition("=")
+        if not hasattr(settings, key):
+            raise SystemExit(f"Unknown setting {key}")
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw
+        setattr(settings, key, value)
+
+async def run(args) -> Dict[str, Any]:
+    apply_overrides(args.set)
+    corpus = load_corpus(args.corpus)
+    answers = {item["question"]: item["sql"] for item in corpus if item.get("sql")}
+    install_fake_llm(distribution=LatencyDistribution(args.llm_latency, args.seed), responder=sql_responder(answers))
+
+    target = GraphTarget() if args.target == "graph" else WebSocketTarget(args.url, args.concurrency)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        await target.start()
+        try:
+            if args.warmup:
+                warmup = argparse.Namespace(**{**vars(args), "requests": args.warmup, "rate": None})
+                await replay(target, corpus, warmup)
+            if args.tracemalloc:
+                tracemalloc.start()
+            with MemorySampler() as memory:
+                result = await replay(target, corpus, args)
+            heap_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+            tracemalloc.stop()
+        finally:
+            await target.stop()
+
+    completed = len(result["latencies"])
+    report = {
+        "config": {
+            "target": args.target, "requests": args.requests, "concurrency": args.concurrency, "rate": args.rate,
+            "llm_latency": args.llm_latency, "corpus": args.corpus or "default", "seed": args.seed, "set": args.set,
+        },
+        "elapsed_s": result["elapsed_s"],
+        "completed": completed,
+        "errors": result["errors"],
+        "error_examples": result["error_examples"],
+        "throughput_rps": completed / result["elapsed_s"] if result["elapsed_s"] else 0.0,
+        "latency": {"request": summarize(result["latencies"])} if completed else {},
+        "memory_mb": {
+            "rss_start": memory.start / 1e6, "rss_end": memory.end / 1e6, "rss_peak": memory.peak / 1e6,
+            **({"python_heap_peak": heap_peak / 1e6} if heap_peak is not None else {}),
+        },
+    }
+    for name in sorted(result["spans"]):
+        report["latency"][name] = summarize(result["spans"][name])
+    return report
+
+def print_report(report: Dict[str, Any]):
+    cfg = report["config"]
+    mode = f"rate {cfg['rate']}/s (max {cfg['concurrency']} in flight)" if cfg["rate"] else f"{cfg['concurrency']} clients"
+    print(f"target={cfg['target']} {mode} llm={cfg['llm_latency']} corpus={cfg['corpus']}")
+    errors = sum(report["errors"].values())
+    print(f"{report['completed']} completed, {errors} failed {report['errors'] or ''} in {report['elapsed_s']:.2f}s "
+          f"-> {report['throughput_rps']:.2f} req/s")
+    for key, example in report["error_examples"].items():
+        print(f"  {key}, e.g. {example}")
+    print(f"{'series':>28} {'count':>6} {'p50_ms':>9} {'p95_ms':>9} {'p99_ms':>9} {'max_ms':>9}")
+    for name, s in report["latency"].items():
+        print(f"{name:>28} {s['count']:>6} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f} {s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+    mem = report["memory_mb"]
+    line = f"memory: rss {mem['rss_start']:.1f} MB -> {mem['rss_end']:.1f} MB, peak {mem['rss_peak']:.1f} MB"
+    if "python_heap_peak" in mem:
+        line += f", python heap peak {mem['python_heap_peak']:.1f} MB"
+    print(line)
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    Regressions beyond max_regression (fractional): throughput down, p95 of any shared series up.
+    """
+    problems = []
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - max_regression):
+        problems.append(f"throughput {report['throughput_rps']:.2f} req/s vs {baseline['throughput_rps']:.2f} baseline")
+    for name, stats in report["latency"].items():
+        base = baseline["latency"].get(name)
+        if base and stats["p95_ms"] > base["p95_ms"] * (1 + max_regression) and stats["p95_ms"] - base["p95_ms"] > 1.0:
+            problems.append(f"{name} p95 {stats['p95_ms']:.2f} ms vs {base['p95_ms']:.2f} ms baseline")
+    if sum(report["errors"].values()) > sum(baseline["errors"].values()):
+        problems.append(f"errors {report['errors']} vs {baseline['errors']} baseline")
+    return problems
+
+def main(args):
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(report, json.load(f), args.max_regression)
+        for problem in problems:
+            print(f"REGRESSION: {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"No regressions beyond {args.max_regression:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test / replay harness for the agent pipeline")
+    parser.add_argument("--target", choices=["graph", "ws"], default="graph")
+    parser.add_argument("--url", help="WebSocket URL of a running server (ws target); default serves the app on loopback")
+    parser.add_argument("--corpus", help="JSON lines or plain text questions (default: built-in corpus)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8, help="clients (closed loop) or max in flight (open loop)")
+    parser.add_argument("--rate", type=float, help="open-loop arrivals per second (Poisson)")
+    parser.add_argument("--llm-latency", default="lognormal:0.2,0.4", help="fake LLM latency distribution spec")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured requests before the run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="override a setting, e.g. QUERY_CACHE_ENABLED=false")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slows the run)")
+    parser.add_argument("--json", help="write the report here")
+    parser.add_argument("--baseline", help="report to compare against; exits 1 on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+    main(parser.parse_args())
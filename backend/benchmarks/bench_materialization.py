@@ -0,0 +1,78 @@
+"""
+Time and peak memory of the old pandas path (read_sql_query + to_dict) versus the
+cursor-based QueryResult path for a large FCT_SALES_NATIONAL_MTH scan.
+
+A throwaway database with --rows synthetic fact rows is built in a temp directory.
+
+Usage (from backend/):
+    python -m benchmarks.bench_materialization --rows 500000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from app.services.query_result import QueryResult
+
+SCAN_SQL = "SELECT SOURCE_PRODUCT_ID, COUNTRY_ID, PANEL_ID, CALENDAR_ID, QTY_UNITS, VALUE_LC FROM FCT_SALES_NATIONAL_MTH"
+
+def build_db(path: str, rows: int):
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+    CREATE TABLE FCT_SALES_NATIONAL_MTH (
+        SOURCE_PRODUCT_ID TEXT, COUNTRY_ID TEXT, PANEL_ID TEXT,
+        CALENDAR_ID TEXT, QTY_UNITS REAL, VALUE_LC REAL
+    )""")
+    batch = 50_000
+    for start in range(0, rows, batch):
+        conn.executemany(
+            "INSERT INTO FCT_SALES_NATIONAL_MTH VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (f"SP{rng.randint(1, 5000)}", "US", f"P{rng.randint(1, 20)}",
+                 f"2023{rng.randint(1, 12):02d}", rng.random() * 100, rng.random() * 1000)
+                for _ in range(min(batch, rows - start))
+            ],
+        )
+    conn.commit()
+    conn.close()
+
+def pandas_path(conn):
+    return pd.read_sql_query(SCAN_SQL, conn).to_dict(orient="records")
+
+def cursor_path(conn):
+    cursor = conn.execute(SCAN_SQL)
+    return QueryResult([d[0] for d in cursor.description], cursor.fetchall())
+
+def measure(fn, conn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(conn)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(result), elapsed, peak
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_db(path, args.rows)
+        conn = sqlite3.connect(path)
+        print(f"{'path':>10} {'rows':>10} {'time_s':>8} {'peak_mb':>9}")
+        for name, fn in (("pandas", pandas_path), ("cursor", cursor_path)):
+            rows, elapsed, peak = measure(fn, conn)
+            print(f"{name:>10} {rows:>10} {elapsed:>8.3f} {peak / 1e6:>9.1f}")
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pandas vs cursor row materialization")
+    parser.add_argument("--rows", type=int, default=500_000)
+    main(parser.parse_args())
@@ -0,0 +1,67 @@
+"""
+Prompt size and SQL writer latency with and without schema pruning.
+
+The fake LLM charges a fixed latency plus a per-1k-token cost, approximating how
+provider latency grows with input size.
+
+Usage (from backend/):
+    python -m benchmarks.bench_schema_pruning --latency 0.05 --latency-per-1k 0.25
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ANTHROPIC_API_KEY", "mock-ant-key")
+
+from app.agents.graph import sql_writer_node
+from app.core.config import settings
+from app.services.schema_retriever import estimate_tokens
+from app.services.snowflake_service import snowflake_service
+from benchmarks.fakes import install_fake_llm
+
+QUESTIONS = [
+    "total sales for Allegra",
+    "how many brands",
+    "list all brands",
+    "weekly sales by country",
+    "quarterly revenue by market",
+    "exchange rate by currency for 2023",
+    "distribution by panel",
+    "sales by category and month",
+]
+
+async def measure(pruning: bool, repeats: int):
+    settings.SCHEMA_PRUNING_ENABLED = pruning
+    tokens, latencies = [], []
+    for question in QUESTIONS:
+        tokens.append(estimate_tokens(snowflake_service.get_schema_info(question)))
+        for _ in range(repeats):
+            start = time.perf_counter()
+            await sql_writer_node({"user_query": question, "messages": []})
+            latencies.append(time.perf_counter() - start)
+    return tokens, latencies
+
+async def main(args):
+    # Every repeat must reach the LLM: no cached SQL, no template served instead
+    settings.QUERY_CACHE_ENABLED = False
+    settings.SPECULATIVE_SQL_ENABLED = False
+    install_fake_llm(latency=args.latency, latency_per_1k_tokens=args.latency_per_1k)
+    print(f"{'mode':>10} {'avg_schema_tokens':>18} {'max_schema_tokens':>18} {'p50_ms':>8} {'mean_ms':>8}")
+    for pruning in (False, True):
+        tokens, latencies = await measure(pruning, args.repeats)
+        mode = "pruned" if pruning else "full"
+        print(
+            f"{mode:>10} {statistics.mean(tokens):>18.0f} {max(tokens):>18} "
+            f"{statistics.median(latencies) * 1000:>8.1f} {statistics.mean(latencies) * 1000:>8.1f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Schema context size and SQL writer latency, pruned vs full")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed seconds per fake LLM call")
+    parser.add_argument("--latency-per-1k", type=float, default=0.25, help="Extra seconds per 1k prompt tokens")
+    asyncio.run(main(parser.parse_args()))
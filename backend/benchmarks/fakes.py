@@ -0,0 +1,115 @@
+"""
+Offline stand-ins shared by the benchmarks.
+"""
+import asyncio
+import math
+import random
+import time
+from typing import Callable, Dict, Optional
+
+from langchain_community.chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+class LatencyDistribution:
+    """
+    Seeded sampler of extra LLM latency in seconds, parsed from a spec:
+      fixed:0.2              always 0.2
+      uniform:0.1,0.5        uniform between the bounds
+      normal:0.3,0.05        mean, standard deviation (clipped at 0)
+      lognormal:0.3,0.5      median, sigma of the underlying normal (long right tail)
+      exp:0.3                exponential with this mean
+    The same spec and seed always produce the same sequence.
+    """
+    KINDS = ("fixed", "uniform", "normal", "lognormal", "exp")
+
+    def __init__(self, spec: str, seed: int = 0):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {self.KINDS}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        self._rng = random.Random(seed)
+
+    def sample(self) -> float:
+        p, rng = self.params, self._rng
+        if self.kind == "fixed":
+            return p[0]
+        if self.kind == "uniform":
+            return rng.uniform(p[0], p[1])
+        if self.kind == "normal":
+            return max(0.0, rng.gauss(p[0], p[1]))
+        if self.kind == "lognormal":
+            return p[0] * math.exp(rng.gauss(0.0, p[1]))
+        return rng.expovariate(1 / p[0])
+
+class LatencyFakeChatModel(FakeListChatModel):
+    """
+    FakeListChatModel that takes `latency` seconds plus `latency_per_1k_tokens` for every
+    thousand prompt tokens (~4 characters each), so prompt size shows up in timings.
+    `distribution` adds a sampled delay per call. `responder` maps the prompt to the answer
+    (deterministic under concurrency, unlike cycling through `responses`).
+    The async path sleeps without blocking the event loop.
+    """
+    latency: float = 0.0
+    latency_per_1k_tokens: float = 0.0
+    distribution: Optional[LatencyDistribution] = None
+    responder: Optional[Callable[[str], Optional[str]]] = None
+
+    def _delay(self, messages) -> float:
+        chars = sum(len(str(m.content)) for m in messages)
+        jitter = self.distribution.sample() if self.distribution is not None else 0.0
+        return self.latency + jitter + self.latency_per_1k_tokens * math.ceil(chars / 4) / 1000
+
+    def _answer(self, messages, stop):
+        if self.responder is not None:
+            answer = self.responder("\n".join(str(m.content) for m in messages))
+            if answer is not None:
+                return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+        return super()._generate(messages, stop=stop)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._delay(messages))
+        return self._answer(messages, stop)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._delay(messages))
+        return self._answer(messages, stop)
+
+def sql_responder(answers: Dict[str, str]) -> Callable[[str], Optional[str]]:
+    """
+    Responder answering SQL-writer prompts with the SQL recorded for the question they ask
+    about (prompts quote it as: Generate a SQL query for: "<question>").
+    """
+    def respond(prompt: str) -> Optional[str]:
+        start = prompt.find('for: "')
+        if start < 0:
+            return None
+        start += len('for: "')
+        return answers.get(prompt[start:prompt.find('"', start)])
+    return respond
+
+def install_fake_llm(
+    latency: float = 0.0,
+    latency_per_1k_tokens: float = 0.0,
+    responses=None,
+    distribution: Optional[LatencyDistribution] = None,
+    responder: Optional[Callable[[str], Optional[str]]] = None,
+):
+    """
+    Makes llm_factory hand out a single LatencyFakeChatModel (timed like real clients,
+    under provider "fake"). Returns the model.
+    """
+    from app.services.llm_factory import LLMTelemetry, llm_factory
+
+    llm = LatencyFakeChatModel(
+        responses=responses or ["Mock response: no SQL."],
+        latency=latency,
+        latency_per_1k_tokens=latency_per_1k_tokens,
+        distribution=distribution,
+        responder=responder,
+    )
+    llm.callbacks = [LLMTelemetry("fake", "fake")]
+    llm_factory.create_llm = lambda *args, **kwargs: llm
+    return llm
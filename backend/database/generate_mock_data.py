@@ -0,0 +1,472 @@
+"""
+Deterministic, scalable synthetic data for the mock warehouse.
+
+Fills all 14 tables with production-like cardinalities: products spread over brands with
+a long-tailed popularity, several panels per country, and weekly sales series that are
+rolled up into consistent monthly and quarterly facts (plus sub-national, distribution
+and FX facts). Everything is derived from the seed, and rows are streamed to SQLite (or
+CSV) in batches, so no table is ever held in memory.
+
+    python database/generate_mock_data.py --scale 1 --output database/mock_snowflake_large.db
+    python database/generate_mock_data.py --scale 0.1 --format csv --output /tmp/mock_csv
+
+Point the backend at a generated database with WAREHOUSE_DB_PATH.
+"""
+import argparse
+import bisect
+import csv
+import datetime
+import itertools
+import math
+import os
+import random
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    from .init_mock_db import create_tables
+except ImportError:  # run as a script: python database/generate_mock_data.py
+    from init_mock_db import create_tables
+
+@dataclass
+class GeneratorConfig:
+    seed: int = 42
+    scale: float = 1.0
+    start_year: int = 2021
+    years: int = 3
+    countries: int = 20
+    panels_per_country: int = 3
+    brands: int = 400
+    products: int = 5000
+    markets: int = 60
+    series: int = 10_000  # weekly sales series: (product, panel, channel) combinations
+    subnat_regions: int = 8
+    subnat_share: float = 0.2  # share of series also reported per region
+    distribution_share: float = 0.3  # share of series with monthly distribution figures
+    batch_size: int = 10_000
+    commit_every: int = 250_000
+
+    def scaled(self, n: int) -> int:
+        return max(1, int(n * self.scale))
+
+    def rng(self, stream: str) -> random.Random:
+        # One independent, reproducible stream per table family
+        return random.Random(f"{self.seed}:{stream}")
+
+INSERTED_TS = "2024-01-01 00:00:00"
+
+# (id, name, alpha-2, alpha-3, currency, EUR per unit of currency)
+COUNTRIES = [
+    ("US", "United States", "US", "USA", "USD", 0.92), ("GB", "United Kingdom", "GB", "GBR", "GBP", 1.16),
+    ("FR", "France", "FR", "FRA", "EUR", 1.0), ("DE", "Germany", "DE", "DEU", "EUR", 1.0),
+    ("IT", "Italy", "IT", "ITA", "EUR", 1.0), ("ES", "Spain", "ES", "ESP", "EUR", 1.0),
+    ("NL", "Netherlands", "NL", "NLD", "EUR", 1.0), ("BE", "Belgium", "BE", "BEL", "EUR", 1.0),
+    ("PL", "Poland", "PL", "POL", "PLN", 0.23), ("SE", "Sweden", "SE", "SWE", "SEK", 0.088),
+    ("CH", "Switzerland", "CH", "CHE", "CHF", 1.04), ("CA", "Canada", "CA", "CAN", "CAD", 0.68),
+    ("MX", "Mexico", "MX", "MEX", "MXN", 0.05), ("BR", "Brazil", "BR", "BRA", "BRL", 0.18),
+    ("JP", "Japan", "JP", "JPN", "JPY", 0.0063), ("CN", "China", "CN", "CHN", "CNY", 0.13),
+    ("IN", "India", "IN", "IND", "INR", 0.011), ("AU", "Australia", "AU", "AUS", "AUD", 0.61),
+    ("ZA", "South Africa", "ZA", "ZAF", "ZAR", 0.05), ("TR", "Turkey", "TR", "TUR", "TRY", 0.03),
+    ("PT", "Portugal", "PT", "PRT", "EUR", 1.0), ("AT", "Austria", "AT", "AUT", "EUR", 1.0),
+    ("DK", "Denmark", "DK", "DNK", "DKK", 0.13), ("NO", "Norway", "NO", "NOR", "NOK", 0.085),
+]
+
+PANEL_TYPES = [
+    ("Retail Panel", "Retail", "Pharmacy"), ("Hospital Panel", "Hospital", "Institutional"),
+    ("E-commerce Panel", "Online", "Retail"), ("Wholesale Panel", "Wholesale", "Trade"),
+    ("Grocery Panel", "Grocery", "Retail"),
+]
+
+CHANNEL_TYPES = [
+    ("CH1", "Pharmacy", "Retail", "Pharmacy", "Chain"), ("CH2", "Pharmacy Independent", "Retail", "Pharmacy", "Independent"),
+    ("CH3", "Hospital", "Institutional", "Hospital", "Public"), ("CH4", "Online", "Retail", "Online", "Marketplace"),
+    ("CH5", "Grocery", "Retail", "Mass", "Grocery"), ("CH6", "Drugstore", "Retail", "Mass", "Drugstore"),
+]
+
+# Category -> (ATC4, molecules, price range in local currency, share of Rx products)
+CATEGORIES = {
+    "Pain Relief": ("N02B", ["Paracetamol", "Ibuprofen", "Aspirin", "Naproxen"], (3, 15), 0.1),
+    "Allergy": ("R06A", ["Cetirizine", "Loratadine", "Fexofenadine"], (5, 20), 0.2),
+    "Digestive Health": ("A06A", ["Bisacodyl", "Lactulose", "Macrogol"], (4, 18), 0.1),
+    "Cough & Cold": ("R05C", ["Guaifenesin", "Dextromethorphan", "Ambroxol"], (4, 16), 0.05),
+    "Vitamins": ("A11A", ["Multivitamin", "Vitamin D", "Vitamin C"], (6, 30), 0.0),
+    "Dermatology": ("D07A", ["Hydrocortisone", "Clotrimazole", "Zinc Oxide"], (5, 25), 0.3),
+    "Cardiovascular": ("C10A", ["Atorvastatin", "Rosuvastatin", "Simvastatin"], (10, 60), 0.95),
+    "Diabetes": ("A10B", ["Metformin", "Sitagliptin", "Gliclazide"], (12, 80), 0.95),
+    "Sleep": ("N05C", ["Melatonin", "Doxylamine", "Valerian"], (6, 22), 0.2),
+    "Eye Care": ("S01G", ["Tetryzoline", "Hyaluronic Acid", "Naphazoline"], (5, 18), 0.1),
+}
+
+# The original demo brands stay first so existing questions and templates keep working
+SEED_BRANDS = [
+    ("Allegra", "Allergy"), ("Advil", "Pain Relief"), ("Tylenol", "Pain Relief"), ("Zyrtec", "Allergy"),
+    ("Claritin", "Allergy"), ("Doliprane", "Pain Relief"), ("Dulcoflex", "Digestive Health"),
+]
+_PREFIXES = ["Al", "Bro", "Cal", "Dor", "El", "Fen", "Gal", "Hy", "Ix", "Jo", "Ka", "Lu", "Mar", "Neo", "Ox", "Pra", "Qui", "Ro", "Sol", "Ty", "Ul", "Ver", "Xa", "Zen"]
+_SUFFIXES = ["gra", "vil", "prane", "flex", "tec", "tin", "dol", "mex", "zol", "pril", "vax", "lin", "sone", "dex", "ra", "vir", "mab", "cort", "lax", "fen"]
+FORMS = ["Tablets", "Capsules", "Syrup", "Gel", "Drops", "Spray", "Sachets"]
+REGIONS = ["North", "South", "East", "West", "Central", "North-East", "North-West", "South-East", "South-West", "Capital"]
+
+TABLE_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "DIM_COUNTRY": ("COUNTRY_ID", "COUNTRY", "COUNTRY_SHORT_CD", "COUNTRY_SHORT_CD_ALPHA3", "EXCLUSION_FLAG"),
+    "DIM_CALENDAR": ("CALENDAR_ID", "CALENDAR_TYPE", "YEAR", "QUARTER", "QUARTER_NM", "MONTH", "MONTH_NM", "WEEK", "WEEK_NM"),
+    "DIM_PANEL": ("PANEL_ID", "COUNTRY", "PANEL", "CHANNEL", "SECTOR", "FREQUENCY", "SOURCE", "UNIT_TYPE", "WEIGHTAGE",
+                  "MANUFACTURER_RATE", "TRADE_RATE", "PUBLIC_RATE", "LATEST_SALES_PERIOD", "CURRENCY_CD", "INSERTED_TS", "EXCLUSION_FLAG"),
+    "DIM_CHANNEL_TYPE": ("CHANNEL_TYPE_ID", "CHANNEL_TYPE_NM", "CHANNEL_TYPE_LVL1", "CHANNEL_TYPE_LVL2", "CHANNEL_TYPE_LVL3"),
+    "DIM_MARKET": ("MARKET_ID", "MARKET_NM", "MARKET_LVL_1", "MARKET_LVL_2", "MARKET_LVL_3", "INSERTED_TS", "EXCLUSION_FLAG"),
+    "DIM_SOURCE_PRODUCT": ("SOURCE_PRODUCT_ID", "PRODUCT_BRAND", "CATEGORY_NM", "PRODUCT", "PACK", "STRENGTH", "PACK_SIZE",
+                           "MANUFACTURER", "CORPORATION", "COUNTRY", "ATC4", "MOLECULE_LIST", "RX_STATUS", "GENERIC_STATUS",
+                           "PRODUCT_LAUNCH_DATE", "SALES_FLAG", "EXCLUSION_FLAG", "INSERTED_TS"),
+    "LNK_MARKET_PRODUCT": ("MARKET_PRODUCT_ID", "MARKET_ID", "SOURCE_PRODUCT_ID", "INSERTED_TS"),
+    "DIM_TRANSCODE_PRODUCT": ("TRANSCODE_PRODUCT_ID", "PRODUCT_KEY", "MARKET_NM", "COUNTRY", "MANUFACTURER", "CORPORATION",
+                              "PRODUCT", "PACK", "MOLECULE_LIST", "ATC4", "UNIT_TYPE", "SU_COEFF", "INSERTED_TS", "EXCLUSION_FLAG"),
+    "FCT_CURRENCY_EXCHANGE_RATE": ("EXCHANGE_RATE_ID", "COUNTRY_ID", "CURRENCY_CD", "EXCHANGE_RATE_TYPE", "EXCHANGE_RATE_TYPE_DESC",
+                                   "CALENDAR_ID", "EXCHANGE_RATE"),
+    "FCT_SUB_NATIONAL": ("SUBNAT_PRODUCT_ID", "SOURCE_PRODUCT_ID", "COUNTRY_ID", "GEO_ID", "PANEL_ID", "CALENDAR_ID", "FREQUENCY",
+                         "CHANNEL_TYPE_ID", "QTY_UNITS", "VALUE_LC", "INSERTED_TS", "EXCLUSION_FLAG"),
+    "FCT_DISTRIBUTION": ("DISTRIBUTION_ID", "COUNTRY_ID", "PANEL_ID", "CHANNEL_TYPE_ID", "SOURCE_PRODUCT_ID", "FREQUENCY",
+                         "DATA_LEVEL", "CALENDAR_ID", "NUM_DISTRIBUTION_SELLOUT", "WTD_DISTRIBUTION_SELLOUT", "INSERTED_TS", "EXCLUSION_FLAG"),
+}
+SALES_COLUMNS = ("SOURCE_PRODUCT_ID", "COUNTRY_ID", "PANEL_ID", "CHANNEL_TYPE_ID", "CALENDAR_ID", "QTY_UNITS", "QTY_SU", "QTY_CU",
+                 "VALUE_LC", "VALUE_RX", "VALUE_MNF_LC", "VALUE_TRADE_LC", "VALUE_PUBLIC_LC", "VALUE_MNF_EU", "VALUE_TRADE_EU",
+                 "VALUE_PUBLIC_EU", "INSERTED_TS", "EXCLUSION_FLAG")
+for _grain in ("WK", "MTH", "QTR"):
+    TABLE_COLUMNS[f"FCT_SALES_NATIONAL_{_grain}"] = SALES_COLUMNS
+
+# Created after the load, when building them in one pass is much cheaper than maintaining them per insert
+POST_LOAD_INDEXES = [
+    (table, columns)
+    for grain in ("WK", "MTH", "QTR")
+    for table, columns in (
+        (f"FCT_SALES_NATIONAL_{grain}", ("SOURCE_PRODUCT_ID", "CALENDAR_ID")),
+        (f"FCT_SALES_NATIONAL_{grain}", ("CALENDAR_ID",)),
+    )
+] + [
+    ("FCT_SUB_NATIONAL", ("SOURCE_PRODUCT_ID", "CALENDAR_ID")),
+    ("FCT_DISTRIBUTION", ("SOURCE_PRODUCT_ID", "CALENDAR_ID")),
+    ("LNK_MARKET_PRODUCT", ("SOURCE_PRODUCT_ID",)),
+    ("DIM_SOURCE_PRODUCT", ("PRODUCT_BRAND",)),
+]
+
+# Bulk-load settings: no rollback journal or fsync, exclusive access, large page cache
+LOADER_PRAGMAS = [
+    "PRAGMA journal_mode = OFF",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -262144",
+    "PRAGMA foreign_keys = OFF",
+]
+
+class SqliteWriter:
+    """
+    Buffers rows per table and inserts them with executemany in batches of `batch_size`,
+    committing every `commit_every` rows. Secondary indexes are built once at the end.
+    """
+
+    def __init__(self, path: str, batch_size: int, commit_every: int):
+        for stale in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        for pragma in LOADER_PRAGMAS:
+            self.conn.execute(pragma)
+        create_tables(self.conn.cursor())
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.counts: Dict[str, int] = {}
+        self._buffers: Dict[str, List[tuple]] = {}
+        self._uncommitted = 0
+        self.conn.execute("BEGIN")
+
+    def add(self, table: str, row: tuple):
+        buffer = self._buffers.setdefault(table, [])
+        buffer.append(row)
+        if len(buffer) >= self.batch_size:
+            self._flush(table)
+
+    def _flush(self, table: str):
+        rows = self._buffers.pop(table, [])
+        if not rows:
+            return
+        columns = TABLE_COLUMNS[table]
+        self.conn.executemany(
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+        )
+        self.counts[table] = self.counts.get(table, 0) + len(rows)
+        self._uncommitted += len(rows)
+        if self._uncommitted >= self.commit_every:
+            self.conn.execute("COMMIT")
+            self.conn.execute("BEGIN")
+            self._uncommitted = 0
+
+    def close(self, build_indexes: bool = True):
+        for table in list(self._buffers):
+            self._flush(table)
+        self.conn.execute("COMMIT")
+        if build_indexes:
+            for table, columns in POST_LOAD_INDEXES:
+                started = time.perf_counter()
+                self.conn.execute(f"CREATE INDEX IDX_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})")
+                print(f"  index on {table}({', '.join(columns)}) in {time.perf_counter() - started:.1f}s")
+            self.conn.execute("ANALYZE")
+        # Back to the settings the app expects
+        self.conn.execute("PRAGMA locking_mode = NORMAL")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.close()
+
+class CsvWriter:
+    """
+    Streams each table to <directory>/<TABLE>.csv with a header row.
+    """
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.counts: Dict[str, int] = {}
+        self._files = {}
+        self._writers = {}
+
+    def add(self, table: str, row: tuple):
+        writer = self._writers.get(table)
+        if writer is None:
+            f = open(os.path.join(self.directory, f"{table}.csv"), "w", newline="")
+            writer = csv.writer(f)
+            writer.writerow(TABLE_COLUMNS[table])
+            self._files[table], self._writers[table] = f, writer
+        writer.writerow(row)
+        self.counts[table] = self.counts.get(table, 0) + 1
+
+    def close(self, build_indexes: bool = True):
+        for f in self._files.values():
+            f.close()
+
+# Dimensions
+
+def generate_calendar(cfg: GeneratorConfig, out) -> Tuple[List[Tuple[str, str, str]], List[str]]:
+    """
+    Weeks (ISO, assigned to the month of their Thursday), months and quarters.
+    Returns [(week id, month id, quarter id)] in date order and the month ids.
+    """
+    months = []
+    for year in range(cfg.start_year, cfg.start_year + cfg.years):
+        for quarter in range(1, 5):
+            out.add("DIM_CALENDAR", (f"{year}Q{quarter}", "QUARTER", year, quarter, f"Q{quarter} {year}", None, None, None, None))
+        for month in range(1, 13):
+            quarter = (month - 1) // 3 + 1
+            month_id = f"{year}{month:02d}"
+            months.append(month_id)
+            out.add("DIM_CALENDAR", (month_id, "MONTH", year, quarter, f"Q{quarter} {year}", month,
+                                     datetime.date(year, month, 1).strftime("%B"), None, None))
+
+    weeks = []
+    day = datetime.date(cfg.start_year, 1, 1)
+    day += datetime.timedelta(days=(7 - day.weekday()) % 7)  # first Monday
+    end = datetime.date(cfg.start_year + cfg.years, 1, 1)
+    while day < end:
+        thursday = day + datetime.timedelta(days=3)
+        if thursday >= end:
+            break
+        iso_year, iso_week, _ = thursday.isocalendar()
+        quarter = (thursday.month - 1) // 3 + 1
+        week_id = f"{iso_year}W{iso_week:02d}"
+        out.add("DIM_CALENDAR", (week_id, "WEEK", thursday.year, quarter, f"Q{quarter} {thursday.year}", thursday.month,
+                                 thursday.strftime("%B"), iso_week, f"W{iso_week:02d} {iso_year}"))
+        weeks.append((week_id, f"{thursday.year}{thursday.month:02d}", f"{thursday.year}Q{quarter}"))
+        day += datetime.timedelta(days=7)
+    return weeks, months
+
+def generate_geography(cfg: GeneratorConfig, out, months: Sequence[str]):
+    """
+    Countries, panels, channel types and monthly FX rates. Returns the countries used and
+    the panels per country as {country id: [(panel id, manufacturer, trade, public rates)]}.
+    """
+    rng = cfg.rng("geography")
+    countries = COUNTRIES[:min(cfg.countries, len(COUNTRIES))]
+    panels: Dict[str, list] = {}
+    for country_id, name, short, alpha3, currency, eur_rate in countries:
+        out.add("DIM_COUNTRY", (country_id, name, short, alpha3, 0))
+        for i, (panel, channel, sector) in enumerate(PANEL_TYPES[:cfg.panels_per_country]):
+            panel_id = f"P{country_id}{i + 1:02d}"
+            manufacturer, trade = round(rng.uniform(0.55, 0.75), 3), round(rng.uniform(0.75, 0.9), 3)
+            out.add("DIM_PANEL", (panel_id, name, panel, channel, sector, "MONTHLY", "Synthetic", "UNITS",
+                                  round(rng.uniform(0.5, 1.5), 3), manufacturer, trade, 1.0, months[-1], currency, INSERTED_TS, 0))
+            panels.setdefault(country_id, []).append((panel_id, manufacturer, trade, 1.0))
+        rate = eur_rate
+        for month_id in months:
+            rate *= math.exp(rng.gauss(0, 0.01))  # gentle random walk
+            out.add("FCT_CURRENCY_EXCHANGE_RATE", (f"FX{country_id}{month_id}", country_id, currency, "AVG",
+                                                   "Monthly average to EUR", month_id, round(rate, 6)))
+    for row in CHANNEL_TYPES:
+        out.add("DIM_CHANNEL_TYPE", row)
+    return countries, panels
+
+def generate_brands(cfg: GeneratorConfig) -> List[Tuple[str, str, str]]:
+    """
+    [(brand, category, manufacturer)], seed brands first, then unique synthetic names.
+    """
+    rng = cfg.rng("brands")
+    categories = list(CATEGORIES)
+    manufacturers = [f"{p}{s.capitalize()} Pharma" for p, s in zip(rng.sample(_PREFIXES, 20), rng.choices(_SUFFIXES, k=20))]
+    brands, seen = [], set()
+    for name, category in SEED_BRANDS:
+        brands.append((name, category, rng.choice(manufacturers)))
+        seen.add(name)
+    count = cfg.scaled(cfg.brands)
+    while len(brands) < count:
+        name = rng.choice(_PREFIXES) + rng.choice(_SUFFIXES)
+        if name in seen:
+            name = f"{name} {len(brands)}"
+        seen.add(name)
+        brands.append((name, rng.choice(categories), rng.choice(manufacturers)))
+    return brands[:max(count, len(SEED_BRANDS))]
+
+def generate_products(cfg: GeneratorConfig, out, brands, countries) -> List[Tuple[str, str, float, int]]:
+    """
+    Products with a long-tailed brand distribution, plus markets, market links and
+    transcoding rows. Returns compact per-product facts [(product id, country id, unit price, pack size)].
+    """
+    rng = cfg.rng("products")
+    markets = {}
+    for i in range(cfg.markets):
+        category = list(CATEGORIES)[i % len(CATEGORIES)]
+        market_id = f"MK{i + 1:04d}"
+        name = f"{category} {['Total', 'OTC', 'Rx', 'Adult', 'Pediatric', 'Premium'][i // len(CATEGORIES) % 6]}"
+        markets.setdefault(category, []).append((market_id, name))
+        out.add("DIM_MARKET", (market_id, name, "Consumer Health", category, name, INSERTED_TS, 0))
+
+    # Zipf-like popularity: a few brands own many products
+    brand_weights = list(itertools.accumulate(1 / (rank + 1) ** 0.8 for rank in range(len(brands))))
+    products = []
+    link_id = itertools.count(1)
+    for i in range(cfg.scaled(cfg.products)):
+        # Every seed brand gets at least one product
+        index = i if i < len(SEED_BRANDS) else bisect.bisect(brand_weights, rng.random() * brand_weights[-1])
+        brand, category, manufacturer = brands[min(index, len(brands) - 1)]
+        atc4, molecules, (low, high), rx_share = CATEGORIES[category]
+        country_id, country = countries[rng.randrange(len(countries))][:2]
+        product_id = f"SP{i + 1:07d}"
+        form = rng.choice(FORMS)
+        strength = f"{rng.choice([5, 10, 20, 25, 50, 100, 200, 250, 400, 500])}MG"
+        pack_size = rng.choice([10, 12, 16, 20, 24, 30, 50, 100])
+        rx = rng.random() < rx_share
+        price = round(rng.uniform(low, high), 2)
+        launch = datetime.date(rng.randint(1995, cfg.start_year + cfg.years - 1), rng.randint(1, 12), 1).isoformat()
+        product = f"{brand} {form}"
+        pack = f"{brand} {strength} {form} x{pack_size}"
+        molecule = rng.choice(molecules)
+        out.add("DIM_SOURCE_PRODUCT", (product_id, brand, category, product, pack, strength, str(pack_size), manufacturer,
+                                       manufacturer.replace(" Pharma", " Group"), country, atc4, molecule,
+                                       "RX" if rx else "OTC", "GENERIC" if rng.random() < 0.25 else "BRANDED",
+                                       launch, 1, int(rng.random() < 0.01), INSERTED_TS))
+        for market_id, market_name in rng.sample(markets.get(category, []), k=min(2, len(markets.get(category, [])))):
+            out.add("LNK_MARKET_PRODUCT", (f"MP{next(link_id):08d}", market_id, product_id, INSERTED_TS))
+        out.add("DIM_TRANSCODE_PRODUCT", (f"TP{i + 1:07d}", product_id, category, country, manufacturer,
+                                          manufacturer.replace(" Pharma", " Group"), product, pack, molecule, atc4,
+                                          "UNITS", pack_size, INSERTED_TS, 0))
+        products.append((product_id, country_id, price, pack_size))
+    return products
+
+# Facts
+
+def _sales_row(product_id, country_id, panel, channel_id, calendar_id, units, price, pack_size, eur, rx_share):
+    _, manufacturer_rate, trade_rate, public_rate = panel
+    value = units * price
+    return (product_id, country_id, panel[0], channel_id, calendar_id, units, units * pack_size, units,
+            round(value, 2), round(value * rx_share, 2), round(value * manufacturer_rate, 2), round(value * trade_rate, 2),
+            round(value * public_rate, 2), round(value * manufacturer_rate * eur, 2), round(value * trade_rate * eur, 2),
+            round(value * public_rate * eur, 2), INSERTED_TS, 0)
+
+def generate_sales(cfg: GeneratorConfig, out, products, panels, countries, weeks):
+    """
+    Weekly sales series, each rolled up into monthly and quarterly rows as it is generated,
+    so the three grains always agree. Some series also produce regional and distribution rows.
+    """
+    rng = cfg.rng("sales")
+    eur = {c[0]: c[5] for c in countries}
+    product_weights = list(itertools.accumulate(1 / (rank + 1) ** 0.6 for rank in range(len(products))))
+    subnat_id, distribution_id = itertools.count(1), itertools.count(1)
+    regions = REGIONS[:cfg.subnat_regions]
+
+    for _ in range(cfg.scaled(cfg.series)):
+        product_id, country_id, price, pack_size = products[bisect.bisect(product_weights, rng.random() * product_weights[-1])]
+        panel = rng.choice(panels[country_id])
+        channel_id = rng.choice(CHANNEL_TYPES)[0]
+        base = rng.lognormvariate(3.5, 1.0)  # typical weekly units
+        trend = rng.gauss(0.0, 0.004)
+        phase = rng.uniform(0, 2 * math.pi)
+        start = rng.randrange(len(weeks) // 2) if rng.random() < 0.2 else 0  # late launches
+        rx_share = rng.choice([0.0, 0.0, 0.3, 0.9])
+        with_subnat = rng.random() < cfg.subnat_share
+        with_distribution = rng.random() < cfg.distribution_share
+
+        monthly: Dict[str, float] = {}
+        quarterly: Dict[str, float] = {}
+        for t, (week_id, month_id, quarter_id) in enumerate(weeks[start:], start):
+            seasonal = 1 + 0.25 * math.sin(2 * math.pi * t / 52 + phase)
+            units = max(0, int(rng.gauss(base * seasonal * math.exp(trend * t), base * 0.15)))
+            if units == 0:
+                continue
+            out.add("FCT_SALES_NATIONAL_WK", _sales_row(product_id, country_id, panel, channel_id, week_id, units, price, pack_size,
+                                                        eur[country_id], rx_share))
+            monthly[month_id] = monthly.get(month_id, 0) + units
+            quarterly[quarter_id] = quarterly.get(quarter_id, 0) + units
+
+        for month_id, units in monthly.items():
+            out.add("FCT_SALES_NATIONAL_MTH", _sales_row(product_id, country_id, panel, channel_id, month_id, units, price, pack_size,
+                                                         eur[country_id], rx_share))
+            if with_subnat:
+                shares = [rng.random() + 0.2 for _ in regions]
+                for region, share in zip(regions, shares):
+                    region_units = round(units * share / sum(shares))
+                    out.add("FCT_SUB_NATIONAL", (f"SN{next(subnat_id):09d}", product_id, country_id, f"{country_id}-{region}",
+                                                 panel[0], month_id, "MONTHLY", channel_id, region_units,
+                                                 round(region_units * price, 2), INSERTED_TS, 0))
+            if with_distribution:
+                numeric = min(100.0, max(1.0, rng.gauss(40 + math.log1p(units) * 5, 8)))
+                out.add("FCT_DISTRIBUTION", (f"DS{next(distribution_id):09d}", country_id, panel[0], channel_id, product_id,
+                                             "MONTHLY", "NATIONAL", month_id, round(numeric, 1),
+                                             round(min(100.0, numeric * rng.uniform(1.0, 1.3)), 1), INSERTED_TS, 0))
+        for quarter_id, units in quarterly.items():
+            out.add("FCT_SALES_NATIONAL_QTR", _sales_row(product_id, country_id, panel, channel_id, quarter_id, units, price, pack_size,
+                                                         eur[country_id], rx_share))
+
+def generate(cfg: GeneratorConfig, out, build_indexes: bool = True) -> Dict[str, int]:
+    started = time.perf_counter()
+    weeks, months = generate_calendar(cfg, out)
+    countries, panels = generate_geography(cfg, out, months)
+    brands = generate_brands(cfg)
+    products = generate_products(cfg, out, brands, countries)
+    print(f"Dimensions ready: {len(products)} products, {len(brands)} brands, {len(countries)} countries")
+    generate_sales(cfg, out, products, panels, countries, weeks)
+    print(f"Facts generated in {time.perf_counter() - started:.1f}s, finishing load...")
+    out.close(build_indexes)
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    return out.counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=os.path.join(os.path.dirname(__file__), "mock_snowflake_large.db"))
+    parser.add_argument("--format", choices=["sqlite", "csv"], default="sqlite")
+    parser.add_argument("--seed", type=int, default=GeneratorConfig.seed)
+    parser.add_argument("--scale", type=float, default=GeneratorConfig.scale, help="multiplies products, brands and sales series")
+    parser.add_argument("--years", type=int, default=GeneratorConfig.years)
+    parser.add_argument("--countries", type=int, default=GeneratorConfig.countries)
+    parser.add_argument("--batch-size", type=int, default=GeneratorConfig.batch_size)
+    parser.add_argument("--no-indexes", action="store_true", help="skip the post-load secondary indexes")
+    args = parser.parse_args()
+
+    cfg = GeneratorConfig(seed=args.seed, scale=args.scale, years=args.years, countries=args.countries, batch_size=args.batch_size)
+    if args.format == "csv":
+        out = CsvWriter(args.output)
+    else:
+        out = SqliteWriter(args.output, cfg.batch_size, cfg.commit_every)
+    counts = generate(cfg, out, build_indexes=not args.no_indexes)
+    for table, count in sorted(counts.items()):
+        print(f"  {table}: {count:,} rows")
+    print("Output written to", args.output)
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,10 @@ import os
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "mock_snowflake.db")
 
-def create_db():
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Enable foreign keys
-    cursor.execute("PRAGMA foreign_keys = ON;")
-
+def create_tables(cursor):
+    """
+    Creates the warehouse tables (shared with generate_mock_data.py).
+    """
     print("Creating tables...")
 
     # DIM_SOURCE_PRODUCT
@@ -405,6 +399,18 @@ def create_db():
     """)
 
     print("Tables created successfully.")
+
+def create_db(path: str = DB_PATH):
+    if os.path.exists(path):
+        os.remove(path)
+    
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+
+    # Enable foreign keys
+    cursor.execute("PRAGMA foreign_keys = ON;")
+
+    create_tables(cursor)
     
     # Optional: Insert some dummy data
     print("Inserting dummy data...")
@@ -440,7 +446,7 @@ def create_db():
     
     conn.commit()
     conn.close()
-    print("Database initialized at", DB_PATH)
+    print("Database initialized at", path)
 
 if __name__ == "__main__":
     create_db()
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+from database.init_mock_db import create_db
+
+# Offline: the LLM factory falls back to its mock model
+os.environ.setdefault("ANTHROPIC_API_KEY", "mock-ant-key")
+
+# The app's warehouse for this run, built fresh so tests never touch database/mock_snowflake.db
+if "WAREHOUSE_DB_PATH" not in os.environ:
+    os.environ["WAREHOUSE_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="datapella-tests-"), "mock_snowflake.db")
+    create_db(os.environ["WAREHOUSE_DB_PATH"])
+
+from app.services.rollups import SALES_MEASURES
+
+@pytest.fixture
+def sales_db(tmp_path):
+    """
+    Small warehouse with the mock schema's shape: a product dimension and monthly sales.
+    """
+    path = str(tmp_path / "sales.db")
+    conn = sqlite3.connect(path)
+    measures = ", ".join(f"{m} REAL" for m in SALES_MEASURES)
+    conn.executescript(f"""
+        CREATE TABLE DIM_SOURCE_PRODUCT (SOURCE_PRODUCT_ID INTEGER PRIMARY KEY, PRODUCT_BRAND TEXT, CATEGORY_NM TEXT);
+        CREATE TABLE FCT_SALES_NATIONAL_MTH (SOURCE_PRODUCT_ID INTEGER, COUNTRY_ID TEXT, CALENDAR_ID INTEGER, {measures});
+    """)
+    products = [(1, "Allegra", "Allergy"), (2, "Doliprane", "Pain"), (3, "Advil", "Pain"), (4, None, "Pain")]
+    conn.executemany("INSERT INTO DIM_SOURCE_PRODUCT VALUES (?, ?, ?)", products)
+    sales = [
+        (product, country, calendar, float(product * 100 + calendar % 7), product + calendar % 3)
+        for product in (1, 2, 3, 4) for country in ("FR", "DE") for calendar in range(20210101, 20210107)
+    ]
+    sales.append((2, None, 20210105, None, None))
+    conn.executemany(
+        "INSERT INTO FCT_SALES_NATIONAL_MTH (SOURCE_PRODUCT_ID, COUNTRY_ID, CALENDAR_ID, VALUE_LC, QTY_UNITS) VALUES (?, ?, ?, ?, ?)",
+        sales,
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.fixture
+def mock_warehouse(tmp_path):
+    """
+    The full mock warehouse schema (all tables and foreign keys) with its sample rows.
+    """
+    path = str(tmp_path / "warehouse.db")
+    create_db(path)
+    return path
@@ -0,0 +1,52 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from app.agents import graph
+
+class SlowLLM:
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(0.2)
+        return SimpleNamespace(content="SELECT COUNT(*) FROM DIM_SOURCE_PRODUCT")
+
+def test_llm_calls_of_concurrent_questions_overlap(monkeypatch):
+    async def schema(question=None):
+        return "DIM_SOURCE_PRODUCT(PRODUCT_BRAND)"
+
+    monkeypatch.setattr(graph.snowflake_service, "aget_schema_info", schema)
+    monkeypatch.setattr(graph.llm_factory, "create_llm", lambda *args: SlowLLM())
+    monkeypatch.setattr(graph.settings, "QUERY_COST_GUARD_ENABLED", False)
+
+    async def run():
+        started = time.perf_counter()
+        sqls = await asyncio.gather(*(graph.generate_sql(f"question {i}") for i in range(5)))
+        return sqls, time.perf_counter() - started
+
+    sqls, elapsed = asyncio.run(run())
+    assert sqls == ["SELECT COUNT(*) FROM DIM_SOURCE_PRODUCT"] * 5
+    assert elapsed < 0.6  # five 0.2 s calls, not one after another
+
+def test_blocking_queries_run_off_the_event_loop(monkeypatch):
+    def slow_query(query, token=None):
+        time.sleep(0.3)
+        return [(1,)]
+
+    monkeypatch.setattr(graph.snowflake_service, "execute_query", slow_query)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        result = await graph.snowflake_service.aexecute_query("SELECT 1")
+        task.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(run())
+    assert result == [(1,)]
+    assert ticks >= 10  # the loop kept running while SQLite was busy
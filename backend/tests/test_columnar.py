@@ -0,0 +1,58 @@
+import sqlite3
+
+import pytest
+
+from app.services.columnar import ColumnarEngine, _tokenize
+
+QUERIES = [
+    "SELECT COUNT(*) AS \"Brand Count\" FROM DIM_SOURCE_PRODUCT",
+    "SELECT \"PRODUCT_BRAND\", COUNT(*) AS N FROM DIM_SOURCE_PRODUCT GROUP BY \"PRODUCT_BRAND\" ORDER BY N DESC, \"PRODUCT_BRAND\"",
+    "SELECT SUM(VALUE_LC) AS TOTAL_SALES FROM FCT_SALES_NATIONAL_MTH",
+    "SELECT p.PRODUCT_BRAND, SUM(s.VALUE_LC) AS TOTAL_SALES FROM FCT_SALES_NATIONAL_MTH s "
+    "JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID GROUP BY p.PRODUCT_BRAND ORDER BY TOTAL_SALES DESC",
+    "SELECT p.CATEGORY_NM, COUNT(s.VALUE_LC) AS N, AVG(s.QTY_UNITS) AS AVG_UNITS FROM FCT_SALES_NATIONAL_MTH s "
+    "JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID WHERE s.CALENDAR_ID BETWEEN 20210103 AND 20210108 "
+    "GROUP BY p.CATEGORY_NM ORDER BY p.CATEGORY_NM",
+    "SELECT MIN(VALUE_LC) AS LO, MAX(VALUE_LC) AS HI FROM FCT_SALES_NATIONAL_MTH WHERE SOURCE_PRODUCT_ID IN (1, 3)",
+    "SELECT COUNT(*) AS N, SUM(VALUE_LC) AS TOTAL FROM FCT_SALES_NATIONAL_MTH WHERE CALENDAR_ID > 20990101",
+]
+
+def normalized(rows):
+    return [tuple(round(v, 6) if isinstance(v, float) else v for v in row) for row in rows]
+
+@pytest.fixture
+def engine_and_conn(sales_db):
+    conn = sqlite3.connect(sales_db)
+    counts = lambda c: {"DIM_SOURCE_PRODUCT": 4, "FCT_SALES_NATIONAL_MTH": 49}
+    yield ColumnarEngine(lambda: 1, row_counts=counts, min_rows=0), conn
+    conn.close()
+
+def test_tokenize_quoted_identifiers():
+    tokens = _tokenize('SELECT COUNT(*) AS "Brand ""Count""" FROM [T]')
+    assert ("quoted", 'Brand "Count"') == tokens[6][:2]
+    assert ("quoted", "T") == tokens[8][:2]
+    assert tokens[6][2] == len("SELECT COUNT(*) AS ")
+
+@pytest.mark.parametrize("sql", QUERIES)
+def test_columnar_matches_sqlite(engine_and_conn, sql):
+    engine, conn = engine_and_conn
+    plan = engine.plan(conn, sql)
+    assert plan is not None, "query should run on the columnar engine"
+    result = engine.execute(conn, plan)
+    cursor = conn.execute(sql)
+    assert list(result.columns) == [d[0] for d in cursor.description]
+    assert normalized(result.rows) == normalized(cursor.fetchall())
+
+def test_plan_declines_unsupported_queries(engine_and_conn):
+    engine, conn = engine_and_conn
+    assert engine.plan(conn, "SELECT PRODUCT_BRAND FROM DIM_SOURCE_PRODUCT UNION SELECT 'x'") is None
+    assert engine.plan(conn, "SELECT COUNT(*) FROM NO_SUCH_TABLE") is None
+
+def test_plan_falls_back_on_planner_errors(engine_and_conn, monkeypatch):
+    engine, conn = engine_and_conn
+
+    def broken(sql):
+        raise IndexError("planner bug")
+
+    monkeypatch.setattr("app.services.columnar.parse_aggregate", broken)
+    assert engine.plan(conn, QUERIES[0]) is None
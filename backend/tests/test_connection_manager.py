@@ -0,0 +1,91 @@
+import asyncio
+
+from app.api.endpoints import ConnectionManager
+
+class FakeWebSocket:
+    """
+    Records what was sent; a blocked socket never finishes a send, like a stalled client.
+    """
+
+    def __init__(self, blocked: bool = False):
+        self.sent = []
+        self.blocked = blocked
+        self.close_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.blocked:
+            await asyncio.Event().wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+def test_messages_reach_only_their_own_session_in_order():
+    async def run():
+        manager = ConnectionManager(max_queue=8, send_timeout=1.0)
+        a, b = FakeWebSocket(), FakeWebSocket()
+        sid_a, sid_b = await manager.connect(a), await manager.connect(b)
+        for i in range(3):
+            assert await manager.send(sid_a, f"a{i}")
+        assert await manager.send(sid_b, "b0")
+        await asyncio.sleep(0.01)
+        await manager.disconnect(sid_a)
+        assert not await manager.send(sid_a, "late")
+        await manager.disconnect(sid_b)
+        return a.sent, b.sent
+
+    assert asyncio.run(run()) == (["a0", "a1", "a2"], ["b0"])
+
+def test_stalled_client_is_dropped_without_delaying_others():
+    async def run():
+        manager = ConnectionManager(max_queue=2, send_timeout=0.05)
+        slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+        sid_slow, sid_fast = await manager.connect(slow), await manager.connect(fast)
+        # One message is stuck in the writer, two fill the queue, the next waits then drops.
+        results = [await manager.send(sid_slow, f"s{i}") for i in range(4)]
+        assert await manager.send(sid_fast, "f0")
+        await asyncio.sleep(0.01)
+        stats = manager.stats()
+        await manager.disconnect(sid_fast)
+        return results, slow, fast, stats
+
+    results, slow, fast, stats = asyncio.run(run())
+    assert results == [True, True, True, False]
+    assert slow.close_code == 1013 and slow.sent == []
+    assert fast.sent == ["f0"]
+    assert stats == {"active_connections": 1, "queued_messages": 0, "dropped_connections": 1}
+
+def test_broadcast_drops_full_queues_immediately():
+    async def run():
+        manager = ConnectionManager(max_queue=1, send_timeout=10.0)
+        slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+        await manager.connect(slow)
+        sid_fast = await manager.connect(fast)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for i in range(3):
+            await manager.broadcast(f"m{i}")
+            await asyncio.sleep(0.01)
+        elapsed = loop.time() - started
+        await manager.disconnect(sid_fast)
+        return elapsed, manager.dropped, slow, fast
+
+    elapsed, dropped, slow, fast = asyncio.run(run())
+    assert elapsed < 1.0  # never waited out send_timeout
+    assert dropped == 1 and slow.close_code == 1013
+    assert fast.sent == ["m0", "m1", "m2"]
+
+def test_disconnect_with_drain_flushes_queued_messages():
+    async def run():
+        manager = ConnectionManager(max_queue=8, send_timeout=1.0)
+        ws = FakeWebSocket()
+        sid = await manager.connect(ws)
+        for i in range(5):
+            await manager.send(sid, f"m{i}")
+        await manager.disconnect(sid, drain=True)
+        return ws.sent, manager.stats()["active_connections"]
+
+    assert asyncio.run(run()) == ([f"m{i}" for i in range(5)], 0)
@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+from app.services.connection_pool import PoolExhaustedError, SQLiteConnectionPool
+
+@pytest.fixture
+def pool(sales_db):
+    pool = SQLiteConnectionPool(sales_db, max_size=1, timeout=0.5)
+    yield pool
+    pool.close()
+
+def hold(pool, seconds):
+    # Keeps the only connection checked out from another thread for `seconds`
+    taken = threading.Event()
+
+    def run():
+        with pool.connection():
+            taken.set()
+            time.sleep(seconds)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    taken.wait()
+    return thread
+
+def test_connections_are_reused_and_read_only(pool):
+    with pool.connection() as first:
+        assert first.execute("SELECT COUNT(*) FROM DIM_SOURCE_PRODUCT").fetchone() == (4,)
+        with pytest.raises(Exception):
+            first.execute("DELETE FROM DIM_SOURCE_PRODUCT")
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert stats["checkouts"] == 2 and stats["size"] == 1 and stats["in_use"] == 0
+
+def test_checkout_waits_for_a_release_then_times_out(pool):
+    holder = hold(pool, 0.1)
+    with pool.connection():
+        assert pool.stats()["in_use"] == 1
+    holder.join()
+    assert pool.stats()["waits"] == 1
+
+    holder = hold(pool, 1.0)
+    with pytest.raises(PoolExhaustedError):
+        with pool.connection():
+            pass
+    holder.join()
+    assert pool.stats()["timeouts"] == 1
+
+def test_pool_usage_is_exported_on_metrics():
+    from app.services.metrics import metrics
+    from app.services.snowflake_service import snowflake_service
+    before = snowflake_service.pool.stats()["checkouts"]
+    with snowflake_service.pool.connection():
+        lines = metrics.render().splitlines()
+    assert f"datapella_sqlite_pool_checkouts_total {before + 1}" in lines
+    assert "datapella_sqlite_pool_in_use 1" in lines
+    assert "# TYPE datapella_sqlite_pool_timeouts_total counter" in lines
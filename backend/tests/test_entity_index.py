@@ -0,0 +1,94 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from app.services.entity_index import EntityIndex, EntitySource
+
+SOURCES = (
+    EntitySource("brand", "DIM_SOURCE_PRODUCT", "PRODUCT_BRAND"),
+    EntitySource("country", "DIM_COUNTRY", "COUNTRY"),
+    EntitySource("country", "DIM_COUNTRY", "COUNTRY_SHORT_CD", fuzzy=False, code=True),
+)
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "dims.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE DIM_SOURCE_PRODUCT (SOURCE_PRODUCT_ID TEXT, PRODUCT_BRAND TEXT);
+        CREATE TABLE DIM_COUNTRY (COUNTRY_ID TEXT, COUNTRY TEXT, COUNTRY_SHORT_CD TEXT);
+        INSERT INTO DIM_SOURCE_PRODUCT VALUES ('SP1', 'Allegra'), ('SP2', 'Claritin'), ('SP3', 'Clarinex'), ('SP4', 'Top');
+        INSERT INTO DIM_COUNTRY VALUES ('US', 'United States', 'US'), ('FR', 'France', 'FR');
+    """)
+    conn.commit()
+    version = [1]
+
+    @contextmanager
+    def connect():
+        reader = sqlite3.connect(path)
+        try:
+            yield reader
+        finally:
+            reader.close()
+
+    columns = lambda table: [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+    entity_index = EntityIndex(connect, fingerprint=lambda: version[0], columns=columns, sources=SOURCES, check_interval=0)
+    entity_index.refresh()
+    yield entity_index, conn, version
+    conn.close()
+
+def resolved(entity_index, text):
+    return [(m.type, m.value, m.text, m.score) for m in entity_index.resolve(text)]
+
+def test_exact_and_typo_matches(index):
+    entity_index, _, _ = index
+    assert resolved(entity_index, "sales of Allegra in United States") == [
+        ("brand", "Allegra", "Allegra", 1.0), ("country", "United States", "United States", 1.0),
+    ]
+    [(kind, value, text, score)] = resolved(entity_index, "sales of Alegra")
+    assert (kind, value, text) == ("brand", "Allegra", "Alegra")
+    assert entity_index.min_score <= score < 1.0
+
+def test_prefix_completion_only_when_unique(index):
+    entity_index, _, _ = index
+    assert resolved(entity_index, "sales of clarit") == [("brand", "Claritin", "clarit", 0.8)]
+    assert resolved(entity_index, "sales of clar") == []  # Claritin or Clarinex
+
+def test_codes_match_verbatim(index):
+    entity_index, _, _ = index
+    assert resolved(entity_index, "sales in US") == [("country", "US", "US", 1.0)]
+    assert resolved(entity_index, "tell us about Francee") == [("country", "France", "Francee", 0.857)]
+
+def test_stopword_only_spans_never_match(index):
+    entity_index, _, _ = index
+    assert resolved(entity_index, "top brands") == []
+
+def assert_consistent(entity_index):
+    assert entity_index._sorted_keys == sorted(entity_index._key_grams)
+    for key, grams in entity_index._key_grams.items():
+        assert all(key in entity_index._postings[gram] for gram in grams)
+    for gram, keys in entity_index._postings.items():
+        assert keys and all(gram in entity_index._key_grams[key] for key in keys)
+
+def test_refresh_applies_inserts_and_deletes(index):
+    entity_index, conn, version = index
+    assert_consistent(entity_index)
+
+    conn.execute("INSERT INTO DIM_SOURCE_PRODUCT VALUES ('SP5', 'Claridryl')")
+    conn.commit()
+    version[0] = 2
+    assert entity_index.refresh()
+    assert "claridryl" in entity_index._sorted_keys
+    assert resolved(entity_index, "sales of Claridryl") == [("brand", "Claridryl", "Claridryl", 1.0)]
+    assert_consistent(entity_index)
+
+    conn.execute("DELETE FROM DIM_SOURCE_PRODUCT WHERE PRODUCT_BRAND IN ('Claridryl', 'Clarinex')")
+    conn.commit()
+    version[0] = 3
+    assert entity_index.refresh()
+    assert "claridryl" not in entity_index._sorted_keys and "clarinex" not in entity_index._key_grams
+    assert_consistent(entity_index)
+    # Claritin is now the only "clar..." brand
+    assert resolved(entity_index, "sales of clar") == [("brand", "Claritin", "clar", 0.8)]
+    assert entity_index.stats()["removed"] == 2
@@ -0,0 +1,34 @@
+import hashlib
+import sqlite3
+
+from database import generate_mock_data as gen
+
+def build(path, seed):
+    cfg = gen.GeneratorConfig(seed=seed, scale=0.005, years=1, countries=2)
+    return gen.generate(cfg, gen.SqliteWriter(str(path), cfg.batch_size, cfg.commit_every))
+
+def checksums(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")]
+        sums = {}
+        for table in tables:
+            digest = hashlib.sha256()
+            for row in conn.execute(f"SELECT * FROM {table} ORDER BY rowid"):
+                digest.update(repr(row).encode())
+            sums[table] = digest.hexdigest()
+        return sums
+    finally:
+        conn.close()
+
+def test_same_seed_produces_identical_data(tmp_path):
+    first, second = build(tmp_path / "a.db", seed=7), build(tmp_path / "b.db", seed=7)
+    assert first == second
+    assert len(first) == 14 and all(first.values())
+    assert checksums(tmp_path / "a.db") == checksums(tmp_path / "b.db")
+
+def test_different_seeds_produce_different_data(tmp_path):
+    build(tmp_path / "a.db", seed=7)
+    build(tmp_path / "b.db", seed=8)
+    a, b = checksums(tmp_path / "a.db"), checksums(tmp_path / "b.db")
+    assert a["FCT_SALES_NATIONAL_WK"] != b["FCT_SALES_NATIONAL_WK"]
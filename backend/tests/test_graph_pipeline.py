@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.agents import graph
+
+def recording_pipeline(events, delay=0.1):
+    """
+    PIPELINE's dependency declaration with every node replaced by a timed stub.
+    """
+    def stub(name):
+        async def node(state):
+            events.append((name, "start", time.monotonic()))
+            await asyncio.sleep(delay)
+            events.append((name, "end", time.monotonic()))
+            return {"cache_status": {name: "ran"}}
+        return node
+    return {name: (stub(name), deps) for name, (_, deps) in graph.PIPELINE.items()}
+
+def test_analysis_nodes_run_in_parallel_and_join_at_merger():
+    events = []
+    compiled = graph.build_workflow(recording_pipeline(events)).compile()
+    inputs = {"messages": [HumanMessage(content="hi")], "user_query": "hi", "cache_status": {}}
+
+    state = asyncio.run(compiled.ainvoke(inputs))
+    at = {(name, kind): t for name, kind, t in events}
+    assert [name for name, kind, _ in events if kind == "start"].count("merger") == 1
+    # Both analysis branches start before either finishes
+    assert max(at["chart_recommender", "start"], at["data_analyst", "start"]) < min(
+        at["chart_recommender", "end"], at["data_analyst", "end"])
+    assert at["merger", "start"] >= max(at["chart_recommender", "end"], at["data_analyst", "end"])
+    assert at["chart_recommender", "start"] >= at["sql_executor", "end"]
+    assert set(state["cache_status"]) == set(graph.PIPELINE)
+
+def test_unknown_dependencies_are_rejected():
+    pipeline = {"a": (None, []), "b": (None, ["a", "missing"])}
+    with pytest.raises(ValueError, match="unknown nodes: \\['missing'\\]"):
+        graph.build_workflow(pipeline)
+
+def test_cycles_are_rejected():
+    pipeline = {"a": (None, []), "b": (None, ["a", "c"]), "c": (None, ["b"])}
+    with pytest.raises(ValueError, match="Cyclic node dependencies: \\['b', 'c'\\]"):
+        graph.build_workflow(pipeline)
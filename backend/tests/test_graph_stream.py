@@ -0,0 +1,37 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import END, StateGraph
+
+from app.agents import graph
+
+def parallel_graph():
+    """
+    Two nodes in the same step both writing reducer-annotated keys of AgentState.
+    """
+    workflow = StateGraph(graph.AgentState)
+    workflow.add_node("start", lambda state: {"cache_status": {"sql": "miss"}, "messages": [AIMessage(content="start")]})
+    workflow.add_node("chart", lambda state: {"cache_status": {"chart": "hit"}, "messages": [AIMessage(content="chart")]})
+    workflow.add_node("analyst", lambda state: {"cache_status": {"analysis": "miss"}, "final_response": "done"})
+    workflow.set_entry_point("start")
+    workflow.add_edge("start", "chart")
+    workflow.add_edge("start", "analyst")
+    workflow.add_edge("chart", END)
+    workflow.add_edge("analyst", END)
+    return workflow.compile()
+
+def test_streamed_state_matches_invoke(monkeypatch):
+    compiled = parallel_graph()
+    monkeypatch.setattr(graph, "app_graph", compiled)
+    inputs = {"messages": [HumanMessage(content="hi")], "user_query": "hi", "cache_status": {}}
+
+    async def run():
+        nodes, state = [], None
+        async for node, _, state in graph.astream_with_state(inputs):
+            nodes.append(node)
+        return nodes, state, await compiled.ainvoke(inputs)
+
+    nodes, streamed, invoked = asyncio.run(run())
+    assert sorted(nodes) == ["analyst", "chart", "start"]
+    assert streamed == invoked
+    assert streamed["cache_status"] == {"sql": "miss", "chart": "hit", "analysis": "miss"}
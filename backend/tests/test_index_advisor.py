@@ -0,0 +1,119 @@
+import contextlib
+import sqlite3
+
+import pytest
+
+from app.services.index_advisor import IndexAdvisor, IndexCandidate, WorkloadEntry, workload_entries
+from app.services.workload import QueryRecord
+
+WORKLOAD_SQL = (
+    "SELECT p.PRODUCT_BRAND, SUM(f.VALUE_LC) FROM FCT_SALES_NATIONAL_MTH f "
+    "JOIN DIM_SOURCE_PRODUCT p ON f.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID "
+    "WHERE f.COUNTRY_ID = 'FR' AND f.CALENDAR_ID >= 20210101 GROUP BY p.PRODUCT_BRAND"
+)
+
+class RecordingConnection(sqlite3.Connection):
+    """
+    Keeps every statement passed to execute() (the trace callback skips EXPLAIN).
+    """
+    statements = None
+
+    def execute(self, sql, *args):
+        self.statements.append(sql)
+        return super().execute(sql, *args)
+
+@pytest.fixture
+def advisor(mock_warehouse):
+    statements, changes = [], []
+
+    @contextlib.contextmanager
+    def connect():
+        conn = sqlite3.connect(mock_warehouse)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def connect_rw():
+        conn = sqlite3.connect(mock_warehouse, factory=RecordingConnection)
+        conn.statements = statements
+        return conn
+
+    def columns(table):
+        with connect() as conn:
+            return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+    advisor = IndexAdvisor(connect, connect_rw, columns, on_change=changes.append)
+    advisor.statements, advisor.changes, advisor.path = statements, changes, mock_warehouse
+    return advisor
+
+def schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_master ORDER BY name").fetchall()
+    finally:
+        conn.close()
+
+def test_column_usage_classifies_filters_joins_and_grouping(advisor):
+    usage = advisor.column_usage(WORKLOAD_SQL)
+    fact, product = usage["FCT_SALES_NATIONAL_MTH"], usage["DIM_SOURCE_PRODUCT"]
+    assert fact.equality == {"COUNTRY_ID"} and fact.ranges == {"CALENDAR_ID"}
+    assert fact.joins == product.joins == {"SOURCE_PRODUCT_ID"}
+    assert product.group_by == {"PRODUCT_BRAND"}
+    assert fact.referenced == {"COUNTRY_ID", "CALENDAR_ID", "SOURCE_PRODUCT_ID", "VALUE_LC"}
+
+def test_literals_and_unknown_columns_are_ignored(advisor):
+    usage = advisor.column_usage("SELECT * FROM DIM_COUNTRY WHERE COUNTRY = 'X.COUNTRY_ID = 1' AND NOPE = 3")
+    assert usage["DIM_COUNTRY"].equality == {"COUNTRY"}
+    assert usage["DIM_COUNTRY"].referenced == {"COUNTRY"}
+
+def test_candidates_put_equality_and_join_columns_before_one_range(advisor):
+    candidates = [c for c in advisor.candidates(WORKLOAD_SQL) if c.table == "FCT_SALES_NATIONAL_MTH"]
+    assert [c.columns for c in candidates] == [
+        ("COUNTRY_ID", "SOURCE_PRODUCT_ID", "CALENDAR_ID"),
+        ("SOURCE_PRODUCT_ID",),
+        ("COUNTRY_ID", "SOURCE_PRODUCT_ID", "CALENDAR_ID", "VALUE_LC"),
+    ]
+    assert IndexCandidate("T", ("A", "B")).covered_by(("A", "B", "C"))
+    assert not IndexCandidate("T", ("A", "B")).covered_by(("B", "A"))
+
+def test_recommend_tests_each_candidate_in_a_rolled_back_transaction(advisor):
+    before = schema(advisor.path)
+    recommendations = advisor.recommend([WorkloadEntry(WORKLOAD_SQL, executions=10, total_s=2.0)])
+
+    assert [(r.candidate.table, r.candidate.columns) for r in recommendations] == [
+        ("FCT_SALES_NATIONAL_MTH", ("COUNTRY_ID", "SOURCE_PRODUCT_ID", "CALENDAR_ID", "VALUE_LC")),
+    ]
+    assert recommendations[0].statements == [WORKLOAD_SQL] and recommendations[0].workload_s == 2.0
+    assert schema(advisor.path) == before
+    assert advisor.changes == []
+
+    what_if = [s.split()[0] for s in advisor.statements if not s.startswith("PRAGMA")]
+    creates = what_if.count("CREATE")
+    # DIM_SOURCE_PRODUCT(SOURCE_PRODUCT_ID) is already covered by its primary key
+    assert creates == len(advisor.candidates(WORKLOAD_SQL)) - 1
+    assert what_if.count("BEGIN") == what_if.count("ROLLBACK") == creates
+    for i, keyword in enumerate(what_if):
+        if keyword == "CREATE":
+            assert what_if[i - 1] == "BEGIN" and what_if[i + 1] == "EXPLAIN"
+
+def test_apply_and_drop_applied_report_changed_tables(advisor):
+    recommendations = advisor.recommend([WorkloadEntry(WORKLOAD_SQL, executions=1, total_s=1.0)])
+    advisor.apply(recommendations, analyze=False)
+    assert recommendations[0].candidate.name in {row[1] for row in schema(advisor.path)}
+    # An applied index covers its candidate, so it is not proposed again
+    assert advisor.recommend([WorkloadEntry(WORKLOAD_SQL, executions=1, total_s=1.0)]) == []
+
+    assert advisor.drop_applied() == [recommendations[0].candidate.name]
+    assert advisor.changes == [["FCT_SALES_NATIONAL_MTH"], ["FCT_SALES_NATIONAL_MTH"]]
+    assert advisor.drop_applied() == [] and len(advisor.changes) == 2
+
+def test_workload_entries_group_by_canonical_sql():
+    records = [
+        QueryRecord("SELECT 1  FROM T", 0.5, 1, 0.0),
+        QueryRecord("SELECT 1\n FROM T;", 0.25, 1, 0.0),
+        QueryRecord("SELECT 2 FROM T", 1.0, 1, 0.0),
+    ]
+    entries = workload_entries(records)
+    assert [(e.executions, e.total_s) for e in entries] == [(1, 1.0), (2, 0.75)]
+    assert entries[1].mean_s == 0.375
@@ -0,0 +1,32 @@
+import json
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROVIDER_SDKS = ("langchain_aws", "langchain_anthropic")
+
+def loaded_after(code: str):
+    """
+    Provider SDK modules loaded once `code` has run in a fresh interpreter.
+    """
+    script = f"import json, sys\n{code}\nprint(json.dumps([m for m in {PROVIDER_SDKS!r} if m in sys.modules]))"
+    env = dict(os.environ, ANTHROPIC_API_KEY="mock-ant-key")
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def test_importing_the_factory_loads_no_provider_sdk():
+    assert loaded_after("import app.services.llm_factory") == []
+
+def test_importing_the_app_loads_no_provider_sdk():
+    assert loaded_after("import app.main") == []
+
+def test_only_the_configured_provider_is_imported():
+    for provider, expected in (("mock", []), ("anthropic", ["langchain_anthropic"])):
+        code = (
+            "from app.services.llm_factory import llm_factory\n"
+            f"llm_factory.resolve_provider = lambda: {provider!r}\n"
+            "llm_factory.create_llm()"
+        )
+        assert loaded_after(code) == expected
@@ -0,0 +1,30 @@
+from app.services.llm_factory import LLMFactory, llm_factory
+from app.services.metrics import metrics
+
+def test_mock_clients_are_not_shared(monkeypatch):
+    factory = LLMFactory()
+    monkeypatch.setattr(factory, "resolve_provider", lambda: "mock")
+    first, second = factory.create_llm(), factory.create_llm()
+    assert first is not second
+    # Each request's mock starts from the first scripted response
+    assert first.invoke("hi").content == second.invoke("hi").content
+    assert factory.stats()["cached_clients"] == 0
+
+def test_real_clients_are_cached_and_evicted(monkeypatch):
+    factory = LLMFactory()
+    monkeypatch.setattr(factory, "resolve_provider", lambda: "openai")
+    monkeypatch.setattr(factory, "_build_llm", lambda provider, model_id: LLMFactory()._build_llm("mock", model_id))
+    assert factory.create_llm("m1") is factory.create_llm("m1")
+    assert factory.evict(provider="openai") == 1
+    stats = factory.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["cached_clients"]) == (1, 1, 1, 0)
+    assert set(stats["construction_times_s"]) == {"openai:m1"}
+
+def test_client_cache_is_exported_on_metrics(monkeypatch):
+    monkeypatch.setattr(llm_factory, "_stats", {"hits": 5, "misses": 2, "evictions": 1, "construction_time_s": 0.5})
+    monkeypatch.setattr(llm_factory, "_construction_times", {("anthropic", "claude:1"): 0.25})
+    lines = metrics.render().splitlines()
+    assert 'datapella_llm_client_cache_total{event="hit"} 5' in lines
+    assert 'datapella_llm_client_cache_total{event="eviction"} 1' in lines
+    assert 'datapella_llm_client_construction_seconds{provider="anthropic",model="claude:1"} 0.25' in lines
+    assert "# TYPE datapella_llm_clients gauge" in lines
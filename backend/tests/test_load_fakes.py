@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from app.agents import graph
+from app.services.llm_factory import llm_factory
+from benchmarks.fakes import LatencyDistribution, LatencyFakeChatModel, install_fake_llm, sql_responder
+
+SPECS = ["fixed:0.2", "uniform:0.1,0.5", "normal:0.3,0.05", "lognormal:0.3,0.5", "exp:0.3"]
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_same_seed_gives_the_same_latency_sequence(spec):
+    a, b = LatencyDistribution(spec, seed=3), LatencyDistribution(spec, seed=3)
+    sequence = [a.sample() for _ in range(200)]
+    assert sequence == [b.sample() for _ in range(200)]
+    assert all(value >= 0 for value in sequence)
+    if spec != "fixed:0.2":
+        other = LatencyDistribution(spec, seed=4)
+        assert sequence != [other.sample() for _ in range(200)]
+
+def test_distribution_parameters_shape_the_samples():
+    assert {LatencyDistribution("fixed:0.2").sample() for _ in range(10)} == {0.2}
+    uniform = [LatencyDistribution("uniform:0.1,0.5", seed=1).sample() for _ in range(100)]
+    assert all(0.1 <= value <= 0.5 for value in uniform)
+    exp = LatencyDistribution("exp:0.3", seed=1)
+    mean = sum(exp.sample() for _ in range(5000)) / 5000
+    assert 0.27 < mean < 0.33
+    with pytest.raises(ValueError, match="Unknown latency distribution 'gamma'"):
+        LatencyDistribution("gamma:1")
+
+def test_sql_responder_answers_by_quoted_question():
+    respond = sql_responder({"how many brands": "SELECT COUNT(DISTINCT PRODUCT_BRAND) FROM DIM_SOURCE_PRODUCT"})
+    assert respond('Generate a SQL query for: "how many brands"\nUsing Schema: ...').startswith("SELECT COUNT")
+    assert respond('Generate a SQL query for: "list all brands"') is None
+    assert respond("Summarize these results") is None
+
+def test_fake_model_waits_and_falls_back_to_canned_responses():
+    llm = LatencyFakeChatModel(
+        responses=["canned"], latency=0.05, distribution=LatencyDistribution("fixed:0.05"),
+        responder=sql_responder({"q": "SELECT 1"}),
+    )
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        answers = await asyncio.gather(
+            llm.ainvoke([HumanMessage(content='for: "q"')]),
+            llm.ainvoke([HumanMessage(content="something else")]),
+        )
+        return [a.content for a in answers], loop.time() - started
+
+    answers, elapsed = asyncio.run(run())
+    assert answers == ["SELECT 1", "canned"]
+    assert 0.1 <= elapsed < 0.18  # both calls slept concurrently
+
+def test_installed_fake_answers_the_sql_writer(monkeypatch):
+    sql = "SELECT COUNT(DISTINCT PRODUCT_BRAND) AS BRANDS FROM DIM_SOURCE_PRODUCT"
+    monkeypatch.setattr(llm_factory, "create_llm", llm_factory.create_llm)  # restored after the test
+    install_fake_llm(responder=sql_responder({"how many brands": sql}))
+    assert asyncio.run(graph.generate_sql("how many brands")) == sql
@@ -0,0 +1,55 @@
+import pytest
+
+from app.services.metrics import Counter, Histogram, Metric, MetricsRegistry
+
+def test_metric_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        Metric("datapella_x", "x")
+
+def test_counter_renders_sorted_escaped_series():
+    registry = MetricsRegistry()
+    counter = registry.counter("datapella_requests_total", "Questions answered", ("status",))
+    counter.inc(status="ok")
+    counter.inc(2, status="ok")
+    counter.inc(0.5, status='bad "quote"\n')
+    assert registry.render().splitlines() == [
+        "# HELP datapella_requests_total Questions answered",
+        "# TYPE datapella_requests_total counter",
+        'datapella_requests_total{status="bad \\"quote\\"\\n"} 0.5',
+        'datapella_requests_total{status="ok"} 3',
+    ]
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("datapella_span_seconds", "Durations", ("kind",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, kind="sql")
+    assert histogram.render()[2:] == [
+        'datapella_span_seconds_bucket{kind="sql",le="0.1"} 2',
+        'datapella_span_seconds_bucket{kind="sql",le="1"} 3',
+        'datapella_span_seconds_bucket{kind="sql",le="+Inf"} 4',
+        'datapella_span_seconds_sum{kind="sql"} 3.65',
+        'datapella_span_seconds_count{kind="sql"} 4',
+    ]
+    assert histogram.count(kind="sql") == 4
+
+def test_labels_must_match_the_declared_names():
+    counter = Counter("datapella_c", "c", ("cache",))
+    with pytest.raises(ValueError):
+        counter.inc(status="hit")
+
+def test_registry_returns_existing_metric_and_rejects_conflicts():
+    registry = MetricsRegistry()
+    counter = registry.counter("datapella_c", "c", ("cache",))
+    assert registry.counter("datapella_c", "c", ("cache",)) is counter
+    with pytest.raises(ValueError):
+        registry.histogram("datapella_c", "c", ("cache",))
+
+def test_sampled_families_read_their_values_at_render_time():
+    registry = MetricsRegistry()
+    stats = {"in_use": 1}
+    registry.sampled("datapella_in_use", "Checked out", "gauge", lambda: {(): stats["in_use"]})
+    registry.sampled("datapella_events_total", "Events", "counter", lambda: {("hit",): 2, ("miss",): 1}, ("event",))
+    stats["in_use"] = 3
+    lines = registry.render().splitlines()
+    assert "# TYPE datapella_in_use gauge" in lines and "datapella_in_use 3" in lines
+    assert 'datapella_events_total{event="hit"} 2' in lines and 'datapella_events_total{event="miss"} 1' in lines
@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from app.services.partitions import PartitionManager
+
+TABLE = "FCT_SALES_NATIONAL_MTH"
+COLUMNS = ["SOURCE_PRODUCT_ID", "CALENDAR_ID", "VALUE_LC"]
+
+@pytest.fixture
+def warehouse(tmp_path):
+    """
+    Monthly sales over four years plus a row without a dated CALENDAR_ID.
+    """
+    path = str(tmp_path / "warehouse.db")
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE {TABLE} (SOURCE_PRODUCT_ID TEXT, CALENDAR_ID TEXT, VALUE_LC REAL)")
+    rows = [(str(p), f"{year}{month:02d}01", float(year - 2000 + month + p)) for p in (1, 2) for year in (2020, 2021, 2022, 2023) for month in (1, 6, 12)]
+    conn.executemany(f"INSERT INTO {TABLE} VALUES (?, ?, ?)", rows + [("1", "UNKNOWN", 1.0)])
+    conn.commit()
+    conn.close()
+    version = [1]
+    manager = PartitionManager(
+        path, str(tmp_path / "partitions"), [TABLE], fingerprint=lambda: version[0], columns=lambda table: COLUMNS if table == TABLE else [], workers=2,
+    )
+    manager.build()
+    return manager, path, version
+
+QUERIES = [
+    f"SELECT SUM(VALUE_LC) FROM {TABLE} WHERE CALENDAR_ID >= '20220101'",
+    f"SELECT COUNT(*) FROM {TABLE} s WHERE s.CALENDAR_ID BETWEEN '20210101' AND '20211231'",
+    f"SELECT CALENDAR_ID, VALUE_LC FROM {TABLE} WHERE CALENDAR_ID LIKE '2020%' ORDER BY CALENDAR_ID, VALUE_LC",
+    f"SELECT COUNT(*) FROM {TABLE} WHERE CALENDAR_ID IN ('20200101', '20230601')",
+]
+
+@pytest.mark.parametrize("sql", QUERIES)
+def test_pruned_queries_match_the_main_table(warehouse, sql):
+    manager, path, _ = warehouse
+    conn = sqlite3.connect(path)
+    rewritten = manager.rewrite(conn, sql)
+    assert rewritten != sql, "query should read only some partitions"
+    assert conn.execute(rewritten).fetchall() == conn.execute(sql).fetchall()
+    conn.close()
+
+def test_unprunable_predicates_read_the_main_table(warehouse):
+    manager, path, _ = warehouse
+    conn = sqlite3.connect(path)
+    sql = f"SELECT COUNT(*) FROM {TABLE} WHERE CALENDAR_ID >= '20230101' OR VALUE_LC > 20"
+    assert manager.rewrite(conn, sql) == sql
+    conn.close()
+
+def test_stale_partitions_are_bypassed_until_refreshed(warehouse):
+    manager, path, version = warehouse
+    conn = sqlite3.connect(path)
+    conn.execute(f"INSERT INTO {TABLE} VALUES ('3', '20230901', 100.0)")
+    conn.commit()
+    version[0] = 2
+    sql = QUERIES[0]
+    assert manager.rewrite(conn, sql) == sql
+    manager._refreshing.join(timeout=10)
+    rewritten = manager.rewrite(conn, sql)
+    assert rewritten != sql
+    assert conn.execute(rewritten).fetchall() == conn.execute(sql).fetchall()
+    conn.close()
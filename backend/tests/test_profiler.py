@@ -0,0 +1,68 @@
+import asyncio
+import json
+import time
+
+from app.services.profiler import AWAITING, PROFILE_SUFFIXES, Profiler
+
+def busy_on_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def busy_in_worker(profiler, seconds):
+    profiler.enter_thread()
+    try:
+        busy_on_loop(seconds)
+    finally:
+        profiler.leave_thread()
+
+def capture() -> Profiler:
+    profiler = Profiler(interval=0.002)
+
+    async def request():
+        profiler.start()
+        busy_on_loop(0.1)
+        await asyncio.to_thread(busy_in_worker, profiler, 0.1)
+        await asyncio.sleep(0.1)
+        profiler.stop()
+
+    asyncio.run(request())
+    return profiler
+
+def test_samples_cover_loop_workers_and_waits():
+    profiler = capture()
+    loop_stacks = profiler.samples["event loop"]
+    worker_tracks = [track for track in profiler.samples if track.startswith("worker ")]
+
+    assert any(stack and stack[-1][0] == "busy_on_loop" for stack in loop_stacks)
+    assert loop_stacks[AWAITING] > 0
+    assert len(worker_tracks) == 1
+    worker_stacks = profiler.samples[worker_tracks[0]]
+    assert all(stack[0][0] == "busy_in_worker" for stack in worker_stacks)  # trimmed at the pool's run()
+    assert profiler.sample_count == sum(sum(c.values()) for c in profiler.samples.values())
+    assert 0.3 <= profiler.duration_s < 1.0
+
+def test_collapsed_and_speedscope_agree():
+    profiler = capture()
+    lines = profiler.collapsed().splitlines()
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == profiler.sample_count
+    assert any(line.startswith("event loop;") and "busy_on_loop (test_profiler.py:" in line for line in lines)
+    assert "event loop;[awaiting I/O] " in "\n".join(lines)
+
+    doc = profiler.speedscope("trace")
+    frames = doc["shared"]["frames"]
+    assert sorted(p["name"] for p in doc["profiles"]) == sorted(f"trace - {t}" for t in profiler.samples)
+    for profile in doc["profiles"]:
+        assert len(profile["samples"]) == len(profile["weights"])
+        assert profile["endValue"] == sum(profile["weights"])
+        assert all(0 <= i < len(frames) for stack in profile["samples"] for i in stack)
+    total = sum(w for p in doc["profiles"] for w in p["weights"])
+    assert abs(total - profiler.sample_count * profiler.interval) < 1e-9
+
+def test_save_writes_requested_formats(tmp_path):
+    profiler = capture()
+    paths = profiler.save(str(tmp_path / "profiles"), "abc", ["collapsed", "speedscope"])
+    assert [p.rsplit("/", 1)[1] for p in paths] == ["abc" + PROFILE_SUFFIXES["collapsed"], "abc" + PROFILE_SUFFIXES["speedscope"]]
+    with open(paths[1]) as f:
+        assert json.load(f)["name"] == "abc"
+    assert profiler.save(str(tmp_path / "profiles"), "only", ["collapsed"]) == [str(tmp_path / "profiles" / "only.collapsed.txt")]
@@ -0,0 +1,65 @@
+import time
+
+from app.services.query_cache import QueryCache, TTLLRUCache, canonical_sql, normalize_question
+
+def test_question_and_sql_normalization():
+    assert normalize_question("Could you please show the Total sales for Allegra?") == "show total sales for allegra"
+    assert canonical_sql("SELECT  *\n FROM t WHERE x = 'a  b';") == "SELECT * FROM t WHERE x = 'a  b'"
+
+def test_lru_eviction_and_ttl_expiry():
+    cache = TTLLRUCache(max_size=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None and cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["expirations"] == 1
+
+def test_results_are_dropped_when_data_or_tables_change():
+    fingerprint = [1]
+    cache = QueryCache(lambda: fingerprint[0])
+    sales = "SELECT SUM(VALUE_LC) FROM FCT_SALES_NATIONAL_MTH"
+    brands = "SELECT PRODUCT_BRAND FROM DIM_SOURCE_PRODUCT"
+    cache.put_result(sales, [(1.0,)])
+    cache.put_result(brands, [("Allegra",)])
+    assert cache.get_result(" SELECT SUM(VALUE_LC)\nFROM FCT_SALES_NATIONAL_MTH;") == [(1.0,)]
+
+    assert cache.invalidate_tables(["dim_source_product"]) == 1
+    assert cache.get_result(brands) is None and cache.get_result(sales) == [(1.0,)]
+
+    fingerprint[0] = 2
+    assert cache.get_result(sales) is None
+
+def test_sql_level_uses_normalized_questions():
+    cache = QueryCache(lambda: 1)
+    cache.put_sql("Total sales for Allegra?", "SELECT 1")
+    assert cache.get_sql("total sales for allegra") == "SELECT 1"
+    cache.forget_sql("TOTAL SALES FOR ALLEGRA")
+    assert cache.get_sql("total sales for allegra") is None
+
+def test_warehouse_writers_invalidate_cached_results():
+    from app.services.query_cache import query_cache
+    from app.services.snowflake_service import snowflake_service
+    sql = "SELECT PRODUCT_BRAND FROM DIM_SOURCE_PRODUCT WHERE PRODUCT_BRAND = 'Zyrtec'"
+    query_cache.put_result(sql, [("Zyrtec",)])
+    assert query_cache.get_result(sql) == [("Zyrtec",)]
+    snowflake_service.tables_changed(["dim_source_product"])
+    assert query_cache.get_result(sql) is None
+
+def test_rollup_refresh_reports_changed_tables(sales_db):
+    import sqlite3
+
+    from app.services.rollups import PRODUCT_DIM, SALES_FACT, RollupManager
+    changes = []
+    conn = sqlite3.connect(sales_db)
+    columns = lambda table: [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+    manager = RollupManager(lambda: sqlite3.connect(sales_db), columns=columns, fingerprint=lambda: 1, on_change=changes.append)
+    manager.refresh()
+    assert SALES_FACT in changes[0] and PRODUCT_DIM in changes[0]
+    assert all(agg.name in changes[0] for agg in manager.aggregates)
+    manager.refresh()  # nothing new to fold
+    assert len(changes) == 1
+    conn.close()
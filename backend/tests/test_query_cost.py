@@ -0,0 +1,33 @@
+import sqlite3
+
+from app.services.query_cost import QueryCostGuard
+
+class NoQueries:
+    """
+    Request-path connection that must not be used for counting.
+    """
+
+    def execute(self, sql, *args):
+        raise AssertionError(f"counted on the request path: {sql}")
+
+def test_stale_counts_are_served_while_refreshing_in_background(sales_db):
+    version = [1]
+    guard = QueryCostGuard(lambda: version[0], connect=lambda: sqlite3.connect(sales_db))
+    assert guard.refresh()["DIM_SOURCE_PRODUCT"] == 4
+
+    conn = sqlite3.connect(sales_db)
+    conn.execute("INSERT INTO DIM_SOURCE_PRODUCT VALUES (5, 'Nurofen', 'Pain')")
+    conn.commit()
+    conn.close()
+    version[0] = 2
+
+    assert guard.row_counts(NoQueries())["DIM_SOURCE_PRODUCT"] == 4
+    guard._refreshing.join(timeout=5)
+    assert guard.row_counts(NoQueries())["DIM_SOURCE_PRODUCT"] == 5
+
+def test_without_connect_counts_on_the_callers_connection(sales_db):
+    guard = QueryCostGuard(lambda: 1)
+    conn = sqlite3.connect(sales_db)
+    counts = guard.row_counts(conn)
+    assert counts["DIM_SOURCE_PRODUCT"] == 4 and counts["FCT_SALES_NATIONAL_MTH"] == 49
+    conn.close()
@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import time
+from contextlib import ExitStack
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import endpoints
+from app.services.query_result import QueryResult
+from app.services.result_store import ResultCursor, ResultStore
+
+class FakeCursor:
+    def __init__(self, rows=10):
+        self.columns = ["N"]
+        self.remaining = rows
+        self.exhausted = False
+        self.closed = False
+        self.last_used = time.monotonic()
+
+    def fetch_page(self, page_size, token=None):
+        self.last_used = time.monotonic()
+        count = min(page_size, self.remaining)
+        self.remaining -= count
+        if count < page_size:
+            self.close()
+        return QueryResult(self.columns, [(i,) for i in range(count)])
+
+    def close(self):
+        self.exhausted = self.closed = True
+
+def test_handles_belong_to_their_session():
+    store = ResultStore(max_open=4, max_per_session=2)
+    cursor = FakeCursor()
+    handle = store.register(cursor, owner="a")
+    assert store.fetch_page(handle, 3, owner="b") is None
+    assert not store.close(handle, owner="b")
+    assert not cursor.closed
+    assert len(store.fetch_page(handle, 3, owner="a")) == 3
+    assert store.close(handle, owner="a") and cursor.closed
+
+def test_per_session_cap_evicts_only_that_sessions_cursors():
+    store = ResultStore(max_open=4, max_per_session=2)
+    other = FakeCursor()
+    store.register(other, owner="b")
+    first, second, third = FakeCursor(), FakeCursor(), FakeCursor()
+    h1 = store.register(first, owner="a")
+    store.register(second, owner="a")
+    store.register(third, owner="a")
+    assert first.closed and store.get(h1, "a") is None
+    assert not second.closed and not third.closed and not other.closed
+
+def test_full_store_declines_instead_of_closing_other_sessions():
+    store = ResultStore(max_open=2, max_per_session=2)
+    cursors = [FakeCursor(), FakeCursor()]
+    for owner, cursor in zip("ab", cursors):
+        assert store.register(cursor, owner=owner) is not None
+    assert store.register(FakeCursor(), owner="c") is None
+    assert not any(c.closed for c in cursors)
+    assert store.stats()["declined"] == 1
+
+def test_declined_cursor_does_not_cost_the_session_a_live_one():
+    store = ResultStore(max_open=2, max_per_session=1)
+    a, b = FakeCursor(), FakeCursor()
+    ha = store.register(a, owner="a")
+    store.register(b, owner="b")
+    # "c" has nothing to give up, so the store is full for it
+    assert store.register(FakeCursor(), owner="c") is None
+    assert not a.closed and not b.closed
+    # "a" replacing its own cursor frees the slot the new one takes
+    newer = FakeCursor()
+    assert store.register(newer, owner="a") is not None
+    assert a.closed and store.get(ha, "a") is None and not newer.closed
+
+def sqlite_cursor(rows):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("CREATE TABLE T (N INTEGER)")
+    conn.executemany("INSERT INTO T VALUES (?)", [(i,) for i in range(rows)])
+    resources = ExitStack()
+    resources.callback(conn.close)
+    return ResultCursor(conn.execute("SELECT N FROM T ORDER BY N"), resources)
+
+def test_cursor_closes_on_the_page_that_drains_it():
+    cursor = sqlite_cursor(4)
+    assert len(cursor.fetch_page(2)) == 2 and not cursor.exhausted
+    assert [row[0] for row in cursor.fetch_page(2).rows] == [2, 3]
+    assert cursor.exhausted  # no empty trailing page
+    cursor = sqlite_cursor(5)
+    assert [len(cursor.fetch_page(2)) for _ in range(3)] == [2, 2, 1]
+    assert cursor.exhausted and cursor.rows_sent == 5
+
+def test_close_owner_and_idle_expiry():
+    store = ResultStore(max_open=4, max_per_session=2, idle_timeout=0.05)
+    a, b = FakeCursor(), FakeCursor()
+    store.register(a, owner="a")
+    hb = store.register(b, owner="b")
+    store.close_owner("a")
+    assert a.closed and not b.closed
+    time.sleep(0.1)
+    assert store.get(hb, "b") is None and b.closed
+    assert store.stats()["open_cursors"] == 0
+
+def test_invalid_page_size_gets_an_error_reply_and_the_session_survives():
+    app = FastAPI()
+    app.include_router(endpoints.router, prefix="/api")
+    with TestClient(app).websocket_connect("/api/ws/chat") as ws:
+        ws.send_text(json.dumps({"action": "fetch_page", "handle": "x", "page_size": "lots"}))
+        reply = ws.receive_text()
+        assert reply.startswith("Result Page: ") and "page_size" in json.loads(reply[len("Result Page: "):])["error"]
+        ws.send_text(json.dumps({"action": "fetch_page", "handle": "x", "page_size": 10}))
+        reply = json.loads(ws.receive_text()[len("Result Page: "):])
+        assert reply["error"] == "Unknown or expired result handle"
+
+def test_preview_holding_the_whole_result_registers_no_handle(monkeypatch):
+    import asyncio
+
+    from app.agents import graph
+    preview = graph.settings.RESULT_PREVIEW_ROWS
+
+    async def aopen_cursor(sql, token=None):
+        return sqlite_cursor(preview)
+
+    monkeypatch.setattr(graph.snowflake_service, "aopen_cursor", aopen_cursor)
+    rows, handle = asyncio.run(graph.execute_sql("SELECT N FROM T", "s1"))
+    assert len(rows) == preview and handle is None
@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+from app.services.rollups import RollupManager
+
+JOIN = "FROM FCT_SALES_NATIONAL_MTH s JOIN DIM_SOURCE_PRODUCT p ON s.SOURCE_PRODUCT_ID = p.SOURCE_PRODUCT_ID"
+
+QUERIES = [
+    f"SELECT p.PRODUCT_BRAND, SUM(s.VALUE_LC) AS TOTAL_SALES {JOIN} GROUP BY p.PRODUCT_BRAND ORDER BY p.PRODUCT_BRAND",
+    f"SELECT COUNT(*) {JOIN}",
+    f"SELECT COUNT(*) AS N, SUM(s.VALUE_LC) AS SALES {JOIN} WHERE p.PRODUCT_BRAND = 'Advil'",
+    f"SELECT p.CATEGORY_NM, COUNT(s.COUNTRY_ID) AS N {JOIN} GROUP BY p.CATEGORY_NM ORDER BY p.CATEGORY_NM",
+    f"SELECT COUNT(p.PRODUCT_BRAND), COUNT(COUNTRY_ID) {JOIN}",
+    # Nothing matches: counts are 0, sums NULL, on both paths
+    f"SELECT COUNT(*) {JOIN} WHERE p.PRODUCT_BRAND = 'No such brand'",
+    f"SELECT COUNT(*) AS N, COUNT(s.COUNTRY_ID) AS C, SUM(s.VALUE_LC) AS SALES {JOIN} WHERE s.CALENDAR_ID > 20990101",
+]
+
+@pytest.fixture
+def rollups(sales_db):
+    conn = sqlite3.connect(sales_db)
+    columns = lambda table: [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+    manager = RollupManager(lambda: sqlite3.connect(sales_db), columns=columns, fingerprint=lambda: 1)
+    manager.refresh()
+    yield manager, conn
+    conn.close()
+
+@pytest.mark.parametrize("sql", QUERIES)
+def test_routed_queries_match_base_tables(rollups, sql):
+    manager, conn = rollups
+    routed = manager.route(conn, sql)
+    assert routed is not None, "query should be answered from a rollup"
+    rewritten, _ = routed
+    base = conn.execute(sql)
+    rolled = conn.execute(rewritten)
+    assert [d[0] for d in rolled.description] == [d[0] for d in base.description]
+    assert rolled.fetchall() == base.fetchall()
+
+def test_count_of_measures_is_not_routed(rollups):
+    manager, conn = rollups
+    assert manager.route(conn, f"SELECT COUNT(s.VALUE_LC) {JOIN}") is None
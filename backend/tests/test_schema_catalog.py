@@ -0,0 +1,58 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from app.services.schema_catalog import SchemaCatalog
+
+@pytest.fixture
+def catalog(mock_warehouse):
+    opened = []
+
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(mock_warehouse)
+        opened.append(conn)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    return SchemaCatalog(connect, check_interval=0, hidden_prefixes=("AGG_",)), opened, mock_warehouse
+
+def test_structured_metadata(catalog):
+    schema, _, _ = catalog
+    product = schema.table("DIM_SOURCE_PRODUCT")
+    assert len(product.columns) == 55 and product.columns[0].primary_key
+    facts = schema.to_dict()["FCT_SALES_NATIONAL_MTH"]
+    assert {"column": "SOURCE_PRODUCT_ID", "ref_table": "DIM_SOURCE_PRODUCT", "ref_column": "SOURCE_PRODUCT_ID"} in facts["foreign_keys"]
+    assert "SOURCE_PRODUCT_ID -> DIM_SOURCE_PRODUCT.SOURCE_PRODUCT_ID" in schema.render(["FCT_SALES_NATIONAL_MTH"], include_foreign_keys=True)
+
+def test_unchanged_schema_is_not_reloaded(catalog):
+    schema, opened, _ = catalog
+    first = schema.render()
+    tables = dict(schema.tables)
+    assert not schema.refresh()  # version checked, nothing re-read
+    assert schema.render() is first
+    assert all(schema.tables[name] is info for name, info in tables.items())
+    # Checks are rate-limited by check_interval
+    schema.check_interval = 60
+    before = len(opened)
+    schema.render()
+    schema.table("DIM_COUNTRY")
+    assert len(opened) == before
+
+def test_ddl_change_reloads_only_the_changed_tables(catalog):
+    schema, _, path = catalog
+    first = schema.render()
+    product, country = schema.table("DIM_SOURCE_PRODUCT"), schema.table("DIM_COUNTRY")
+    conn = sqlite3.connect(path)
+    conn.execute("ALTER TABLE DIM_COUNTRY ADD COLUMN CONTINENT TEXT")
+    conn.execute("CREATE TABLE AGG_HIDDEN (X INTEGER)")
+    conn.commit()
+    conn.close()
+    assert schema.refresh()
+    assert "CONTINENT" in schema.table("DIM_COUNTRY").column_names and schema.table("DIM_COUNTRY") is not country
+    assert schema.table("DIM_SOURCE_PRODUCT") is product
+    assert "AGG_HIDDEN" not in schema.tables
+    assert schema.render() != first and "CONTINENT (TEXT)" in schema.render()
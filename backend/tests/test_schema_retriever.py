@@ -0,0 +1,39 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from app.services.schema_catalog import SchemaCatalog
+from app.services.schema_retriever import SchemaRetriever, estimate_tokens
+
+@pytest.fixture
+def retriever(mock_warehouse):
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(mock_warehouse)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    return SchemaRetriever(SchemaCatalog(connect), token_budget=1500)
+
+def test_question_picks_its_tables_and_join_keys(retriever):
+    assert retriever.select_tables("total sales by brand") == ["FCT_SALES_NATIONAL_MTH", "DIM_SOURCE_PRODUCT"]
+    context = retriever.schema_context("total sales by brand")
+    assert "SOURCE_PRODUCT_ID -> DIM_SOURCE_PRODUCT.SOURCE_PRODUCT_ID" in context
+    assert "Table: FCT_SALES_NATIONAL_WK" not in context and "Table: DIM_CALENDAR" not in context
+    assert estimate_tokens(context) < estimate_tokens(retriever.catalog.render()) / 2
+
+def test_only_the_asked_time_grain_is_offered(retriever):
+    assert retriever.select_tables("weekly sales") == ["FCT_SALES_NATIONAL_WK"]
+    assert retriever.select_tables("quarterly revenue") == ["FCT_SALES_NATIONAL_QTR"]
+
+def test_join_paths_follow_foreign_keys(retriever):
+    retriever.score_tables("")
+    assert retriever._join_path("DIM_MARKET", "DIM_SOURCE_PRODUCT") == ["DIM_MARKET", "LNK_MARKET_PRODUCT", "DIM_SOURCE_PRODUCT"]
+
+def test_token_budget_and_full_schema_fallback(retriever):
+    tight = retriever.schema_context("total sales by brand", token_budget=100)
+    assert "Table: FCT_SALES_NATIONAL_MTH" in tight and "Table: DIM_SOURCE_PRODUCT" not in tight
+    assert retriever.schema_context("hello there") == retriever.catalog.render()
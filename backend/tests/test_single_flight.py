@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from app.agents import graph
+from app.services.single_flight import SingleFlight
+
+def test_concurrent_duplicates_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        first = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        again = await flight.do("key", work)  # nothing in flight any more
+        return first, again
+
+    first, again = asyncio.run(run())
+    assert first == [("result", False)] + [("result", True)] * 4
+    assert again == ("result", False) and len(calls) == 2
+    assert flight.stats() == {"calls": 6, "executions": 2, "coalesced": 4, "in_flight": 0}
+
+def test_failures_reach_every_waiter():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("warehouse down")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(3)), return_exceptions=True)
+
+    assert [str(e) for e in asyncio.run(run())] == ["warehouse down"] * 3
+
+def test_work_is_cancelled_only_when_every_waiter_leaves():
+    flight = SingleFlight()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.1)
+        finished.append(1)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("a", work))
+        follower = asyncio.ensure_future(flight.do("a", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == ("done", True)
+
+        waiters = [asyncio.ensure_future(flight.do("b", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.sleep(0.15)
+
+    asyncio.run(run())
+    assert finished == [1]  # "b" was abandoned before it finished
+
+def test_identical_questions_share_one_sql_generation(monkeypatch):
+    generated = []
+
+    async def generate_sql(query, entities=None, fallback=True):
+        generated.append(query)
+        await asyncio.sleep(0.05)
+        return "SELECT COUNT(*) FROM DIM_SOURCE_PRODUCT"
+
+    monkeypatch.setattr(graph, "generate_sql", generate_sql)
+    monkeypatch.setattr(graph.settings, "QUERY_CACHE_ENABLED", False)
+    monkeypatch.setattr(graph.settings, "SPECULATIVE_SQL_ENABLED", False)
+    monkeypatch.setattr(graph.settings, "ENTITY_INDEX_ENABLED", False)
+    questions = ["How many products are listed?", "how many products are listed", "Could you tell how many products are listed"]
+
+    async def run():
+        return await asyncio.gather(*(graph.sql_writer_node({"user_query": q}) for q in questions))
+
+    updates = asyncio.run(run())
+    assert len(generated) == 2  # the third question normalizes differently
+    assert sorted(u["cache_status"]["sql"] for u in updates) == ["coalesced", "miss", "miss"]
+    assert {u["sql_query"] for u in updates} == {"SELECT COUNT(*) FROM DIM_SOURCE_PRODUCT"}
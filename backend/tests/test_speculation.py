@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.agents import graph
+from app.agents.sql_templates import SqlTemplate
+
+TEMPLATE = SqlTemplate("brand_count", "SELECT COUNT(DISTINCT PRODUCT_BRAND) FROM DIM_SOURCE_PRODUCT", 0.9)
+ROWS = [{"N": 7}]
+HANDLE = {"id": "h1", "columns": ["N"], "has_more": True}
+
+@pytest.fixture
+def fakes(monkeypatch):
+    """
+    Template execution and LLM calls with scripted timings; records closed result handles.
+    """
+    calls = {"closed": [], "llm_finished": False, "template_opened": False}
+    script = {"llm_sql": TEMPLATE.sql, "llm_delay": 0.0, "template_delay": 0.0}
+
+    async def execute_sql(sql, session_id, deadline=None):
+        await asyncio.sleep(script["template_delay"])
+        calls["template_opened"] = True
+        return ROWS, HANDLE
+
+    async def generate_sql(query, entities=None, fallback=True):
+        await asyncio.sleep(script["llm_delay"])
+        calls["llm_finished"] = True
+        return script["llm_sql"]
+
+    monkeypatch.setattr(graph, "execute_sql", execute_sql)
+    monkeypatch.setattr(graph, "generate_sql", generate_sql)
+    monkeypatch.setattr(graph.result_store, "close", lambda handle, owner=None: calls["closed"].append((handle, owner)))
+    monkeypatch.setattr(graph.settings, "QUERY_CACHE_ENABLED", False)
+    monkeypatch.setattr(graph.settings, "SPECULATIVE_LATENCY_BUDGET_S", 1.0)
+    return calls, script
+
+def state(question="how many brands"):
+    return {"user_query": question, "session_id": "s1", "deadline": None, "resolved_entities": {"entities": []}}
+
+def test_agreeing_llm_serves_prefetched_results(fakes):
+    update = asyncio.run(graph.speculative_sql(state(), TEMPLATE))
+    assert update["cache_status"]["speculation"] == "agree"
+    assert update["sql_results"] == ROWS and update["result_handle"] == HANDLE
+
+def test_llm_without_sql_is_not_counted_as_agreement(fakes):
+    _, script = fakes
+    script["llm_sql"] = ""
+    before = dict(graph.speculation_stats)
+    update = asyncio.run(graph.speculative_sql(state("how many brands exist"), TEMPLATE))
+    assert update["cache_status"]["speculation"] == "no_llm_sql"
+    assert update["sql_query"] == TEMPLATE.sql and update["sql_results"] == ROWS
+    assert graph.speculation_stats["no_llm_sql"] == before["no_llm_sql"] + 1
+    assert graph.speculation_stats["agree"] == before["agree"]
+
+def test_disagreeing_llm_releases_template_cursor(fakes):
+    calls, script = fakes
+    script["llm_sql"] = "SELECT PRODUCT_BRAND FROM DIM_SOURCE_PRODUCT"
+
+    async def run():
+        update = await graph.speculative_sql(state("brands please"), TEMPLATE)
+        await asyncio.sleep(0.01)
+        return update
+
+    update = asyncio.run(run())
+    assert update["cache_status"]["speculation"] == "disagree"
+    assert "sql_results" not in update
+    assert calls["closed"] == [("h1", "s1")]
+
+def test_cancelled_node_stops_llm_and_closes_template_cursor(fakes):
+    calls, script = fakes
+    script["llm_delay"] = 0.3
+
+    async def run():
+        node = asyncio.ensure_future(graph.speculative_sql(state("count brands"), TEMPLATE))
+        await asyncio.sleep(0.05)  # template cursor is open, LLM still generating
+        node.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await node
+        await asyncio.sleep(0.4)
+
+    asyncio.run(run())
+    assert calls["template_opened"]
+    assert not calls["llm_finished"]
+    assert calls["closed"] == [("h1", "s1")]
+
+def test_executor_passes_prefetched_results_on(monkeypatch):
+    monkeypatch.setattr(graph.settings, "QUERY_CACHE_ENABLED", False)
+    prefetched = {**state(), "sql_query": TEMPLATE.sql, "prefetched_sql": TEMPLATE.sql, "sql_results": ROWS, "result_handle": HANDLE}
+    update = asyncio.run(graph.sql_executor_node(prefetched))
+    assert update["sql_results"] == ROWS and update["result_handle"] == HANDLE
+    payload = graph.node_payload("sql_executor", update)
+    assert payload["has_more"] is True
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.services import tracing
+from app.services.cancellation import DeadlineExceeded
+from app.services.metrics import Histogram
+
+@pytest.fixture
+def histogram(monkeypatch):
+    histogram = Histogram("datapella_span_seconds", "Durations", ("kind", "name", "status"))
+    monkeypatch.setattr(tracing, "span_seconds", histogram)
+    monkeypatch.setattr(tracing.settings, "TELEMETRY_ENABLED", True)
+    return histogram
+
+def execute_in_worker():
+    with tracing.span("sql", "execute"):
+        pass
+
+def test_spans_land_on_the_current_trace_with_their_status(histogram):
+    async def request():
+        trace = tracing.start_trace()
+        with tracing.span("node", "sql_writer") as current:
+            current.attrs["rows"] = 3
+        # Spans opened in worker threads see the request's trace too
+        await asyncio.to_thread(execute_in_worker)
+        with pytest.raises(DeadlineExceeded):
+            with tracing.span("llm", "generate"):
+                raise DeadlineExceeded("too slow")
+        return trace
+
+    trace = asyncio.run(request())
+    summary = trace.summary()
+    assert [(s["kind"], s["name"], s["status"]) for s in summary["spans"]] == [
+        ("node", "sql_writer", "ok"), ("sql", "execute", "ok"), ("llm", "generate", "timeout"),
+    ]
+    assert summary["spans"][0]["rows"] == 3
+    assert set(summary["by_kind_ms"]) == {"node", "sql", "llm"}
+    assert tracing.trace_store.get(trace.trace_id) is trace
+    assert histogram.count(kind="llm", name="generate", status="timeout") == 1
+
+def test_cancelled_spans_are_marked_and_finish_once(histogram):
+    current = tracing.start_span("node", "merger")
+    assert tracing.failure_status(asyncio.CancelledError()) == "cancelled"
+    current.finish("cancelled")
+    current.finish()
+    assert current.status == "cancelled"
+    assert histogram.count(kind="node", name="merger", status="cancelled") == 1
+    assert histogram.count(kind="node", name="merger", status="ok") == 0
+
+def test_spans_outside_a_trace_are_only_measured(histogram):
+    async def untraced():
+        with tracing.span("lookup", "entities") as current:
+            pass
+        return current, tracing.current_trace()
+
+    current, trace = asyncio.run(untraced())
+    assert trace is None and current.duration_s is not None
+    assert histogram.count(kind="lookup", name="entities", status="ok") == 1
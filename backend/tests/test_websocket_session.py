@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import endpoints
+
+def make_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(endpoints.router, prefix="/api")
+    return TestClient(app)
+
+def test_session_keeps_answering_after_a_failed_question(monkeypatch):
+    calls = []
+
+    async def answer_question(session_id, data, profile=False):
+        calls.append(data)
+        if data == "boom":
+            raise RuntimeError("provider unavailable")
+        await endpoints.manager.send(session_id, f"Final Response: {data}")
+
+    monkeypatch.setattr(endpoints, "answer_question", answer_question)
+    with make_client().websocket_connect("/api/ws/chat") as ws:
+        ws.send_text("boom")
+        assert ws.receive_text() == "Error: provider unavailable"
+        ws.send_text("how many brands")
+        assert ws.receive_text() == "Final Response: how many brands"
+    assert calls == ["boom", "how many brands"]
+
+def test_questions_beyond_the_pending_limit_are_refused(monkeypatch):
+    release = threading.Event()
+
+    async def answer_question(session_id, data, profile=False):
+        await endpoints.manager.send(session_id, f"Started: {data}")
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        await endpoints.manager.send(session_id, f"Final Response: {data}")
+
+    monkeypatch.setattr(endpoints, "answer_question", answer_question)
+    monkeypatch.setattr(endpoints.settings, "WS_MAX_PENDING_QUESTIONS", 2)
+    with make_client().websocket_connect("/api/ws/chat") as ws:
+        ws.send_text("q0")
+        assert ws.receive_text() == "Started: q0"
+        for question in ("q1", "q2", "q3"):
+            ws.send_text(question)
+        assert ws.receive_text().startswith("Error: Too many pending questions")
+        release.set()
+        replies = [ws.receive_text() for _ in range(5)]
+    assert [r for r in replies if r.startswith("Final")] == ["Final Response: q0", "Final Response: q1", "Final Response: q2"]